@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+"""
+Extractor benchmark: run the extraction pipeline stage by stage over a
+synthetic corpus (bench/synth_corpus.py) plus the HTML fixtures in
+bench/fixtures, and report throughput, peak RSS and per-stage times.
+
+    python bench/bench_extractor.py --out bench/results/now.json
+    python bench/bench_extractor.py --baseline bench/results/before.json --threshold 0.1
+
+Stages per file: read, decode (charset detection + decode; with
+--encoding-cache the warm-up pass records each file's charset and the timed
+passes reuse it, as a repeated extractor run would), html_to_text
+(markup to normalized text), rule_passes (scan_rules), dayparts (daypart
+index) and emit (dispatch + JSON encoding). With --baseline, exits 1 if
+throughput dropped or a stage slowed down by more than the threshold.
+"""
+from __future__ import annotations
+
+import argparse, hashlib, json, platform, resource, statistics, subprocess, sys, tempfile, time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import extractor as X  # noqa: E402
+from rule_pack import RULES_PATH  # noqa: E402
+from extract_cache import EncodingCache  # noqa: E402
+from synth_corpus import generate  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+STAGES = ("read", "decode", "html_to_text", "rule_passes", "dayparts", "emit")
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 2**20 if sys.platform == "darwin" else rss / 2**10  # bytes vs KiB
+
+def run_once(paths: List[Path], rules: dict, encodings: Optional[EncodingCache] = None) -> dict:
+    """One timed pass over `paths`; stage times in seconds."""
+    t = dict.fromkeys(STAGES, 0.0)
+    clock = time.perf_counter
+    slot = X._daypart_slot(rules)
+    in_bytes = text_chars = hits = 0
+    for path in paths:
+        t0 = clock()
+        raw = path.read_bytes()
+        t1 = clock()
+        html = X.decode_html(raw, path, encodings)
+        t2 = clock()
+        text = X.markup_to_text(html)
+        t3 = clock()
+        per_rule = X.scan_rules(text, rules)
+        t4 = clock()
+        dayparts = X.DaypartIndex([(s, e, text[s:e]) for s, e, _ in per_rule[slot]])
+        t5 = clock()
+        lines = [json.dumps(h.to_dict(), ensure_ascii=False) for h in X.dispatch(text, rules, per_rule, dayparts)]
+        t6 = clock()
+        for name, a, b in zip(STAGES, (t0, t1, t2, t3, t4, t5), (t1, t2, t3, t4, t5, t6)):
+            t[name] += b - a
+        in_bytes += len(raw)
+        text_chars += len(text)
+        hits += len(lines)
+    return {"stages": t, "total": sum(t.values()), "bytes": in_bytes, "chars": text_chars, "hits": hits}
+
+def summarize(runs: List[dict]) -> dict:
+    """Median stage times over the runs, and throughput derived from them."""
+    stages = {s: statistics.median(r["stages"][s] for r in runs) for s in STAGES}
+    total = sum(stages.values())
+    first = runs[0]
+    return {
+        "files_bytes": first["bytes"], "text_chars": first["chars"], "hits": first["hits"],
+        "seconds": total,
+        "mb_per_s": first["bytes"] / 2**20 / total if total else 0.0,
+        "matches_per_s": first["hits"] / total if total else 0.0,
+        "stages": stages,
+        "stage_share": {s: (v / total if total else 0.0) for s, v in stages.items()},
+    }
+
+def git_head() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def compare(result: dict, baseline: dict, threshold: float) -> List[str]:
+    """Human-readable regressions of `result` against `baseline`, if any."""
+    out = []
+    for name, cur in result["suites"].items():
+        old = baseline.get("suites", {}).get(name)
+        if old is None:
+            continue
+        if cur["mb_per_s"] < old["mb_per_s"] * (1 - threshold):
+            out.append(f"{name}: {cur['mb_per_s']:.2f} MB/s, was {old['mb_per_s']:.2f}")
+        for s in STAGES:
+            a, b = old["stages"].get(s, 0.0), cur["stages"][s]
+            if a > 0.01 and b > a * (1 + threshold):  # ignore stages too short to time
+                out.append(f"{name}/{s}: {b:.3f}s, was {a:.3f}s")
+    return out
+
+def print_report(result: dict) -> None:
+    for name, r in result["suites"].items():
+        print(f"{name}: {r['files_bytes'] / 2**20:.1f} MiB, {r['hits']} hits, {r['seconds']:.2f}s "
+              f"-> {r['mb_per_s']:.2f} MB/s, {r['matches_per_s']:.0f} matches/s")
+        for s in STAGES:
+            print(f"  {s:<13} {r['stages'][s]:8.3f}s  {r['stage_share'][s]:6.1%}")
+    print(f"peak RSS: {result['peak_rss_mb']:.0f} MiB")
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog=Path(argv[0]).name, description=__doc__.split("\n\n")[0])
+    ap.add_argument("--mb", type=float, default=20.0, help="synthetic corpus size (default %(default)g)")
+    ap.add_argument("--density", type=float, default=0.02,
+                    help="share of synthetic words that are time phrases (default %(default)g)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--undeclared", type=float, default=0.25,
+                    help="share of synthetic pages without a charset declaration (default %(default)g)")
+    ap.add_argument("--encoding-cache", action="store_true",
+                    help="decode with the charsets recorded by the warm-up pass (a repeated run)")
+    ap.add_argument("--repeat", type=int, default=3, help="timed passes; medians are reported")
+    ap.add_argument("--corpus-dir", metavar="DIR",
+                    help="keep the synthetic corpus in DIR (reused if already generated)")
+    ap.add_argument("--out", metavar="JSON", help="save the results here")
+    ap.add_argument("--baseline", metavar="JSON", help="earlier results to check against")
+    ap.add_argument("--threshold", type=float, default=0.15,
+                    help="allowed slowdown vs the baseline, as a fraction (default %(default)g)")
+    args = ap.parse_args(argv[1:])
+
+    with tempfile.TemporaryDirectory() as tmp:
+        name = f"mb{args.mb:g}_d{args.density:g}_s{args.seed}_u{args.undeclared:g}"
+        cdir = Path(args.corpus_dir or tmp) / name
+        synth = sorted(cdir.glob("*.html")) or generate(cdir, args.mb, args.density, args.seed,
+                                                        undeclared=args.undeclared)
+        encodings = EncodingCache(Path(tmp) / "encodings") if args.encoding_cache else None
+        suites = {"synthetic": synth, "fixtures": sorted(FIXTURES.glob("*.htm*"))}
+        rules = X.load_rules()
+        result: Dict[str, object] = {
+            "meta": {
+                "git": git_head(), "python": platform.python_version(), "platform": platform.platform(),
+                "rules_sha256": hashlib.sha256(RULES_PATH.read_bytes()).hexdigest(),
+                "mb": args.mb, "density": args.density, "seed": args.seed, "repeat": args.repeat,
+                "undeclared": args.undeclared, "encoding_cache": args.encoding_cache,
+                "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            },
+            "suites": {},
+        }
+        for name, paths in suites.items():
+            run_once(paths, rules, encodings)  # warm-up: page cache, lru caches, encodings
+            result["suites"][name] = summarize([run_once(paths, rules, encodings)
+                                                for _ in range(args.repeat)])
+    result["peak_rss_mb"] = peak_rss_mb()
+
+    print_report(result)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(result, indent=1), encoding="utf-8")
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        baseline_hits = {k: v["hits"] for k, v in baseline.get("suites", {}).items()}
+        regressions = compare(result, baseline, args.threshold)
+        for line in regressions:
+            print(f"[regression] {line}", file=sys.stderr)
+        for name, r in result["suites"].items():
+            old = baseline_hits.get(name)
+            if old is not None and old != r["hits"]:
+                print(f"[note] {name}: {r['hits']} hits, was {old} (output changed)", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Engine benchmark and golden check: run the regex engine and the token
+engine (token_engine.py) over the same texts, fail if their scan_rules()
+output differs anywhere, and report the scan throughput of each.
+
+    python bench/compare_engines.py [DIR_OR_FILE ...] [--mb 20] [--out results.json]
+
+Suites: the synthetic corpus (bench/synth_corpus.py), the HTML fixtures in
+bench/fixtures, and any given files or trees (e.g. a golden corpus). Texts
+are converted once, untimed; only the scan is timed, best of --repeat.
+"""
+from __future__ import annotations
+
+import argparse, json, sys, tempfile, time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import extractor as X  # noqa: E402
+from synth_corpus import generate  # noqa: E402
+
+FIXTURES = Path(__file__).resolve().parent / "fixtures"
+
+def load_texts(paths: List[Path]) -> List[str]:
+    out = []
+    for p in paths:
+        reader = X.reader_for(p) or X.HTML_READER
+        out.append(reader.to_text(p))
+    return out
+
+def time_engine(texts: List[str], rules: dict, repeat: int) -> tuple:
+    """(best seconds, per-text scan_rules output)"""
+    best, result = float("inf"), []
+    for _ in range(repeat):
+        t = time.perf_counter()
+        result = [X.scan_rules(text, rules) for text in texts]
+        best = min(best, time.perf_counter() - t)
+    return best, result
+
+def compare(texts: List[str], names: List[str], engines: Dict[str, dict], repeat: int) -> dict:
+    """Timings per engine plus the texts whose output differs from the regex engine's."""
+    timed = {name: time_engine(texts, rules, repeat) for name, rules in engines.items()}
+    chars = sum(map(len, texts))
+    ref = timed["regex"][1]
+    out = {"texts": len(texts), "chars": chars,
+           "hits": sum(len(hits) for per_rule in ref for hits in per_rule), "engines": {}, "mismatches": []}
+    for name, (secs, result) in timed.items():
+        out["engines"][name] = {"seconds": secs, "mchars_per_s": chars / 1e6 / secs if secs else 0.0}
+        out["mismatches"] += [f"{name}: {names[i]}" for i, (a, b) in enumerate(zip(ref, result)) if a != b]
+    return out
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog=Path(argv[0]).name, description=__doc__.split("\n\n")[0])
+    ap.add_argument("paths", nargs="*", help="more files or trees to compare on (e.g. a golden corpus)")
+    ap.add_argument("--mb", type=float, default=20.0, help="synthetic corpus size (default %(default)g)")
+    ap.add_argument("--density", type=float, default=0.02,
+                    help="share of synthetic words that are time phrases (default %(default)g)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--corpus-dir", metavar="DIR",
+                    help="keep the synthetic corpus in DIR (reused if already generated)")
+    ap.add_argument("--repeat", type=int, default=3, help="timed passes per engine; the best is kept")
+    ap.add_argument("--out", metavar="JSON", help="save the results here")
+    args = ap.parse_args(argv[1:])
+
+    engines = {name: X.load_rules(engine=name) for name in X.ENGINES}
+    result: Dict[str, dict] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        name = f"mb{args.mb:g}_d{args.density:g}_s{args.seed}_u0.25"
+        cdir = Path(args.corpus_dir or tmp) / name
+        suites = {"synthetic": sorted(cdir.glob("*.html")) or generate(cdir, args.mb, args.density, args.seed),
+                  "fixtures": sorted(FIXTURES.glob("*.htm*"))}
+        for p in map(Path, args.paths):
+            suites[str(p)] = list(X.iter_files(p))
+        for suite, paths in suites.items():
+            result[suite] = compare(load_texts(paths), [str(p) for p in paths], engines, args.repeat)
+
+    failed = False
+    for suite, r in result.items():
+        rates = ", ".join(f"{name} {e['seconds']:.2f}s {e['mchars_per_s']:.2f} Mchar/s"
+                          for name, e in r["engines"].items())
+        print(f"{suite}: {r['texts']} texts, {r['chars'] / 1e6:.1f} Mchar, {r['hits']} matches: {rates}")
+        for m in r["mismatches"]:
+            print(f"[mismatch] {suite}: {m}", file=sys.stderr)
+            failed = True
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps(result, indent=1), encoding="utf-8")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
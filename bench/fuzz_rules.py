@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Pathological-input benchmark: feed adversarial strings (long letter runs,
+space/"a " runs after "perccel", digit and separator chains, OCR-like
+noise, ...) to every rule and report the worst time per input length.
+
+    python bench/fuzz_rules.py [--lengths 1000,2000,4000] [--out results.json]
+
+For each rule the table shows the worst family and its time at each
+length, plus the growth exponent k of time ~ length^k between the two
+longest inputs. k near 1 is linear; k near 2 is quadratic backtracking.
+"master" is the combined one-pass scan (with the literal prefilter) that
+extraction actually runs. Inputs are raw strings: the readers collapse
+whitespace runs, so the space-run families only reach callers that pass
+their own text to extract().
+"""
+from __future__ import annotations
+
+import argparse, json, math, random, sys, time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+import extractor as X  # noqa: E402
+
+def _noise(n: int) -> str:
+    rnd = random.Random(n)
+    return "".join(rnd.choice("aáeéoóöőiíl -.:0123456789") for _ in range(n))
+
+def _cycle(unit: str) -> Callable[[int], str]:
+    return lambda n: (unit * (n // len(unit) + 1))[:n]
+
+FAMILIES: Dict[str, Callable[[int], str]] = {
+    "letters": lambda n: "a" * n,
+    "accented": lambda n: "é" * n,
+    "a_space": _cycle("a "),
+    "words": _cycle("aaaa "),
+    "perccel_a": lambda n: "öt perccel " + _cycle("a ")(n),
+    "perccel_spaces": lambda n: "öt perccel" + " " * n,
+    "word_perccel": lambda n: "é" * n + " perccel",
+    "hyphens": lambda n: "-" * n + " perccel",
+    "tizen": lambda n: "tizen" + "e" * n,
+    "hour_words": _cycle("tizenegy óra "),
+    "ora_utan": _cycle("5 óra után "),
+    "digits": lambda n: "1" * n,
+    "dotted": _cycle("1."),
+    "colons": _cycle("12:"),
+    "kor": lambda n: "1" + "-" * n + "kor",
+    "ocr_noise": _noise,
+}
+
+def time_scan(fn: Callable[[str], object], text: str, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        t = time.perf_counter()
+        fn(text)
+        best = min(best, time.perf_counter() - t)
+        if best > 0.5:  # clearly pathological; more runs only cost time
+            break
+    return best
+
+def run(rules: dict, lengths: List[int], repeat: int) -> Dict[str, dict]:
+    """{scanner: {"worst": [(family, seconds) per length], "k": growth exponent}}"""
+    scanners: Dict[str, Callable[[str], object]] = {
+        r["id"]: (lambda rx: lambda s: sum(1 for _ in rx.finditer(s)))(r["_re"]) for r in rules["rules"]
+    }
+    scanners["master"] = lambda s: X.scan_rules(s, rules)
+    out = {}
+    for name, fn in scanners.items():
+        worst = []
+        for n in lengths:
+            times = {fam: time_scan(fn, gen(n), repeat) for fam, gen in FAMILIES.items()}
+            fam = max(times, key=times.get)
+            worst.append((fam, times[fam]))
+        k = None
+        if len(lengths) > 1 and worst[-2][1] > 0 and worst[-1][1] > 1e-4:
+            k = math.log(worst[-1][1] / worst[-2][1]) / math.log(lengths[-1] / lengths[-2])
+        out[name] = {"worst": worst, "k": k}
+    return out
+
+def print_report(result: Dict[str, dict], lengths: List[int]) -> None:
+    print(f"{'rule':<28}" + "".join(f"{n:>26}" for n in lengths) + f"{'k':>6}")
+    for name, r in sorted(result.items(), key=lambda kv: -kv[1]["worst"][-1][1]):
+        cells = "".join(f"{f'{fam} {sec * 1e3:.2f}ms':>24}" for fam, sec in r["worst"])
+        k = f"{r['k']:.1f}" if r["k"] is not None else "-"
+        print(f"{name:<28}{cells}{k:>6}")
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog=Path(argv[0]).name, description=__doc__.split("\n\n")[0])
+    ap.add_argument("--lengths", default="1000,2000,4000",
+                    help="comma-separated input lengths (default %(default)s)")
+    ap.add_argument("--repeat", type=int, default=3, help="timed runs per input; the best is kept")
+    ap.add_argument("--out", metavar="JSON", help="save the results here")
+    args = ap.parse_args(argv[1:])
+    lengths = [int(x) for x in args.lengths.split(",")]
+    result = run(X.load_rules(), lengths, args.repeat)
+    print_report(result, lengths)
+    if args.out:
+        Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+        Path(args.out).write_text(json.dumps({"lengths": lengths, "rules": result}, indent=1),
+                                  encoding="utf-8")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
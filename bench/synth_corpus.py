@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Reproducible synthetic Hungarian "prose" for benchmarking the extractor.
+
+Filler words are interleaved with time expressions built from the rules'
+own vocabulary (word2hour, number_words), so every rule gets exercised.
+The same seed, size and density always give the same bytes.
+
+A share of the pages (--undeclared) carry no charset declaration, like the
+older MEK/DIA downloads, so charset detection is exercised as well.
+
+    python bench/synth_corpus.py OUT_DIR [--mb 20] [--density 0.02] [--seed 1] [--undeclared 0.25]
+"""
+from __future__ import annotations
+
+import argparse, random, sys
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from rule_pack import RULES_PATH, load_pack  # noqa: E402
+
+FILLER = ("a az és hogy nem is meg de már csak még volt van lesz akkor ott itt aztán "
+          "ember asszony gyerek ház kert utca ablak ajtó szoba asztal levél kapu fa víz "
+          "ég nap hold szél eső hó út falu város templom harang vonat állomás "
+          "ment jött látta mondta nézte várta ült állt hallotta gondolta "
+          "csendes hideg meleg sötét világos régi új hosszú rövid fáradt").split()
+DAYPARTS = ("reggel", "este", "délután", "délelőtt", "éjjel", "hajnalban", "délben",
+            "de.", "du.", "éjfélkor")
+# (templates, weight): {h} digit hour, {H} hour word, {m} minute digits,
+# {M} minute word, {d} daypart word
+TEMPLATES = (
+    ("{h}:{m:02d}", 3), ("{h}.{m:02d}", 2), ("{h} óra {m} perc", 2),
+    ("{H} óra {M} perckor", 2), ("{h} órakor", 3), ("{h}-kor", 2),
+    ("fél {H}", 3), ("negyed {H}", 2), ("háromnegyed {H}", 2),
+    ("{M} perccel {h} óra után", 1), ("{h} óra előtt {m} perccel", 1),
+    ("{d} {H} órakor", 2), ("{H} óra múlva", 1), ("{d}", 4),
+)
+ENCODINGS = ("utf-8", "iso-8859-2", "cp1250")
+
+def vocabulary(rules: dict) -> Dict[str, List[str]]:
+    """Hour and minute words from the rules file (minute words up to 59)."""
+    nw = rules["number_words"]
+    units = [w for k in map(str, range(1, 10)) for w in nw[k]]
+    minutes = [w for k in map(str, range(0, 13)) for w in nw[k]]
+    minutes += [p + u for p in nw["13_19_prefix"] for u in units if u != "két"]
+    for tens in ("20", "30", "40", "50"):
+        minutes += nw[f"{tens}_exact"]
+        minutes += [p + u for p in nw[f"{tens}s_prefix"] for u in units if u != "két"]
+    return {"hours": sorted(rules["word2hour"]), "minutes": minutes}
+
+def time_phrase(rnd: random.Random, vocab: Dict[str, List[str]]) -> str:
+    tpl = rnd.choices([t for t, _ in TEMPLATES], [w for _, w in TEMPLATES])[0]
+    return tpl.format(h=rnd.randrange(24), m=rnd.randrange(60), H=rnd.choice(vocab["hours"]),
+                      M=rnd.choice(vocab["minutes"]), d=rnd.choice(DAYPARTS))
+
+def prose(rnd: random.Random, vocab: Dict[str, List[str]], chars: int, density: float) -> str:
+    """About `chars` characters with `density` of the words replaced by time phrases."""
+    out: List[str] = []
+    n = 0
+    sentence = 0
+    while n < chars:
+        w = time_phrase(rnd, vocab) if rnd.random() < density else rnd.choice(FILLER)
+        if sentence == 0:
+            w = w[:1].upper() + w[1:]
+        sentence += 1
+        if sentence > rnd.randrange(6, 20):
+            w += rnd.choice((".", ".", "!", "?"))
+            sentence = 0
+        elif rnd.random() < 0.08:
+            w += ","
+        out.append(w)
+        n += len(w) + 1
+    return " ".join(out)
+
+def html_page(title: str, body: str, encoding: str, rnd: random.Random, declare: bool = True) -> bytes:
+    paras = []
+    i = 0
+    while i < len(body):
+        j = body.find(" ", i + rnd.randrange(300, 1500))
+        j = len(body) if j < 0 else j
+        paras.append(f"<p>{body[i:j]}</p>")
+        i = j + 1
+    meta = f"<meta http-equiv=\"Content-Type\" content=\"text/html; charset={encoding}\">" if declare else ""
+    page = (f"<html><head>{meta}"
+            f"<title>{title}</title><style>p {{ margin: 0 }}</style>"
+            f"<script>var upd = '12:00';</script></head><body><h1>{title}</h1>\n"
+            + "\n".join(paras) + "\n</body></html>\n")
+    return page.encode(encoding, "replace")
+
+def generate(out_dir: Path, mb: float = 20.0, density: float = 0.02, seed: int = 1,
+             files: int = 16, undeclared: float = 0.25) -> List[Path]:
+    """
+    Write `files` HTML documents totalling about `mb` MiB of text, about
+    `undeclared` of them without a charset declaration; returns their paths.
+    """
+    rnd = random.Random(seed)
+    vocab = vocabulary(load_pack(RULES_PATH)["rules"])
+    out_dir.mkdir(parents=True, exist_ok=True)
+    total = int(mb * 2**20)
+    # a few big documents and a tail of small ones, like a real download dir
+    weights = [1 / (i + 1) for i in range(files)]
+    paths = []
+    for i, w in enumerate(weights):
+        body = prose(rnd, vocab, max(1, int(total * w / sum(weights))), density)
+        enc = ENCODINGS[i % len(ENCODINGS)]
+        path = out_dir / f"synth_{seed}_{i:03d}.html"
+        declare = int((i + 1) * undeclared) == int(i * undeclared)  # every 1/undeclared-th is bare
+        path.write_bytes(html_page(f"Szintetikus {i}", body, enc, rnd, declare))
+        paths.append(path)
+    return paths
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog=Path(argv[0]).name, description=__doc__.split("\n\n")[0])
+    ap.add_argument("out_dir")
+    ap.add_argument("--mb", type=float, default=20.0, help="approximate text size (default %(default)g)")
+    ap.add_argument("--density", type=float, default=0.02,
+                    help="share of words that are time phrases (default %(default)g)")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--files", type=int, default=16)
+    ap.add_argument("--undeclared", type=float, default=0.25,
+                    help="share of pages without a charset declaration (default %(default)g)")
+    args = ap.parse_args(argv[1:])
+    paths = generate(Path(args.out_dir), args.mb, args.density, args.seed, args.files, args.undeclared)
+    size = sum(p.stat().st_size for p in paths)
+    print(f"[synth] {len(paths)} files, {size / 2**20:.1f} MiB -> {args.out_dir}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
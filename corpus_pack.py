@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Corpus packs: the normalized text of every downloaded document concatenated
+into one UTF-8 blob, plus a JSON index of where each document lives in it.
+The extractor mmaps the blob (`extractor.py --corpus PREFIX`) instead of
+opening thousands of small files.
+
+    python corpus_pack.py corpus/all [mek_downloads dia_downloads ...]
+
+writes corpus/all.txt and corpus/all.idx.json.
+"""
+from __future__ import annotations
+
+import codecs, json, mmap, os, sys
+from bisect import bisect_right
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Tuple
+
+PACK_VERSION = 1
+DEFAULT_ROOTS = ("mek_downloads", "dia_downloads")
+DOC_SEPARATOR = "\n"  # between documents; never part of one
+
+@dataclass
+class Doc:
+    id: int
+    file: str
+    byte_start: int
+    byte_end: int
+    char_start: int  # global character offset of the document's first char
+    chars: int
+
+def pack_paths(prefix: Path) -> Tuple[Path, Path]:
+    prefix = Path(prefix)
+    return prefix.with_name(prefix.name + ".txt"), prefix.with_name(prefix.name + ".idx.json")
+
+def build(prefix: Path, files: Iterable[Path],
+          to_text: Callable[[Path], Iterable[str]]) -> Tuple[int, int]:
+    """
+    Write the blob and index for `files`; `to_text` yields a file's normalized
+    text in chunks. Files that fail to convert are listed under "errors".
+    Returns (documents, bytes).
+    """
+    blob_path, idx_path = pack_paths(prefix)
+    blob_path.parent.mkdir(parents=True, exist_ok=True)
+    docs, errors = [], []
+    byte_pos = char_pos = 0
+    sep = DOC_SEPARATOR.encode("utf-8")
+    with blob_path.open("wb") as out:
+        for path in files:
+            start_bytes, start_chars = byte_pos, char_pos
+            try:
+                for chunk in to_text(path):
+                    data = chunk.encode("utf-8")
+                    out.write(data)
+                    byte_pos += len(data)
+                    char_pos += len(chunk)
+            except Exception as e:
+                out.seek(start_bytes)
+                out.truncate()
+                byte_pos, char_pos = start_bytes, start_chars
+                errors.append({"file": str(path), "error": f"read_failed: {e}"})
+                print(f"[corpus] {path}: {e}", file=sys.stderr)
+                continue
+            docs.append({"file": str(path), "byte_start": start_bytes, "byte_end": byte_pos,
+                         "char_start": start_chars, "chars": char_pos - start_chars})
+            out.write(sep)
+            byte_pos += len(sep)
+            char_pos += len(DOC_SEPARATOR)
+    idx_path.write_text(json.dumps({"version": PACK_VERSION, "docs": docs, "errors": errors},
+                                   ensure_ascii=False), encoding="utf-8")
+    return len(docs), byte_pos
+
+class CorpusPack:
+    """Read side: the mmapped blob and its document index."""
+    def __init__(self, prefix: Path):
+        blob_path, idx_path = pack_paths(prefix)
+        index = json.loads(idx_path.read_text(encoding="utf-8"))
+        if index.get("version") != PACK_VERSION:
+            raise ValueError(f"{idx_path}: unsupported corpus pack version {index.get('version')}")
+        self.docs = [Doc(i, **d) for i, d in enumerate(index["docs"])]
+        self.errors: List[dict] = index.get("errors", [])
+        self._char_starts = [d.char_start for d in self.docs]
+        self._file = blob_path.open("rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._mm) if self._mm is not None else memoryview(b"")
+
+    def text(self, doc: Doc) -> str:
+        """The whole document, decoded straight from the mapping."""
+        return str(self._view[doc.byte_start:doc.byte_end], "utf-8")
+
+    def decode(self, byte_start: int, byte_end: int) -> str:
+        """Blob bytes [byte_start, byte_end), e.g. one segment of a document."""
+        return str(self._view[byte_start:byte_end], "utf-8")
+
+    def iter_text(self, doc: Doc, chunk_bytes: int = 1 << 20) -> Iterable[str]:
+        """The document in chunks, for bounded-memory extraction of huge ones."""
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        for a in range(doc.byte_start, doc.byte_end, chunk_bytes):
+            piece = decoder.decode(self._view[a:min(a + chunk_bytes, doc.byte_end)])
+            if piece:
+                yield piece
+        tail = decoder.decode(b"", final=True)
+        if tail:
+            yield tail
+
+    def locate(self, offset: int) -> Tuple[Optional[Doc], int]:
+        """(document, offset within it) for a global character offset."""
+        i = bisect_right(self._char_starts, offset) - 1
+        if i < 0 or offset >= self.docs[i].char_start + self.docs[i].chars:
+            return None, -1
+        return self.docs[i], offset - self.docs[i].char_start
+
+    def close(self) -> None:
+        self._view.release()
+        if self._mm is not None:
+            self._mm.close()
+        self._file.close()
+
+def main(argv: List[str]) -> int:
+    if len(argv) < 2:
+        print("Usage: corpus_pack.py <out-prefix> [root ...]", file=sys.stderr)
+        return 2
+    from extractor import RunOptions, iter_files, iter_text
+
+    opts = RunOptions()  # stream exactly the files a per-file run streams, so the text is the same
+    roots = [Path(a) for a in argv[2:]] or [Path(r) for r in DEFAULT_ROOTS if Path(r).exists()]
+    files = (p for root in roots for p in iter_files(root))
+    n, size = build(Path(argv[1]), files,
+                    lambda p: iter_text(p, opts, streaming=p.stat().st_size >= opts.stream_min))
+    print(f"[corpus] {n} documents, {size / 2**20:.1f} MiB -> {pack_paths(Path(argv[1]))[0]}",
+          file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
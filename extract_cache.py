@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+On-disk state shared between extractor runs, so unchanged inputs are not
+re-read and re-parsed every time.
+"""
+from __future__ import annotations
+
+import gzip, hashlib, json, os
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MANIFEST_VERSION = 1
+
+def file_sha256(path: Path, block: int = 1 << 20) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for chunk in iter(lambda: f.read(block), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    tmp = path.with_name(path.name + f".tmp{os.getpid()}")
+    tmp.write_bytes(data)
+    os.replace(tmp, path)
+
+class HitManifest:
+    """
+    Per-file record of an extractor run: size, mtime, content hash, rules
+    hash and where the file's output lines are stored. Layout under `root`:
+
+        manifest.json    {"version", "rules_sha256", "files": {path: entry}}
+        hits/<id>.jsonl  the exact lines the extractor printed for that file
+
+    A different rules hash (or manifest version) invalidates every entry;
+    the extractor's hash also names its reader and extractor versions.
+    """
+    def __init__(self, root: Path, rules_hash: str):
+        self.root = Path(root)
+        self.rules_hash = rules_hash
+        self.entries: Dict[str, dict] = {}
+        (self.root / "hits").mkdir(parents=True, exist_ok=True)
+        mf = self.root / "manifest.json"
+        if mf.exists():
+            data = json.loads(mf.read_text(encoding="utf-8"))
+            if data.get("version") == MANIFEST_VERSION and data.get("rules_sha256") == rules_hash:
+                self.entries = data["files"]
+
+    def fingerprint(self, path: Path, sha256: Optional[str] = None) -> dict:
+        st = path.stat()
+        return {"size": st.st_size, "mtime_ns": st.st_mtime_ns,
+                "sha256": sha256 or file_sha256(path)}
+
+    def check(self, path: Path) -> Tuple[Optional[List[str]], Optional[dict]]:
+        """
+        (stored lines, None) if `path` is unchanged since it was stored,
+        else (None, fingerprint to pass to store()). Size+mtime equality is
+        trusted; otherwise the content hash decides.
+        """
+        try:
+            return self._check(path)
+        except OSError:
+            return None, None  # let the extractor report read_failed
+
+    def _check(self, path: Path) -> Tuple[Optional[List[str]], Optional[dict]]:
+        entry = self.entries.get(str(path))
+        st = path.stat()
+        if entry is None or entry.get("rules_sha256") != self.rules_hash:
+            return None, self.fingerprint(path)
+        if (st.st_size, st.st_mtime_ns) != (entry["size"], entry["mtime_ns"]):
+            sha = file_sha256(path) if st.st_size == entry["size"] else None
+            if sha != entry["sha256"]:
+                return None, self.fingerprint(path, sha)
+            entry["mtime_ns"] = st.st_mtime_ns  # touched, not changed
+        hits = self.root / entry["hits"]
+        if not hits.exists():
+            return None, self.fingerprint(path, entry["sha256"])
+        text = hits.read_text(encoding="utf-8")
+        return text.splitlines(), None
+
+    def store(self, path: Path, fingerprint: Optional[dict], lines: List[str]) -> None:
+        """Remember `lines` for `path`; runs that ended in read_failed are not kept."""
+        if fingerprint is None or (lines and '"error": "read_failed' in lines[-1]):
+            self.entries.pop(str(path), None)
+            return
+        rel = f"hits/{hashlib.sha1(str(path).encode('utf-8')).hexdigest()}.jsonl"
+        _write_atomic(self.root / rel, "".join(l + "\n" for l in lines).encode("utf-8"))
+        self.entries[str(path)] = dict(fingerprint, rules_sha256=self.rules_hash, hits=rel)
+
+    def save(self) -> None:
+        data = {"version": MANIFEST_VERSION, "rules_sha256": self.rules_hash, "files": self.entries}
+        _write_atomic(self.root / "manifest.json",
+                      json.dumps(data, ensure_ascii=False, indent=1).encode("utf-8"))
+
+class TextCache:
+    """
+    Normalized plain text of source documents, gzip-compressed and stored as
+    <root>/<sha[:2]>/<sha>.<reader>.<tag>.txt.gz under the source file's
+    sha256 and the reader that converted it (the same bytes read as HTML and
+    as plain text are different texts). `tag` names the converter version,
+    so a converter change misses cleanly.
+    """
+    READ_CHARS = 1 << 20
+
+    def __init__(self, root: Path, tag: str):
+        self.root = Path(root)
+        self.tag = tag
+
+    def path_for(self, sha: str, reader: str) -> Path:
+        return self.root / sha[:2] / f"{sha}.{reader}.{self.tag}.txt.gz"
+
+    def load(self, sha: str, reader: str) -> Optional[Iterable[str]]:
+        """Chunks of the cached text, or None on a miss."""
+        target = self.path_for(sha, reader)
+        if not target.exists():
+            return None
+        return self._read(target)
+
+    def _read(self, target: Path) -> Iterable[str]:
+        with gzip.open(target, "rt", encoding="utf-8", newline="") as f:
+            for chunk in iter(lambda: f.read(self.READ_CHARS), ""):
+                yield chunk
+
+    def store(self, sha: str, reader: str, chunks: Iterable[str]) -> Iterable[str]:
+        """
+        Pass `chunks` through while writing them to the cache; the entry only
+        appears once the iterator is exhausted, so a failed read leaves no entry.
+        """
+        target = self.path_for(sha, reader)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + f".tmp{os.getpid()}")
+        complete = False
+        try:
+            with gzip.open(tmp, "wt", encoding="utf-8", newline="", compresslevel=6) as f:
+                for chunk in chunks:
+                    f.write(chunk)
+                    yield chunk
+            complete = True
+            os.replace(tmp, target)
+        finally:
+            if not complete:
+                tmp.unlink(missing_ok=True)
+
+class EncodingCache:
+    """
+    Source encodings detected by earlier runs, by path, trusted while the
+    file's size and mtime are unchanged. Every process appends what it
+    detects to <root>/<pid>.jsonl, so --jobs workers never share a file;
+    compact() folds those into <root>/encodings.jsonl once a run is over.
+    """
+    COMPACT = "encodings.jsonl"
+
+    def __init__(self, root: Path):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.entries: Dict[str, Tuple[int, int, str]] = {}
+        self._out = None
+        self._pid = 0
+        self._load()
+
+    def _load(self) -> None:
+        logs = sorted(self.root.glob("*.jsonl"), key=lambda p: (p.name != self.COMPACT, p.stat().st_mtime_ns))
+        for log in logs:
+            for line in log.read_text(encoding="utf-8").splitlines():
+                try:
+                    e = json.loads(line)
+                    self.entries[e["file"]] = (e["size"], e["mtime_ns"], e["encoding"])
+                except (ValueError, KeyError):
+                    continue  # a line cut short by a killed worker
+
+    def get(self, path: Path) -> Optional[str]:
+        entry = self.entries.get(str(path))
+        if entry is None:
+            return None
+        st = path.stat()
+        return entry[2] if entry[:2] == (st.st_size, st.st_mtime_ns) else None
+
+    def put(self, path: Path, encoding: str) -> None:
+        st = path.stat()
+        entry = (st.st_size, st.st_mtime_ns, encoding)
+        if self.entries.get(str(path)) == entry:
+            return
+        self.entries[str(path)] = entry
+        if self._pid != os.getpid():  # first write, or a worker forked from a writer
+            self._out = (self.root / f"{os.getpid()}.jsonl").open("a", encoding="utf-8", buffering=1)
+            self._pid = os.getpid()
+        self._out.write(json.dumps({"file": str(path), "size": entry[0], "mtime_ns": entry[1],
+                                    "encoding": encoding}, ensure_ascii=False) + "\n")
+
+    def compact(self) -> None:
+        """Merge every process's log into one file; call when no worker is writing."""
+        if self._out is not None and self._pid == os.getpid():
+            self._out.close()
+        self._out, self._pid = None, 0
+        logs = [p for p in self.root.glob("*.jsonl") if p.name != self.COMPACT]
+        if not logs:
+            return
+        self.entries.clear()
+        self._load()
+        _write_atomic(self.root / self.COMPACT, "".join(
+            json.dumps({"file": f, "size": s, "mtime_ns": m, "encoding": enc}, ensure_ascii=False) + "\n"
+            for f, (s, m, enc) in self.entries.items()).encode("utf-8"))
+        for log in logs:
+            log.unlink(missing_ok=True)
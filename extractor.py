@@ -1,79 +1,200 @@
 #!/usr/bin/env python3
 from __future__ import annotations
 
-import json, json5, re, sys, unicodedata
+import argparse, json, os, re, sys, time
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Iterable, List, Optional, Tuple, Any
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
-from bs4 import BeautifulSoup
-from bs4.dammit import UnicodeDammit
-
-RULES_PATH = Path(__file__).with_name("rules.json5")
+from corpus_pack import CorpusPack, Doc
+from extract_cache import EncodingCache, HitManifest, TextCache, file_sha256
+from hit_records import Hit, HitBatch
+from hit_sink import BINARY_SUFFIX, open_sink
+from hu_numerals import number_table, parse_number
+from readers import (HTML_READER, Reader, decode_html, html_to_text, iter_html_text,  # noqa: F401
+                     markup_to_text, reader_for)
+from rule_pack import FOLD_ASCII_FLAGS, FOLD_FLAGS, RULE_FLAGS, RULES_PATH, compile_master, load_pack, norm
+from shadow_text import ShadowText
+from shards import ShardSink, parse_shard, shard_paths
+from shared_text import SharedText, byte_offsets, share_tracker
+from token_engine import TokenScanner
+MULVA_RE = re.compile(r"^[\s\.,;:!?-]*múlva\b", re.IGNORECASE)
+MULVA_FOLD_RE = re.compile(r"^[\s\.,;:!?-]*mulva\b")  # on norm()-folded text (--fold-accents)
+ENGINES = ("regex", "tokens")  # see scan_rules
 
 # ---------- utils ----------
-def norm(s: str) -> str:
-    s = s.lower()
-    s = unicodedata.normalize("NFKD", s)
-    return "".join(c for c in s if not unicodedata.combining(c))
-
-def load_rules() -> dict:
-    rules = json5.loads(RULES_PATH.read_text(encoding="utf-8"))
-    for r in rules["rules"]:
-        r["_re"] = re.compile(r["pattern"], re.IGNORECASE | re.UNICODE)
+def load_rules(path: Path = RULES_PATH, engine: str = "regex", fold: bool = False) -> dict:
+    """
+    The rules from the cached rule pack, with every pattern compiled; with
+    engine="tokens" also the TokenScanner (ValueError if it doesn't cover them).
+    With `fold` the accent-folded patterns are compiled instead, and
+    scan_rules runs them over each text's shadow (see shadow_text.py);
+    rules["_ascii"] then holds them compiled for all-ASCII shadows.
+    """
+    if fold and engine != "regex":
+        raise ValueError("accent folding runs the regex rules; use it with --engine regex")
+    pack = load_pack(path)
+    rules = pack["rules"]
+    rules["_word2hour"] = pack["word2hour"]
+    rules["_numbers"] = number_table(rules.get("number_words", {}))
+    rules["_fold"] = fold
+    if not fold:
+        _compile_rules(rules, dict(pack, patterns=[r["pattern"] for r in rules["rules"]]), RULE_FLAGS)
+        rules["_tokens"] = TokenScanner(rules) if engine == "tokens" else None
+        return rules
+    rules["_tokens"] = None
+    ascii_rules = dict(rules, rules=[dict(r) for r in rules["rules"]])
+    _compile_rules(rules, pack["folded"], FOLD_FLAGS)
+    rules["_ascii"] = _compile_rules(ascii_rules, pack["folded"], FOLD_ASCII_FLAGS)
+    return rules
+
+def _compile_rules(rules: dict, src: dict, flags: int) -> dict:
+    """Compile the rule patterns, master, gate and anchors of `src` (a pack or its "folded") into rules."""
+    for r, pattern in zip(rules["rules"], src["patterns"]):
+        r["_re"] = re.compile(pattern, flags)
+    rules["_master"] = compile_master(rules["rules"], src["master"], flags)
+    rules["_gate"] = re.compile(src["gate"] or r"(?=[\s\S])", flags)
+    anchor_flags = flags & re.ASCII
+    rules["_anchors"] = None if src["anchors"] is None else \
+        [(re.compile(a, anchor_flags), reach) for a, reach in src["anchors"]]
     return rules
 
-def html_to_text(path: Path) -> str:
-    raw = path.read_bytes()
-    dammit = UnicodeDammit(raw, is_html=True)
-    html = dammit.unicode_markup or raw.decode("latin-2", "ignore")
-    soup = BeautifulSoup(html, "html.parser")
-    for t in soup(["script", "style", "noscript"]):
-        t.decompose()
-    text = soup.get_text(separator=" ", strip=False)
-    text = re.sub(r"\s+", " ", text)
-    return text
+def lookup_hour(rules: dict, word: str) -> Optional[int]:
+    table = rules["_word2hour"]
+    h = table.get(word.lower())
+    return h if h is not None else table.get(norm(word))
+
+def candidate_windows(text: str, rules: dict, pos: int = 0,
+                      low: Optional[str] = None) -> Optional[List[Tuple[int, int]]]:
+    """
+    Merged [start, end) ranges of text[pos:] in which a rule match may start,
+    from the rules' anchors and reach; None if the rules can't be prefiltered.
+    `low` is text.lower() if the caller has it; a shadow text is its own.
+    """
+    anchors = rules.get("_anchors")
+    if anchors is None:
+        return None
+    if low is None:
+        low = text if rules.get("_fold") else text.lower()
+    if len(low) != len(text):  # a rare char changed length; offsets would drift
+        return None
+    spans = []
+    for rx, reach in anchors:
+        spans.extend((max(pos, m.start() - reach), m.start() + 1) for m in rx.finditer(low, pos))
+    spans.sort()
+    out: List[Tuple[int, int]] = []
+    for a, b in spans:
+        if out and a <= out[-1][1]:
+            if b > out[-1][1]:
+                out[-1] = (out[-1][0], b)
+        else:
+            out.append((a, b))
+    return out
+
+def _master_matches(text: str, rules: dict, pos: int,
+                    watchdog: Optional[Watchdog] = None) -> Iterable[re.Match]:
+    """Master-pattern matches from pos on, tried only where the prefilter allows."""
+    windows = candidate_windows(text, rules, pos)
+    if windows is None:
+        if watchdog is None:
+            yield from rules["_master"].finditer(text, pos)
+            return
+        windows = [(pos, len(text))]  # position by position, so each try can be timed
+    gate, match = rules["_gate"], rules["_master"].match
+    if watchdog is not None:
+        match = watchdog.timed(match, rules["rules"])
+    for a, b in windows:
+        # finditer reads text as if it ended at b, so a window must hold every start its
+        # anchors allow (reach before, up to the anchor): the gate only looks at the chars
+        # next to a start, and the master match itself runs on the whole text
+        for g in gate.finditer(text, a, b):
+            m = match(text, g.start())
+            if m is not None:
+                yield m
+
+def scan_rules(text: str, rules: dict, pos: int = 0, last_end: Optional[List[int]] = None,
+               watchdog: Optional[Watchdog] = None) -> List[List[Tuple[int, int, tuple]]]:
+    """
+    One pass of the master pattern; returns, per rule (in file order), the
+    (start, end, groups) triples that rule's own finditer would have produced.
+    `pos` / `last_end` resume a scan: matches of rule k starting before
+    last_end[k] are skipped, and last_end is updated in place. A `watchdog`
+    times the pass against the document's regex budget. Rules loaded for
+    the token engine are scanned by it instead (see token_engine.py).
+    Folded rules scan the text's shadow; spans are mapped back to `text`,
+    groups stay folded.
+    """
+    rule_list = rules["rules"]
+    if last_end is None:
+        last_end = [0] * len(rule_list)
+    if rules.get("_fold"):
+        shadow = ShadowText(text)
+        if shadow.text.isascii():
+            rules = rules["_ascii"]
+        if shadow.exact:
+            return _scan_text(shadow.text, rules, pos, last_end, watchdog)
+        ends = [shadow.to_shadow(x) for x in last_end]
+        per_rule = _scan_text(shadow.text, rules, shadow.to_shadow(pos), ends, watchdog)
+        last_end[:] = [shadow.to_text(x, end=True) for x in ends]
+        return shadow.remap(per_rule)
+    return _scan_text(text, rules, pos, last_end, watchdog)
+
+def _scan_text(text: str, rules: dict, pos: int, last_end: List[int],
+               watchdog: Optional[Watchdog]) -> List[List[Tuple[int, int, tuple]]]:
+    rule_list = rules["rules"]
+    out: List[List[Tuple[int, int, tuple]]] = [[] for _ in rule_list]
+    if _profile is not None:
+        return _profile.scan_each(text, rule_list, pos, last_end, out)
+    tokens = rules.get("_tokens")
+    if tokens is not None and watchdog is None:
+        low = text.lower()
+        per_rule = tokens.scan(text, low, candidate_windows(text, rules, pos, low), pos, last_end)
+        if per_rule is not None:
+            return per_rule
+    slots = [(k, r["_gi"], r["_re"].groups) for k, r in enumerate(rule_list)]
+    for m in _master_matches(text, rules, pos, watchdog):
+        for k, gi, n in slots:
+            s = m.start(gi)
+            if s < last_end[k]:  # -1 (no match here) or overlaps this rule's previous hit
+                continue
+            e = m.end(gi)
+            last_end[k] = e
+            out[k].append((s, e, m.groups()[gi:gi + n]))
+    return out
 
 def hhmm_to_minute(h: int, m: int) -> int:
     return (h % 24) * 60 + (m % 60)
 
-# number-word parsing for minutes (0..59)
-ONES = {
-    "nulla":0,"zero":0,"zéro":0,
-    "egy":1,"kettő":2,"ketto":2,"két":2,"ket":2,"három":3,"harom":3,"négy":4,"negy":4,
-    "öt":5,"ot":5,"hat":6,"hét":7,"het":7,"nyolc":8,"kilenc":9,"tíz":10,"tiz":10,
-    "tizenegy":11,"tizenkettő":12,"tizenketto":12,"tizenhárom":13,"tizenharom":13,
-    "tizennégy":14,"tizennegy":14,"tizenöt":15,"tizenot":15,"tizenhat":16,
-    "tizenhét":17,"tizenhet":17,"tizennyolc":18,"tizenkilenc":19
-}
-TENS_BASE = {
-    "húsz":20,"husz":20,"húszon":20,"huszon":20,
-    "harminc":30,"negyven":40,"ötven":50,"otven":50
-}
-def parse_hu_number_word(token: str) -> Optional[int]:
-    t = norm(token)
-    if t in ONES: return ONES[t]
-    for pref in ("huszon","húszon"):
-        if t.startswith(pref):
-            rest = t[len(pref):]
-            return 20 + ONES.get(rest, -1) if rest in ONES else (20 if rest=="" else None)
-    for base, val in TENS_BASE.items():
-        if t == base: return val
-        if t.startswith(base):
-            rest = t[len(base):]
-            return val + ONES.get(rest, -1) if rest in ONES else None
-    return None
+def parse_hu_number_word(rules: dict, token: str) -> Optional[int]:
+    """A minute in words (0..59; see hu_numerals.py), or None."""
+    return parse_number(rules["_numbers"], token)
 
 def find_dayparts(text: str, rules: dict) -> List[Tuple[int,int,str]]:
     dp_rule = next(x for x in rules["rules"] if x["semantics"] == "daypart_for_bias")
     rx = dp_rule["_re"]
     return [(m.start(), m.end(), m.group(0)) for m in rx.finditer(text)]
 
-def nearby(tokens: List[Tuple[int,int,str]], i0: int, i1: int, radius: int = 40) -> List[str]:
-    out = []
-    for a,b,t in tokens:
-        if not (i1 + radius < a or b < i0 - radius):
-            out.append(t)
-    return out
+class DaypartIndex:
+    """
+    Daypart tokens as parallel start/end/text arrays for bisect lookups.
+    Tokens come from a single finditer, so they never overlap and both the
+    starts and the ends are sorted.
+    """
+    __slots__ = ("starts", "ends", "words")
+
+    def __init__(self, tokens: List[Tuple[int,int,str]]):
+        self.starts = [a for a,_,_ in tokens]
+        self.ends = [b for _,b,_ in tokens]
+        self.words = [t for _,_,t in tokens]
+
+def nearby(index: DaypartIndex, i0: int, i1: int, radius: int = 40) -> List[str]:
+    # tokens with b >= i0 - radius and a <= i1 + radius
+    lo = bisect_left(index.ends, i0 - radius)
+    hi = bisect_right(index.starts, i1 + radius)
+    return index.words[lo:hi]
 
 def disambiguate_hour_candidates(h: int, ctx_tokens: List[str]) -> List[int]:
     """
@@ -95,79 +216,297 @@ def disambiguate_hour_candidates(h: int, ctx_tokens: List[str]) -> List[int]:
     # ambiguous on purpose: both candidates
     return [0 if h==12 else h, 12 if h==12 else (h+12)]
 
-def emit_record(rule_id: str, match_txt: str, s: int, e: int, text: str,
-                hour_candidates: List[int], minute_value: int) -> dict:
+def emit_record(rule_id: str, s: int, e: int, text: Optional[str], hour_candidates: List[int],
+                minute_value: int, base: Optional[int] = None) -> Hit:
+    """`base`, if given, is the global offset of text[0]; the hit's record then gets an "offset"."""
     if len(hour_candidates) == 1:
-        minute = hhmm_to_minute(hour_candidates[0], minute_value)
-        return {
-            "rule_id": rule_id,
-            "match": match_txt,
-            "norm_time": f"{minute//60:02d}:{minute%60:02d}",
-            "minute": minute,
-            "context": text[max(0,s-60):min(len(text),e+60)].strip()
-        }
-    else:
-        mins = [hhmm_to_minute(h, minute_value) for h in hour_candidates]
-        return {
-            "rule_id": rule_id,
-            "match": match_txt,
-            "minute": None,
-            "minute_candidates": sorted(mins),
-            "ambiguous_12h": True,
-            "context": text[max(0,s-60):min(len(text),e+60)].strip()
-        }
+        return Hit(rule_id, s, e, hhmm_to_minute(hour_candidates[0], minute_value), (), text, base)
+    mins = tuple(sorted(hhmm_to_minute(h, minute_value) for h in hour_candidates))
+    return Hit(rule_id, s, e, None, mins, text, base)
+
+def emit_offsets(rule_id: str, s: int, e: int, text: str, hour_candidates: List[int],
+                 minute_value: int, base: Optional[int] = None) -> Hit:
+    """emit_record without the text, for --offsets-only records; see hit_context.py."""
+    return emit_record(rule_id, s, e, None, hour_candidates, minute_value, base or 0)
+
+# ---------- regex budget ----------
+PROBE_ABOVE_S = 0.005  # master tries slower than this are re-run rule by rule to find the culprit
+
+class BudgetExceeded(Exception):
+    def __init__(self, rule: str, seconds: float, budget: float):
+        super().__init__(f"rule_budget: {rule} {seconds:.3g}s > {budget:g}s")
+        self.rule, self.seconds, self.budget = rule, seconds, budget
+
+    def __reduce__(self):  # comes back from segment workers
+        return BudgetExceeded, (self.rule, self.seconds, self.budget)
+
+class Watchdog:
+    """
+    --rule-budget for one document. Every master try is timed; a slow one is
+    re-run with each rule's own pattern, so the time lands on the rules that
+    backtrack. Time no rule accounts for (many cheap tries) is charged to
+    "master". Python can't interrupt a running match, so with action "skip"
+    the scan stops at the first try that takes any rule (or the whole scan)
+    past the budget; "flag" scans on and only keeps the verdict.
+    """
+    def __init__(self, budget: float, action: str = "flag"):
+        self.budget, self.action = budget, action
+        self.spent: Dict[str, float] = {}
+        self.total = 0.0
+        self.over: Optional[BudgetExceeded] = None
+
+    def timed(self, match, rule_list: List[dict]):
+        clock = time.perf_counter
+        def timed_match(text: str, pos: int) -> Optional[re.Match]:
+            t = clock()
+            m = match(text, pos)
+            dt = clock() - t
+            self.total += dt
+            if dt > PROBE_ABOVE_S:
+                self.charge(text, pos, rule_list)
+            elif self.total > self.budget and self.over is None:
+                self.exceeded("master", self.total)
+            return m
+        return timed_match
+
+    def charge(self, text: str, pos: int, rule_list: List[dict]) -> None:
+        clock = time.perf_counter
+        for r in rule_list:
+            t = clock()
+            r["_re"].match(text, pos)
+            spent = self.spent[r["id"]] = self.spent.get(r["id"], 0.0) + clock() - t
+            if spent > self.budget and self.over is None:
+                self.exceeded(r["id"], spent)
+        if self.total > self.budget and self.over is None:
+            self.exceeded("master", self.total)
+
+    def absorb(self, other: Watchdog) -> None:
+        """Add a segment worker's times to this document's and check the budget again."""
+        self.total += other.total
+        for rid, sec in other.spent.items():
+            spent = self.spent[rid] = self.spent.get(rid, 0.0) + sec
+            if spent > self.budget and self.over is None:
+                self.exceeded(rid, spent)
+        if self.total > self.budget and self.over is None:
+            self.exceeded("master", self.total)
+
+    def exceeded(self, rule: str, seconds: float) -> None:
+        self.over = BudgetExceeded(rule, seconds, self.budget)
+        if self.action == "skip":
+            raise self.over
+
+    def report(self, name: str, out=sys.stderr) -> None:
+        """The flag-mode verdict for document `name`, if it went over."""
+        if self.over is not None and self.action == "flag":
+            slow = ", ".join(f"{rid} {s:.3g}s" for rid, s in
+                             sorted(self.spent.items(), key=lambda kv: -kv[1])[:3] if s >= 1e-3)
+            print(f"[budget] {name}: {self.over}" + (f" (slowest: {slow})" if slow else ""), file=out)
+
+# ---------- profiling ----------
+class Profile:
+    """
+    --profile counters. While one is installed, scan_rules runs each rule's
+    own finditer (same matches as the master pass) so its time is attributable.
+    Raw matches are counted once committed, so chunk overlaps don't count twice;
+    parse drops are what's left of them after múlva, overlap drops and emits.
+    Context rules (dayparts) are never emitted; only their matches are shown.
+    """
+    def __init__(self):
+        self.finditer_s: Dict[str, float] = {}
+        self.raw: Dict[str, int] = {}
+        self.mulva: Dict[str, int] = {}
+        self.overlap: Dict[str, int] = {}
+        self.ambiguous: Dict[str, int] = {}
+        self.emitted: Dict[str, int] = {}
+        self.context: Set[str] = set()  # rules whose matches only bias others (daypart_for_bias)
+        self.order: List[str] = []
+        self.files: List[Tuple[str, float, float, float]] = []  # file, decode, to_text, extract
+        self._decode = self._text = 0.0
+
+    def scan_each(self, text: str, rule_list: List[dict], pos: int, last_end: List[int],
+                  out: List[List[Tuple[int, int, tuple]]]) -> List[List[Tuple[int, int, tuple]]]:
+        for k, r in enumerate(rule_list):
+            rid = r["id"]
+            if rid not in self.finditer_s:
+                self.order.append(rid)
+                self.finditer_s[rid] = 0.0
+            t = time.perf_counter()
+            hits = [(m.start(), m.end(), m.groups()) for m in r["_re"].finditer(text, max(pos, last_end[k]))]
+            self.finditer_s[rid] += time.perf_counter() - t
+            if hits:
+                last_end[k] = hits[-1][1]
+            out[k] = hits
+        return out
+
+    def count(self, table: Dict[str, int], rid: str, n: int = 1) -> None:
+        table[rid] = table.get(rid, 0) + n
+
+    def count_emits(self, hits: Iterable[Hit]) -> Iterable[Hit]:
+        for hit in hits:
+            self.count(self.emitted, hit.rule_id)
+            if hit.minute is None:
+                self.count(self.ambiguous, hit.rule_id)
+            yield hit
+
+    def to_text(self, path: Path, reader: Reader, encodings: Optional[EncodingCache] = None) -> str:
+        if reader is not HTML_READER:  # no separate decode step to time
+            t = time.perf_counter()
+            text = reader.to_text(path, encodings=encodings)
+            self._text += time.perf_counter() - t
+            return text
+        t0 = time.perf_counter()
+        html = decode_html(path.read_bytes(), path, encodings)
+        t1 = time.perf_counter()
+        text = markup_to_text(html)
+        self._decode += t1 - t0
+        self._text += time.perf_counter() - t1
+        return text
+
+    def timed_text(self, chunks: Iterable[str]) -> Iterable[str]:
+        """Pass chunks through, charging the time spent producing them to text conversion."""
+        it = iter(chunks)
+        while True:
+            t = time.perf_counter()
+            chunk = next(it, None)
+            self._text += time.perf_counter() - t
+            if chunk is None:
+                return
+            yield chunk
+
+    def time_file(self, name: str, records: Iterable[Record]) -> Iterable[Record]:
+        self._decode = self._text = 0.0
+        t = time.perf_counter()
+        yield from records
+        total = time.perf_counter() - t
+        self.files.append((name, self._decode, self._text, total - self._decode - self._text))
+
+    def report(self, out=sys.stderr, top: int = 10) -> None:
+        print(f"{'rule':<28}{'finditer_s':>11}{'raw':>9}{'múlva':>8}{'parse':>8}{'overlap':>9}"
+              f"{'ambig':>8}{'emitted':>9}", file=out)
+        for rid in sorted(self.order, key=lambda r: -self.finditer_s[r]):
+            raw, mul, emi = self.raw.get(rid, 0), self.mulva.get(rid, 0), self.emitted.get(rid, 0)
+            ovl = self.overlap.get(rid, 0)
+            if rid in self.context:
+                print(f"{rid:<28}{self.finditer_s[rid]:>11.3f}{raw:>9}  (context for am/pm, never emitted)",
+                      file=out)
+                continue
+            print(f"{rid:<28}{self.finditer_s[rid]:>11.3f}{raw:>9}{mul:>8}{raw - mul - ovl - emi:>8}"
+                  f"{ovl:>9}{self.ambiguous.get(rid, 0):>8}{emi:>9}", file=out)
+        dec, txt, ext = (sum(f[i] for f in self.files) for i in (1, 2, 3))
+        print(f"{len(self.files)} files: decode {dec:.3f}s, to_text {txt:.3f}s, extract {ext:.3f}s",
+              file=out)
+        for name, d, t, e in sorted(self.files, key=lambda f: -(f[1] + f[2] + f[3]))[:top]:
+            print(f"  {d + t + e:8.3f}s  decode {d:.3f}  to_text {t:.3f}  extract {e:.3f}  {name}",
+                  file=out)
+
+_profile: Optional[Profile] = None  # installed by --profile; in-process runs only
 
 # ---------- core extraction ----------
-def extract(text: str, rules: dict) -> Iterable[dict]:
-    dayparts = find_dayparts(text, rules)
+def _daypart_slot(rules: dict) -> int:
+    return next(k for k, r in enumerate(rules["rules"]) if r["semantics"] == "daypart_for_bias")
+
+def extract(text: str, rules: dict, base: Optional[int] = None, offsets_only: bool = False,
+            keep_overlaps: bool = False, watchdog: Optional[Watchdog] = None,
+            pool: Optional[Executor] = None, source: Optional[TextSource] = None) -> Iterable[Hit]:
+    """
+    Hits for one text. With a worker `pool`, a long text is scanned
+    in segments (see scan_segments, also for `source`).
+    """
+    if pool is not None and len(text) >= 2 * SEGMENT_CHARS:
+        per_rule = scan_segments(text, rules, pool, watchdog, source)
+    else:
+        per_rule = scan_rules(text, rules, watchdog=watchdog)
+    dayparts = DaypartIndex([(s, e, text[s:e]) for s, e, _ in per_rule[_daypart_slot(rules)]])
+    hits = dispatch(text, rules, per_rule, dayparts, base, offsets_only, keep_overlaps)
+    return hits if _profile is None else _profile.count_emits(hits)
+
+Span = Tuple[int, int, int, Hit]  # (rule index, start, end, hit)
 
-    for r in rules["rules"]:
-        kind = r["semantics"]; rx = r["_re"]
+def resolve_overlaps(spans: List[Span], after: int = 0) -> Tuple[List[Span], int]:
+    """
+    Drop hits that overlap an already kept one. Spans are taken by start,
+    then longer first, then earlier rule ("earlier rules win ties"), so
+    "fél hét órakor" stays relative_fel and "14.05-kor" stays a clock time.
+    `after` is where the last kept hit ended (for carrying across windows).
+    Returns the kept spans, rule-major, and the new `after`.
+    """
+    kept = []
+    for sp in sorted(spans, key=lambda x: (x[1], x[1] - x[2], x[0])):
+        if sp[1] >= after:
+            kept.append(sp)
+            after = sp[2]
+        elif _profile is not None:
+            _profile.count(_profile.overlap, sp[3].rule_id)
+    kept.sort(key=lambda x: (x[0], x[1]))
+    return kept, after
+
+def dispatch(text: str, rules: dict, per_rule: List[List[Tuple[int, int, tuple]]],
+             dayparts: DaypartIndex, base: Optional[int] = None,
+             offsets_only: bool = False, keep_overlaps: bool = False) -> Iterable[Hit]:
+    """Turn scan_rules() output into Hits, rule by rule in file order."""
+    spans = dispatch_spans(text, rules, per_rule, dayparts, base, offsets_only)
+    if not keep_overlaps:
+        spans, _ = resolve_overlaps(list(spans))
+    for _, _, _, rec in spans:
+        yield rec
+
+def dispatch_spans(text: str, rules: dict, per_rule: List[List[Tuple[int, int, tuple]]],
+                   dayparts: DaypartIndex, base: Optional[int] = None,
+                   offsets_only: bool = False) -> Iterable[Span]:
+    """dispatch() before overlap resolution, with each hit's rule index and span."""
+    emit = emit_offsets if offsets_only else emit_record
+    mulva = (lambda after: MULVA_FOLD_RE.match(norm(after))) if rules.get("_fold") else MULVA_RE.match
+    for k, (r, hits) in enumerate(zip(rules["rules"], per_rule)):
+        kind = r["semantics"]
+        if _profile is not None:
+            _profile.count(_profile.raw, r["id"], len(hits))
         if kind == "daypart_for_bias":
+            if _profile is not None:
+                _profile.context.add(r["id"])
             continue  # never emit
-        for m in rx.finditer(text):
-            s,e = m.start(), m.end()
+        for s, e, g in hits:
             # --- skip if 'múlva' is immediately after the match ---
             after = text[e:e+10]  # look ahead a bit
-            if re.match(r"^[\s\.,;:!?-]*múlva\b", after, re.IGNORECASE):
-                # print(f"Skipping match due to 'múlva': {m.group(0)}", file=sys.stderr)
+            if mulva(after):
+                if _profile is not None:
+                    _profile.count(_profile.mulva, r["id"])
+                # print(f"Skipping match due to 'múlva': {text[s:e]}", file=sys.stderr)
                 continue
             ctx = nearby(dayparts, s, e)
-            match_txt = m.group(0)
 
             if kind == "clock_hh_mm":
-                h, mm = int(m.group(1)), int(m.group(2))
-                yield emit_record(r["id"], match_txt, s, e, text, [h], mm)
+                h, mm = int(g[0]), int(g[1])
+                yield k, s, e, emit(r["id"], s, e, text, [h], mm, base)
 
             elif kind == "clock_words_maybe_digits":
-                hour_word = m.group(1)
-                min_digits = m.group(2)
-                min_word = m.group(3)
-                h_raw = rules["word2hour"].get(norm(hour_word))
+                hour_word = g[0]
+                min_digits = g[1]
+                min_word = g[2]
+                h_raw = lookup_hour(rules, hour_word)
                 if h_raw is None:
                     continue
                 h_cands = disambiguate_hour_candidates(h_raw, ctx)
                 if min_digits:
                     mm = int(min_digits)
                 elif min_word:
-                    mm = parse_hu_number_word(min_word)
+                    mm = parse_hu_number_word(rules, min_word)
                     if mm is None or mm > 59:
                         continue
                 else:
                     continue
-                yield emit_record(r["id"], match_txt, s, e, text, h_cands, mm)
+                yield k, s, e, emit(r["id"], s, e, text, h_cands, mm, base)
 
             elif kind == "oclock_h":
-                h = int(m.group(1))
-                yield emit_record(r["id"], match_txt, s, e, text, [h], 0)
+                h = int(g[0])
+                yield k, s, e, emit(r["id"], s, e, text, [h], 0, base)
 
             elif kind in ("half_next_hour","quarter_next_hour","threequarter_next_hour"):
-                target = m.group(1)
+                target = g[0]
                 # target can be digit or word
                 if target.isdigit():
                     to_h = int(target)
                 else:
-                    to_h = rules["word2hour"].get(norm(target), None)
+                    to_h = lookup_hour(rules, target)
                     if to_h is None:
                         continue
                 # candidates for the *incoming* hour
@@ -176,68 +515,788 @@ def extract(text: str, rules: dict) -> Iterable[dict]:
                 mm = 30 if kind == "half_next_hour" else 15 if kind == "quarter_next_hour" else 45
                 # from_h = (to_h - 1) % 24  → apply per candidate
                 hours = [ (h-1) % 24 for h in to_cands ]
-                yield emit_record(r["id"], match_txt, s, e, text, hours, mm)
+                yield k, s, e, emit(r["id"], s, e, text, hours, mm, base)
 
             elif kind == "after_minutes":
                 # groups: (Yd | Yw) ... Xh OR Xh ... (Yd | Yw)
-                g = m.groups()
                 # pick whichever is not None
                 y_digits = next((int(v) for v in (g[0], g[4]) if v and v.isdigit()), None)
                 y_word   = next((v for v in (g[1], g[5]) if v), None)
                 x_hour   = next((int(v) for v in (g[2], g[3]) if v and v.isdigit()), None)
                 if x_hour is None:
                     continue
-                y = y_digits if y_digits is not None else (parse_hu_number_word(y_word) if y_word else None)
+                y = y_digits if y_digits is not None else (parse_hu_number_word(rules, y_word) if y_word else None)
                 if y is None or y > 59:
                     continue
-                yield emit_record(r["id"], match_txt, s, e, text, [x_hour], y)
+                yield k, s, e, emit(r["id"], s, e, text, [x_hour], y, base)
 
             elif kind == "before_minutes":
-                g = m.groups()
                 y_digits = next((int(v) for v in (g[0], g[4]) if v and v.isdigit()), None)
                 y_word   = next((v for v in (g[1], g[5]) if v), None)
                 x_hour   = next((int(v) for v in (g[2], g[3]) if v and v.isdigit()), None)
                 if x_hour is None:
                     continue
-                y = y_digits if y_digits is not None else (parse_hu_number_word(y_word) if y_word else None)
+                y = y_digits if y_digits is not None else (parse_hu_number_word(rules, y_word) if y_word else None)
                 if y is None or y > 59:
                     continue
                 # (X-1):(60-Y)
                 from_h = (x_hour - 1) % 24
                 mm = (60 - y) % 60
-                yield emit_record(r["id"], match_txt, s, e, text, [from_h], mm)
+                yield k, s, e, emit(r["id"], s, e, text, [from_h], mm, base)
 
             elif kind == "oclock_word_needs_daypart":
-                word = m.group(1)
-                h_raw = rules["word2hour"].get(norm(word))
+                word = g[0]
+                h_raw = lookup_hour(rules, word)
                 if h_raw is None:
                     continue
                 h_cands = disambiguate_hour_candidates(h_raw, ctx)
-                yield emit_record(r["id"], match_txt, s, e, text, h_cands, 0)
+                yield k, s, e, emit(r["id"], s, e, text, h_cands, 0, base)
+
+CHUNK_OVERLAP = 2048  # >= longest match + 60 chars of context / 40 of daypart radius
+CHUNK_KEEP = 128      # text kept before the commit point: context, daypart radius, lookbehind
+
+def extract_chunks(chunks: Iterable[str], rules: dict, overlap: int = CHUNK_OVERLAP,
+                   base: Optional[int] = None, offsets_only: bool = False,
+                   keep_overlaps: bool = False, watchdog: Optional[Watchdog] = None) -> Iterable[Hit]:
+    """
+    extract() over a stream of text chunks, holding only a sliding window.
+    A window commits the matches that start at least `overlap` chars before
+    its end; later ones are scanned again, whole, in the next window. Yields
+    the same hits as extract() on the joined text, rule-major per window.
+    Overlap resolution only looks back, so carrying where the last kept hit
+    ended keeps it exact across windows.
+    """
+    dp = _daypart_slot(rules)
+    buf = ""
+    done = 0                           # matches starting before buf[done] are handled
+    origin = 0                         # offset of buf[0] in the whole text
+    last_end = [0] * len(rules["rules"])
+    kept_dayparts: List[Tuple[int,int,str]] = []
+    kept_end = 0                       # end of the last hit kept by resolve_overlaps (whole text)
+    chunks = iter(chunks)
+    final = False
+    while not final:
+        chunk = next(chunks, None)
+        if chunk is None:
+            final = True
+        else:
+            buf += chunk
+            if len(buf) - done < 2 * overlap:
+                continue
+        stop = len(buf) if final else len(buf) - overlap
+
+        per_rule = scan_rules(buf, rules, pos=done, last_end=last_end[:], watchdog=watchdog)
+        committed = []
+        for k, hits in enumerate(per_rule):
+            cut = len(hits)
+            while cut and hits[cut-1][0] >= stop:
+                cut -= 1
+            if cut:
+                last_end[k] = hits[cut-1][1]
+            committed.append(hits[:cut])
+        # dayparts past `stop` are provisional but still bias matches just before it
+        dayparts = kept_dayparts + [(s, e, buf[s:e]) for s, e, _ in per_rule[dp]]
+        spans = dispatch_spans(buf, rules, committed, DaypartIndex(dayparts),
+                               None if base is None else base + origin, offsets_only)
+        if not keep_overlaps:
+            spans, kept_end = resolve_overlaps([(k, origin + s, origin + e, rec)
+                                                for k, s, e, rec in spans], kept_end)
+        hits = (rec for _, _, _, rec in spans)
+        yield from hits if _profile is None else _profile.count_emits(hits)
+        if final:
+            return
+
+        shift = max(0, stop - CHUNK_KEEP)
+        buf = buf[shift:]
+        origin += shift
+        done = stop - shift
+        last_end = [max(0, x - shift) for x in last_end]
+        kept_dayparts = [(s - shift, e - shift, t)
+                         for s, e, t in dayparts[:len(kept_dayparts) + len(committed[dp])]
+                         if e >= shift]
+
+# ---------- segmented scan ----------
+SEGMENT_CHARS = 1 << 20  # text per segment task when one document is split across workers
+
+PACKED_TYPE = "i"  # int32 match records; segment-relative offsets stay far below 2**31
+TextSource = Tuple[str, str, int]  # ("shm", name, size) or ("pack", prefix, byte_start): see _segment_text
+
+def scan_segments(text: str, rules: dict, pool: Executor, watchdog: Optional[Watchdog] = None,
+                  source: Optional[TextSource] = None, size: int = SEGMENT_CHARS,
+                  overlap: int = CHUNK_OVERLAP) -> List[List[Tuple[int, int, tuple]]]:
+    """
+    scan_rules(text, rules) with the regex work spread over `pool`. Each
+    segment task scans its `size` chars plus `overlap` (>= the longest
+    match) and keeps the matches that start inside it, so no match is
+    reported twice. A match running over a boundary can shift where that
+    rule's next match starts; join_rule_hits repairs those few spots here.
+
+    Workers read their segment as a byte range of `source`, the text's
+    UTF-8 in shared memory or in a corpus pack; without one the text is
+    put in shared memory for the scan (start the pool after
+    shared_text.share_tracker()). Matches come back packed. Folded rules
+    scan the text's shadow, which is shared instead of `source`.
+    """
+    if rules.get("_fold"):
+        shadow = ShadowText(text)
+        rules = dict(rules, _fold=False)  # the shadow is scanned as is
+        return shadow.remap(scan_segments(shadow.text, rules, pool, watchdog, None, size, overlap))
+    shared = None
+    if source is None:
+        shared = SharedText.create(text)
+        source = ("shm", *shared.handle)
+    try:
+        budget = None if watchdog is None else watchdog.budget
+        cuts = []
+        for a in range(0, len(text), size):
+            lo = max(0, a - CHUNK_KEEP)  # lookbehind context
+            cuts.append((lo, a, min(len(text), a + size), min(len(text), a + size + overlap)))
+        points = sorted({c for lo, _, _, end in cuts for c in (lo, end)})
+        byte = dict(zip(points, byte_offsets(text, points)))
+        segs = [(lo, b, pool.submit(_scan_segment, source, byte[lo], byte[end], a - lo, b - lo, budget))
+                for lo, a, b, end in cuts]
+        out: List[List[Tuple[int, int, tuple]]] = [[] for _ in rules["rules"]]
+        for lo, b, fut in segs:
+            packed, seg_watchdog = fut.result()
+            if watchdog is not None:
+                watchdog.absorb(seg_watchdog)
+            for k, hits in enumerate(unpack_hits(packed, rules, text, lo)):
+                join_rule_hits(out[k], hits, text, rules["rules"][k]["_re"], b, overlap)
+        return out
+    finally:
+        if shared is not None:
+            shared.unlink()
+
+def join_rule_hits(out: List[Tuple[int, int, tuple]], hits: List[Tuple[int, int, tuple]],
+                   text: str, rx: re.Pattern, stop: int, overlap: int = CHUNK_OVERLAP) -> None:
+    """
+    Append one segment's matches of a rule (starting before `stop`) to `out`
+    as the rule's finditer over the whole text finds them. The segment
+    started its search at its own start; where the last match so far ends
+    past that, the rule is re-run from that end until it meets the
+    segment's matches again.
+    """
+    end = out[-1][1] if out else 0
+    if not hits or hits[0][0] >= end:
+        out.extend(hits)
+        return
+    starts = {s: j for j, (s, _, _) in enumerate(hits)}
+    for m in rx.finditer(text, end, min(len(text), stop + overlap)):
+        if m.start() >= stop:
+            return
+        j = starts.get(m.start())
+        if j is not None:  # same start, same match: from here on the chains agree
+            out.extend(hits[j:])
+            return
+        out.append((m.start(), m.end(), m.groups()))
+
+def unpack_hits(packed: List[bytes], rules: dict, text: str, lo: int) -> List[List[Tuple[int, int, tuple]]]:
+    """
+    A segment's packed matches as scan_rules triples. Per rule, int32
+    records of start, end, then (start, end) per group of the rule, -1 for
+    a group that didn't take part; offsets are relative to `lo` in `text`.
+    """
+    out = []
+    for r, data in zip(rules["rules"], packed):
+        flat = array(PACKED_TYPE)
+        flat.frombytes(data)
+        w = 2 + 2 * r["_re"].groups
+        starts = [s + lo for s in flat[0::w]]
+        ends = [e + lo for e in flat[1::w]]
+        groups = [[text[lo + a:lo + b] if a >= 0 else None for a, b in zip(flat[j::w], flat[j + 1::w])]
+                  for j in range(2, w, 2)]
+        out.append(list(zip(starts, ends, zip(*groups) if groups else [()] * len(starts))))
+    return out
+
+_worker_shm: Optional[SharedText] = None
+
+def _segment_text(source: TextSource, start: int, end: int) -> str:
+    """Bytes [start, end) of a document's UTF-8, from shared memory or a corpus pack."""
+    global _worker_shm, _worker_pack
+    kind, name, n = source
+    if kind == "pack":
+        if _worker_pack is None or _worker_pack[0] != name:
+            _worker_pack = (name, CorpusPack(Path(name)))
+        return _worker_pack[1].decode(n + start, n + end)
+    if _worker_shm is None or _worker_shm.handle != (name, n):
+        if _worker_shm is not None:
+            _worker_shm.close()
+        _worker_shm = SharedText.attach(name, n)  # the owner unlinks it; we only map it
+    return _worker_shm.text(start, end)
+
+def _scan_segment(source: TextSource, start: int, end: int, pos: int, stop: int,
+                  budget: Optional[float]) -> Tuple[List[bytes], Optional[Watchdog]]:
+    """scan_rules over one segment, packed for unpack_hits; matches from `stop` on are left out."""
+    seg = _segment_text(source, start, end)
+    rules = _worker_rules
+    if rules["_fold"] and seg.isascii():
+        rules = rules["_ascii"]
+    watchdog = None if budget is None else Watchdog(budget)  # the caller applies the action
+    slots = [(k, r["_gi"], r["_re"].groups) for k, r in enumerate(rules["rules"])]
+    last_end = [pos] * len(slots)
+    flats = [array(PACKED_TYPE) for _ in slots]
+    tokens = rules["_tokens"]  # None with folded rules; `source` then holds the shadow
+    if tokens is not None and watchdog is None:
+        low = seg.lower()
+        folded = tokens.fold(seg, low)
+        if folded is not None:
+            windows = candidate_windows(seg, rules, pos, low)
+            for flat, hits in zip(flats, tokens.scan_spans(seg, folded, windows, pos, last_end, stop)):
+                for s, e, spans in hits:
+                    flat.append(s)
+                    flat.append(e)
+                    flat.extend(spans)
+            return [flat.tobytes() for flat in flats], None
+    for m in _master_matches(seg, rules, pos, watchdog):
+        if m.start() >= stop:  # tries come in position order
+            break
+        for k, gi, n in slots:
+            s = m.start(gi)
+            if s < last_end[k]:
+                continue
+            e = m.end(gi)
+            last_end[k] = e
+            flat = flats[k]
+            flat.append(s)
+            flat.append(e)
+            for g in range(gi + 1, gi + 1 + n):
+                flat.extend(m.span(g))
+    return [flat.tobytes() for flat in flats], watchdog
 
 def iter_files(root: Path) -> Iterable[Path]:
+    """Files under root that a reader (see readers.READERS) understands."""
     if root.is_file():
-        if root.suffix.lower() in (".htm", ".html"):
+        if reader_for(root) is not None:
             yield root
         return
     for p in root.rglob("*"):
-        if p.suffix.lower() in (".htm", ".html"):
+        if reader_for(p) is not None:
             yield p
 
-def main(argv: List[str]) -> int:
-    if len(argv) < 2:
-        print("Usage: extractor.py <file-or-dir>", file=sys.stderr)
-        return 2
-    rules = load_rules()
-    for path in iter_files(Path(argv[1])):
+STREAM_MIN_BYTES = 8 * 1024 * 1024  # files this big go through reader.iter_text/extract_chunks
+SPLIT_MIN_BYTES = 4 * 1024 * 1024   # with --jobs, files this big are scanned in segments by all workers
+TEXT_VERSION = "t4"                 # bump when a reader's output changes
+EXTRACT_VERSION = "x5"              # bump when the hits found in the same text change
+
+@dataclass
+class RunOptions:
+    """Per-run settings, shipped as-is to --jobs workers."""
+    stream_min: int = STREAM_MIN_BYTES
+    split_min: int = SPLIT_MIN_BYTES  # documents split across workers (parallel runs only)
+    text_cache: Optional[str] = None  # TextCache directory
+    offsets_only: bool = False        # lean hits + a {"doc", "file"} record per document
+    keep_overlaps: bool = False       # skip resolve_overlaps (debugging the rules)
+    encoding_cache: Optional[str] = None  # EncodingCache directory
+    rule_budget: Optional[float] = None   # seconds of regex time per document (see Watchdog)
+    budget_action: str = "flag"           # "flag" or "skip" documents over the budget
+    engine: str = "regex"                 # one of ENGINES
+    fold: bool = False                    # --fold-accents: scan accent-folded shadows of the texts
+    batches: bool = False                 # output HitBatches for a .hits sink instead of JSON lines
+
+_worker_encodings: Optional[Tuple[str, EncodingCache]] = None
+
+def _encodings(opts: RunOptions) -> Optional[EncodingCache]:
+    """This process's EncodingCache for the run, loaded once."""
+    global _worker_encodings
+    if not opts.encoding_cache:
+        return None
+    if _worker_encodings is None or _worker_encodings[0] != opts.encoding_cache:
+        _worker_encodings = (opts.encoding_cache, EncodingCache(Path(opts.encoding_cache)))
+    return _worker_encodings[1]
+
+def _watchdog(opts: RunOptions) -> Optional[Watchdog]:
+    return None if opts.rule_budget is None else Watchdog(opts.rule_budget, opts.budget_action)
+
+def _read_failed(path: Path, e: Exception) -> str:
+    return json.dumps({"file": str(path), "error": f"read_failed: {e}"})
+
+def _over_budget(file: str, e: BudgetExceeded) -> str:
+    return json.dumps({"file": file, "error": str(e)}, ensure_ascii=False)
+
+def iter_text(path: Path, opts: RunOptions, streaming: bool) -> Iterable[str]:
+    """A document's normalized text in chunks (one, unless streaming), through the text cache if set."""
+    reader = reader_for(path) or HTML_READER
+
+    def convert() -> Iterable[str]:
+        encodings = _encodings(opts)
+        if streaming:
+            return reader.iter_text(path, encodings=encodings)
+        if _profile is not None:
+            return iter([_profile.to_text(path, reader, encodings)])
+        return iter([reader.to_text(path, encodings=encodings)])
+    if not opts.text_cache:
+        return convert()
+    cache = TextCache(Path(opts.text_cache), TEXT_VERSION)
+    sha = file_sha256(path)
+    kind = reader.name + ("-stream" if streaming else "")  # the streaming readers' text can differ
+    cached = cache.load(sha, kind)
+    return cached if cached is not None else cache.store(sha, kind, convert())
+
+Record = Union[Hit, str]  # a hit, or a document/error record already as a JSON line
+Output = Union[List[str], HitBatch]  # one document's output: JSON lines, or a HitBatch (opts.batches)
+
+def _output(records: Iterable[Record], file: str, doc_id: int, opts: RunOptions) -> Output:
+    """A document's records as JSON lines, or with opts.batches as one HitBatch without any JSON."""
+    if opts.batches:
+        batch = HitBatch()
+        for rec in records:
+            if isinstance(rec, str):
+                batch.add(json.loads(rec))
+            else:
+                batch.add_hit(rec, file)
+        return batch
+    key, value = ("doc", doc_id) if opts.offsets_only else ("file", file)
+    lines = []
+    for rec in records:
+        if not isinstance(rec, str):
+            hit = rec.to_dict()
+            hit[key] = value
+            rec = json.dumps(hit, ensure_ascii=False)
+        lines.append(rec)
+    return lines
+
+def write_output(sink, out: Output) -> None:
+    if isinstance(out, HitBatch):
+        sink.write_batch(out)
+    else:
+        sink.write_lines(out)
+
+def file_output(path: Path, rules: dict, opts: Optional[RunOptions] = None,
+                doc_id: int = 0, text: Optional[str] = None, pool: Optional[Executor] = None,
+                source: Optional[TextSource] = None) -> Output:
+    """
+    Output for one file: its hits, or a read_failed record. With
+    opts.offsets_only, a {"doc": doc_id, "file"} record comes first and the
+    hits refer to it by "doc". `text`, if given, is the file's text already
+    converted (`source`: where workers find it); with a `pool` the file is
+    scanned in segments, not streamed.
+    """
+    opts = opts or RunOptions()
+    records = _iter_file_records(path, rules, opts, doc_id, text, pool, source)
+    if _profile is not None:
+        records = _profile.time_file(str(path), records)
+    return _output(records, str(path), doc_id, opts)
+
+def _iter_file_records(path: Path, rules: dict, opts: RunOptions, doc_id: int,
+                       text: Optional[str] = None, pool: Optional[Executor] = None,
+                       source: Optional[TextSource] = None) -> Iterable[Record]:
+    lean = opts.offsets_only
+    streaming = False
+    if text is None:
         try:
-            text = html_to_text(path)
+            streaming = pool is None and path.stat().st_size >= opts.stream_min
+            chunks = iter_text(path, opts, streaming)
+            text = None if streaming else "".join(chunks)
         except Exception as e:
-            print(json.dumps({"file": str(path), "error": f"read_failed: {e}"}), flush=True)
+            yield _read_failed(path, e)
+            return
+    watchdog = _watchdog(opts)
+    errors: List[Exception] = []
+    base = 0 if lean or opts.batches else None  # JSON lines of a file carry no offset; .hits rows do
+    try:
+        if streaming:
+            if _profile is not None:
+                chunks = _profile.timed_text(chunks)
+            hits = extract_chunks(_guard_reads(chunks, errors), rules, base=base,
+                                  offsets_only=lean, keep_overlaps=opts.keep_overlaps,
+                                  watchdog=watchdog)
+        else:
+            hits = extract(text, rules, base=base, offsets_only=lean, keep_overlaps=opts.keep_overlaps,
+                           watchdog=watchdog, pool=pool, source=source)
+        if lean:
+            yield json.dumps({"doc": doc_id, "file": str(path)}, ensure_ascii=False)
+        yield from hits
+    except BudgetExceeded as e:
+        # the rest of the document is skipped; a streamed one may have hits out already
+        yield _over_budget(str(path), e)
+    if watchdog is not None:
+        watchdog.report(str(path))
+    if streaming and errors:
+        # hits before the failure are already out; flag the file as usual
+        yield _read_failed(path, errors[0])
+
+def _guard_reads(chunks: Iterable[str], errors: List[Exception]) -> Iterable[str]:
+    try:
+        yield from chunks
+    except Exception as e:
+        errors.append(e)
+
+# ---------- parallel mode ----------
+SMALL_FILE_BYTES = 256 * 1024      # files below this are batched together
+BATCH_BYTES = 4 * 1024 * 1024      # target size of one batch of small files
+BATCH_MAX_FILES = 64
+
+def plan_batches(sizes: List[int]) -> List[List[int]]:
+    """
+    Group item indices into worker tasks, largest items first so the long
+    novels start early; small ones are packed into shared batches.
+    """
+    order = sorted(range(len(sizes)), key=lambda i: (-sizes[i], i))
+    tasks: List[List[int]] = []
+    batch: List[int] = []
+    batch_bytes = 0
+    for i in order:
+        if sizes[i] >= SMALL_FILE_BYTES:
+            tasks.append([i])
             continue
-        for hit in extract(text, rules):
-            hit["file"] = str(path)
-            print(json.dumps(hit, ensure_ascii=False), flush=True)
+        batch.append(i)
+        batch_bytes += sizes[i]
+        if batch_bytes >= BATCH_BYTES or len(batch) >= BATCH_MAX_FILES:
+            tasks.append(batch)
+            batch, batch_bytes = [], 0
+    if batch:
+        tasks.append(batch)
+    return tasks
+
+def file_sizes(paths: List[Path]) -> List[int]:
+    sizes = []
+    for p in paths:
+        try:
+            sizes.append(p.stat().st_size)
+        except OSError:
+            sizes.append(0)  # let the worker report read_failed
+    return sizes
+
+def plan_tasks(paths: List[Path], sizes: Optional[List[int]] = None,
+               indices: Optional[List[int]] = None) -> List[List[Tuple[int, Path]]]:
+    """plan_batches over file sizes, as (input index, path) pairs; optionally only `indices`."""
+    sizes = file_sizes(paths) if sizes is None else sizes
+    indices = list(range(len(paths))) if indices is None else indices
+    return [[(indices[j], paths[indices[j]]) for j in batch]
+            for batch in plan_batches([sizes[i] for i in indices])]
+
+_worker_rules: Optional[dict] = None
+
+def _init_worker(engine: str = "regex", fold: bool = False) -> None:
+    global _worker_rules
+    _worker_rules = load_rules(engine=engine, fold=fold)
+
+def _run_task(task: List[Tuple[int, Path]], opts: RunOptions) -> List[Tuple[int, Output]]:
+    return [(i, file_output(p, _worker_rules, opts, i)) for i, p in task]
+
+def _share_text(path: Path, opts: RunOptions) -> Tuple[str, int]:
+    """Convert a file and leave its text in shared memory for the parent (which unlinks it)."""
+    streaming = path.stat().st_size >= opts.stream_min  # no whole-document soup for huge pages
+    shared = SharedText.create("".join(iter_text(path, opts, streaming=streaming)))
+    shared.close()
+    return shared.handle
+
+def run_parallel(paths: List[Path], jobs: int, ordered: bool = True,
+                 opts: Optional[RunOptions] = None) -> Iterable[Tuple[int, Output]]:
+    """
+    Yield (index into paths, output) per file from a pool of `jobs`
+    worker processes, in input order or (ordered=False) as soon as done.
+    Files of opts.split_min bytes and more are converted by a worker first,
+    then, as each conversion is done, scanned in segments by all of them
+    (see scan_segments) and dispatched here, so one huge file doesn't keep
+    a single worker busy long after the others are done. Their text stays
+    in shared memory; only names, offsets and packed matches cross the pipes.
+    """
+    opts = opts or RunOptions()
+    sizes = file_sizes(paths)
+    big = [i for i, n in enumerate(sizes) if n >= opts.split_min]
+    rest = [i for i, n in enumerate(sizes) if n < opts.split_min]
+    if big:
+        share_tracker()
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(opts.engine, opts.fold)) as pool:
+        texts = {pool.submit(_share_text, paths[i], opts): i for i in big}  # conversions go first
+        futures = [pool.submit(_run_task, t, opts) for t in plan_tasks(paths, sizes, rest)]
+        rules = load_rules(engine=opts.engine, fold=opts.fold) if big else None
+
+        def scan_big(fut: Future) -> List[Tuple[int, Output]]:
+            i = texts[fut]
+            try:
+                shared = SharedText.attach(*fut.result())
+            except Exception as e:
+                return [(i, _output([_read_failed(paths[i], e)], str(paths[i]), i, opts))]
+            try:
+                return [(i, file_output(paths[i], rules, opts, i, shared.text(), pool,
+                                        ("shm", *shared.handle)))]
+            finally:
+                shared.unlink()
+
+        yield from _collect(futures + list(texts), ordered,
+                            finish=lambda fut: scan_big(fut) if fut in texts else fut.result())
+
+def _collect(futures: list, ordered: bool,
+             finish: Optional[Callable[[Future], List[Tuple[int, Output]]]] = None,
+             parent: Iterable[Callable[[], List[Tuple[int, Output]]]] = ()) -> Iterable[Tuple[int, Output]]:
+    """
+    (index, output) from task futures, in index order or as they complete.
+    `finish` turns a done future into its (index, output) pairs when that is
+    more than its result; futures done together are finished in list order.
+    `parent` jobs (big documents scanned in segments) run here one at a
+    time, each after the tasks done by then are handed on.
+    """
+    finish = finish or Future.result
+    jobs = list(parent)
+    waiting = list(futures)
+    pending: Dict[int, Output] = {}
+    next_idx = 0
+    while waiting or jobs:
+        done = [fut for fut in waiting if fut.done()]
+        if not done and not jobs:
+            wait(waiting, return_when=FIRST_COMPLETED)
+            continue
+        if done:
+            finished = set(done)
+            waiting = [fut for fut in waiting if fut not in finished]
+            batches = map(finish, done)
+        else:
+            batches = [jobs.pop(0)()]
+        for results in batches:
+            for i, out in results:
+                if not ordered:
+                    yield i, out
+                    continue
+                pending[i] = out
+                while next_idx in pending:
+                    yield next_idx, pending.pop(next_idx)
+                    next_idx += 1
+
+def run_serial(paths: List[Path], opts: Optional[RunOptions] = None) -> Iterable[Tuple[int, Output]]:
+    opts = opts or RunOptions()
+    rules = load_rules(engine=opts.engine, fold=opts.fold)
+    for i, p in enumerate(paths):
+        yield i, file_output(p, rules, opts, i)
+
+def run_incremental(paths: List[Path], manifest: HitManifest, jobs: int, ordered: bool,
+                    opts: RunOptions, sink) -> None:
+    """Write output for all paths, re-extracting only files the manifest can't vouch for."""
+    cached: Dict[int, List[str]] = {}
+    todo: List[Path] = []
+    fingerprints: List[Optional[dict]] = []
+    for i, p in enumerate(paths):
+        lines, fp = manifest.check(p)
+        if lines is None:
+            todo.append(p)
+            fingerprints.append(fp)
+        else:
+            cached[i] = lines
+    print(f"[manifest] {len(cached)} cached, {len(todo)} to extract", file=sys.stderr)
+
+    fresh = run_serial(todo, opts) if jobs == 1 else \
+        run_parallel(todo, jobs, ordered=ordered, opts=opts)
+    try:
+        if not ordered:
+            for lines in cached.values():
+                sink.write_lines(lines)
+        fresh = iter(fresh)
+        for i in range(len(paths)) if ordered else []:
+            if i in cached:
+                sink.write_lines(cached[i])
+                continue
+            j, lines = next(fresh)
+            manifest.store(todo[j], fingerprints[j], lines)
+            sink.write_lines(lines)
+        for j, lines in fresh:  # unordered: whatever is left, as it finishes
+            manifest.store(todo[j], fingerprints[j], lines)
+            sink.write_lines(lines)
+    finally:
+        manifest.save()
+
+# ---------- corpus pack mode ----------
+def doc_output(pack: CorpusPack, doc: Doc, rules: dict, opts: RunOptions,
+               pool: Optional[Executor] = None, prefix: Optional[str] = None) -> Output:
+    """
+    Output for one packed document; hits carry their global "offset".
+    With a `pool` it is scanned in segments, which workers read from the
+    pack at `prefix`.
+    """
+    records = _iter_doc_records(pack, doc, rules, opts, pool, prefix)
+    if _profile is not None:
+        records = _profile.time_file(doc.file, records)
+    return _output(records, doc.file, doc.id, opts)
+
+def _iter_doc_records(pack: CorpusPack, doc: Doc, rules: dict, opts: RunOptions,
+                      pool: Optional[Executor] = None, prefix: Optional[str] = None) -> Iterable[Record]:
+    lean = opts.offsets_only
+    base = 0 if lean else doc.char_start  # lean offsets are document-relative, like file mode's
+    watchdog = _watchdog(opts)
+    try:
+        if pool is None and doc.byte_end - doc.byte_start >= opts.stream_min:
+            hits = extract_chunks(pack.iter_text(doc), rules, base=base, offsets_only=lean,
+                                  keep_overlaps=opts.keep_overlaps, watchdog=watchdog)
+        else:
+            hits = extract(pack.text(doc), rules, base=base, offsets_only=lean,
+                           keep_overlaps=opts.keep_overlaps, watchdog=watchdog, pool=pool,
+                           source=None if prefix is None else ("pack", prefix, doc.byte_start))
+        if lean:
+            yield json.dumps({"doc": doc.id, "file": doc.file}, ensure_ascii=False)
+        yield from hits
+    except BudgetExceeded as e:
+        yield _over_budget(doc.file, e)
+    if watchdog is not None:
+        watchdog.report(doc.file)
+
+_worker_pack: Optional[Tuple[str, CorpusPack]] = None
+
+def _run_corpus_task(prefix: str, doc_ids: List[int], opts: RunOptions) -> List[Tuple[int, Output]]:
+    global _worker_pack
+    if _worker_pack is None or _worker_pack[0] != prefix:
+        _worker_pack = (prefix, CorpusPack(Path(prefix)))  # each worker maps the blob once
+    pack = _worker_pack[1]
+    return [(i, doc_output(pack, pack.docs[i], _worker_rules, opts)) for i in doc_ids]
+
+def run_corpus(prefix: Path, jobs: int, ordered: bool = True,
+               opts: Optional[RunOptions] = None) -> Iterable[Tuple[int, Output]]:
+    """
+    Yield (document id, output) for a corpus pack. Workers map the blob
+    themselves, so no document text crosses a pipe; documents of
+    opts.split_min bytes and more are scanned in segments by all workers.
+    Documents that failed at pack time come first, as id -1 read_failed
+    records.
+    """
+    opts = opts or RunOptions()
+    pack = CorpusPack(prefix)
+    try:
+        if pack.errors:
+            yield -1, _output([json.dumps(e) for e in pack.errors], "", -1, opts)
+        if jobs == 1:
+            rules = load_rules(engine=opts.engine, fold=opts.fold)
+            for doc in pack.docs:
+                yield doc.id, doc_output(pack, doc, rules, opts)
+            return
+        sizes = [d.byte_end - d.byte_start for d in pack.docs]
+        big = [i for i, n in enumerate(sizes) if n >= opts.split_min]
+        rest = [i for i, n in enumerate(sizes) if n < opts.split_min]
+        if big:
+            share_tracker()  # scan_segments falls back to shared memory for non-pack sources
+        with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker,
+                                 initargs=(opts.engine, opts.fold)) as pool:
+            futures = [pool.submit(_run_corpus_task, str(prefix), [rest[j] for j in batch], opts)
+                       for batch in plan_batches([sizes[i] for i in rest])]
+            rules = load_rules(engine=opts.engine, fold=opts.fold) if big else None
+            # scanned in segments by all workers (see scan_segments), between collecting the rest
+            parent = [lambda i=i: [(i, doc_output(pack, pack.docs[i], rules, opts, pool, str(prefix)))]
+                      for i in big]
+            yield from _collect(futures, ordered, parent=parent)
+    finally:
+        pack.close()
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog=Path(argv[0]).name,
+                                 description="Extract time expressions from HTML files as JSON lines.")
+    ap.add_argument("root", nargs="?", help="file or directory to scan")
+    ap.add_argument("--corpus", metavar="PREFIX",
+                    help="scan a corpus pack (see corpus_pack.py) instead of a file tree")
+    ap.add_argument("-j", "--jobs", type=int, default=1,
+                    help="worker processes (0 = one per CPU, default 1 = no pool)")
+    ap.add_argument("--unordered", action="store_true",
+                    help="with --jobs: print each file as soon as it is done instead of in input order")
+    ap.add_argument("--stream-above", type=float, default=STREAM_MIN_BYTES / 2**20, metavar="MB",
+                    help="stream files at least this big in bounded memory (default %(default)g)")
+    ap.add_argument("--split-above", type=float, default=SPLIT_MIN_BYTES / 2**20, metavar="MB",
+                    help="with --jobs: scan files at least this big in segments on all workers "
+                         "(default %(default)g)")
+    ap.add_argument("--manifest", metavar="DIR",
+                    help="keep per-file hits in DIR and only re-extract new or changed files")
+    ap.add_argument("--text-cache", metavar="DIR",
+                    help="reuse/store each document's converted text in DIR (keyed by content hash)")
+    ap.add_argument("--encoding-cache", metavar="DIR",
+                    help="remember each source file's detected charset in DIR and skip detection "
+                         "while the file is unchanged")
+    ap.add_argument("-o", "--out", metavar="PATH",
+                    help="write hits to PATH instead of stdout: .jsonl, .jsonl.gz, .jsonl.zst "
+                         "or the compact binary .hits (see hit_sink.py)")
+    ap.add_argument("--offsets-only", action="store_true",
+                    help="lean hits: doc id, start/end, rule and minute(s), no match/context text "
+                         "(add those later with hit_context.py)")
+    ap.add_argument("--keep-overlaps", action="store_true",
+                    help="emit every rule's hit even where hits overlap (default: first/longest wins)")
+    ap.add_argument("--shard", type=parse_shard, metavar="K/N",
+                    help="only extract shard K of N of the tree (see shards.py for the plan and the merge)")
+    ap.add_argument("--rule-budget", type=float, metavar="SECONDS",
+                    help="time the rules on each document and act on those whose regex time "
+                         "goes over SECONDS (see --on-budget)")
+    ap.add_argument("--on-budget", choices=("flag", "skip"), default="flag",
+                    help="flag: report over-budget documents on stderr and keep their hits; "
+                         "skip: stop scanning them and emit a rule_budget error record "
+                         "(default %(default)s)")
+    ap.add_argument("--engine", choices=ENGINES, default="regex",
+                    help="regex: the rules' combined pattern; tokens: the token-stream grammar "
+                         "(token_engine.py), same output (default %(default)s)")
+    ap.add_argument("--fold-accents", action="store_true",
+                    help="match the rules accent- and case-insensitively on a folded copy of each "
+                         "text, so \"5 ora\" (OCR, plain ASCII) matches too; match and context "
+                         "text still come from the original")
+    ap.add_argument("--profile", action="store_true",
+                    help="print per-rule match/drop counters and per-file timings to stderr at exit")
+    args = ap.parse_args(argv[1:])
+    if (args.root is None) == (args.corpus is None):
+        ap.error("give either a file/directory or --corpus PREFIX")
+    if args.corpus and (args.manifest or args.text_cache or args.encoding_cache):
+        ap.error("--corpus reads pre-converted text; --manifest/--text-cache/--encoding-cache don't apply")
+    if args.offsets_only and args.manifest:
+        ap.error("--offsets-only numbers documents per run; it can't reuse --manifest hits")
+    if args.keep_overlaps and args.manifest:
+        ap.error("--keep-overlaps is for debugging runs; it can't share --manifest hits")
+    if args.shard and (args.corpus or args.unordered):
+        ap.error("--shard splits a file tree and keeps its output in path order; "
+                 "not with --corpus/--unordered")
+    if args.profile and args.jobs != 1:
+        ap.error("--profile counts in-process; use it with -j 1")
+    if args.rule_budget is not None and args.profile:
+        ap.error("--profile already times every rule; --rule-budget doesn't apply")
+    if args.engine == "tokens" and (args.profile or args.rule_budget is not None):
+        ap.error("--profile and --rule-budget time the regex rules; use them with --engine regex")
+    if args.engine == "tokens" and args.fold_accents:
+        ap.error("--fold-accents runs the regex rules; use it with --engine regex")
+    if args.engine == "tokens":
+        try:
+            load_rules(engine="tokens")
+        except ValueError as e:
+            ap.error(str(e))
+    if args.manifest and args.out and Path(args.out).suffix == BINARY_SUFFIX:
+        ap.error("--manifest keeps JSON lines, which have no offsets for .hits; write .jsonl")
+    if args.rule_budget is not None and args.on_budget == "skip" and args.manifest:
+        ap.error("--on-budget skip output depends on the machine's speed; it can't go into --manifest")
+    opts = RunOptions(stream_min=int(args.stream_above * 2**20), split_min=int(args.split_above * 2**20),
+                      text_cache=args.text_cache,
+                      offsets_only=args.offsets_only, keep_overlaps=args.keep_overlaps,
+                      encoding_cache=args.encoding_cache, rule_budget=args.rule_budget,
+                      budget_action=args.on_budget, engine=args.engine,
+                      fold=args.fold_accents,
+                      batches=bool(args.out) and Path(args.out).suffix == BINARY_SUFFIX)
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    global _profile
+    if args.profile:
+        _profile = Profile()
+    out = Path(args.out) if args.out else None
+    sink = open_sink(out)
+    files: Iterable[Path] = iter_files(Path(args.root)) if args.root else ()
+    shard = None
+    if args.shard:
+        files, size = shard_paths(files, Path(args.root), *args.shard)
+        sink = shard = ShardSink(sink, *args.shard, len(files), size)
+    try:
+        if args.corpus:
+            for _, output in run_corpus(Path(args.corpus), jobs, ordered=not args.unordered, opts=opts):
+                write_output(sink, output)
+        elif args.manifest:
+            # stored hits depend on the rules, the readers and the extractor itself
+            rules_hash = f"{file_sha256(RULES_PATH)}+{TEXT_VERSION}+{EXTRACT_VERSION}" + \
+                ("+fold" if opts.fold else "")
+            manifest = HitManifest(Path(args.manifest), rules_hash)
+            run_incremental(list(files), manifest, jobs,
+                            ordered=not args.unordered, opts=opts, sink=sink)
+        elif jobs == 1:
+            rules = load_rules(engine=opts.engine, fold=opts.fold)
+            for i, path in enumerate(files):
+                write_output(sink, file_output(path, rules, opts, i))
+        else:
+            paths = list(files)
+            for _, output in run_parallel(paths, jobs, ordered=not args.unordered, opts=opts):
+                write_output(sink, output)
+    finally:
+        sink.close()
+        if shard is not None:
+            shard.save(out)
+        if args.encoding_cache:
+            _encodings(opts).compact()
+        if _profile is not None:
+            _profile.report()
     return 0
 
 if __name__ == "__main__":
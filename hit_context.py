@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Turn `extractor.py --offsets-only` output back into full hit records: the
+match text and a context window of any width, fetched lazily per document.
+
+    python hit_context.py hits.jsonl [--width 60] [--text-cache DIR | --corpus PREFIX] [-o OUT]
+
+Hits are read in batches; each batch loads every document it references
+once, from the corpus pack, the text cache or by re-converting the source
+file, and drops the text again before the next batch. With the default
+width the records equal what a normal extractor run prints.
+"""
+from __future__ import annotations
+
+import argparse, json, sys
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from hit_records import CONTEXT_CHARS, Hit
+from hit_sink import BINARY_SUFFIX, iter_hits, open_sink
+
+BATCH_HITS = 50_000
+
+def file_text_loader(text_cache: Optional[str] = None) -> Callable[[str], str]:
+    """Document text by source path, through the text cache when given (same text as the run)."""
+    from extractor import RunOptions, iter_text
+
+    opts = RunOptions(text_cache=text_cache)
+    def load(file: str) -> str:
+        path = Path(file)
+        return "".join(iter_text(path, opts, streaming=path.stat().st_size >= opts.stream_min))
+    return load
+
+def resolve(hits: Iterable[dict], load_text: Callable[[dict], str], width: int = CONTEXT_CHARS,
+            batch: int = BATCH_HITS) -> Iterable[dict]:
+    """
+    Full records for offsets-only `hits`, in input order. `load_text` gets a
+    document record ({"doc", "file"}) and returns its text. Document records
+    are consumed; other records (read_failed) pass through.
+    """
+    docs: Dict[int, dict] = {}
+    pending: List[dict] = []
+
+    def flush() -> Iterable[dict]:
+        texts: Dict[int, str] = {}
+        for hit in pending:
+            if "rule_id" not in hit:
+                yield hit
+                continue
+            d = hit["doc"]
+            if d not in texts:
+                texts[d] = load_text(docs[d])
+            yield materialize(hit, texts[d], docs[d], width)
+        pending.clear()
+
+    for hit in hits:
+        if "rule_id" not in hit and "error" not in hit:
+            docs[hit["doc"]] = hit
+            continue
+        pending.append(hit)
+        if len(pending) >= batch:
+            yield from flush()
+    yield from flush()
+
+def materialize(hit: dict, text: str, doc: dict, width: int) -> dict:
+    """One offsets-only hit as the extractor would have printed it."""
+    rec = Hit(hit["rule_id"], hit["start"], hit["end"], hit["minute"],
+              tuple(hit.get("minute_candidates") or ()), text, doc.get("char_start")).to_dict(width)
+    rec["file"] = doc["file"]
+    return rec
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog=Path(argv[0]).name, description=__doc__.split("\n\n")[0])
+    ap.add_argument("hits", help="offsets-only hits (.jsonl, .jsonl.gz, .jsonl.zst)")
+    ap.add_argument("--width", type=int, default=CONTEXT_CHARS,
+                    help="context characters on each side (default %(default)d)")
+    src = ap.add_mutually_exclusive_group()
+    src.add_argument("--corpus", metavar="PREFIX", help="hits came from this corpus pack")
+    src.add_argument("--text-cache", metavar="DIR", help="read document text from this text cache")
+    ap.add_argument("-o", "--out", metavar="PATH", help="write here instead of stdout")
+    args = ap.parse_args(argv[1:])
+    if Path(args.hits).suffix == BINARY_SUFFIX:
+        ap.error(f"{args.hits}: {BINARY_SUFFIX} files keep neither match ends nor document ids; "
+                 "resolve the offsets-only JSON lines instead")
+
+    pack = None
+    if args.corpus:
+        from corpus_pack import CorpusPack
+
+        pack = CorpusPack(Path(args.corpus))
+        def load_text(doc: dict) -> str:
+            d = pack.docs[doc["doc"]]
+            doc["char_start"] = d.char_start  # full records carry the pack offset
+            return pack.text(d)
+    else:
+        by_file = file_text_loader(args.text_cache)
+        load_text = lambda doc: by_file(doc["file"])
+    sink = open_sink(Path(args.out) if args.out else None)
+    try:
+        for rec in resolve(iter_hits(Path(args.hits)), load_text, args.width):
+            sink.write_lines([json.dumps(rec, ensure_ascii=False)])
+    finally:
+        sink.close()
+        if pack is not None:
+            pack.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
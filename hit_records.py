@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Compact hit records for in-process work; dicts and JSON only at the output
+boundary.
+
+    Hit       one hit: rule id, span, minute or 12h candidates, and the text
+              the span points into. The match and context are cut from that
+              text only by to_dict(), which gives the extractor's JSON record.
+    HitBatch  many hits as typed array columns, the layout of a .hits block
+              (see hit_sink.py), with rule ids, file names and error kinds
+              interned in shared HitTables: about 16 bytes a hit.
+"""
+from __future__ import annotations
+
+from array import array
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+CONTEXT_CHARS = 60  # context on each side of the match in full records
+ERROR_RULE = 255    # HitBatch rule index of an error record
+
+class Hit(NamedTuple):
+    rule_id: str
+    start: int                   # span in `text` (offsets-only: in the document)
+    end: int
+    minute: Optional[int]        # None: ambiguous, see candidates
+    candidates: Tuple[int, ...]  # sorted minutes of an ambiguous 12h hit
+    text: Optional[str] = None   # None for --offsets-only hits
+    base: Optional[int] = None   # global offset of text[0], if known
+
+    def to_dict(self, width: int = CONTEXT_CHARS) -> dict:
+        """The JSON record: with match and context, or for --offsets-only (no text) with start/end."""
+        s, e, m = self.start, self.end, self.minute
+        if self.text is None:
+            base = self.base or 0
+            rec = {"rule_id": self.rule_id, "start": base + s, "end": base + e, "minute": m}
+        else:
+            rec = {"rule_id": self.rule_id, "match": self.text[s:e]}
+            if m is not None:
+                rec["norm_time"] = f"{m // 60:02d}:{m % 60:02d}"
+            rec["minute"] = m
+        if m is None:
+            rec["minute_candidates"] = list(self.candidates)
+            rec["ambiguous_12h"] = True
+        if self.text is not None:
+            text = self.text
+            rec["context"] = text[max(0, s - width):min(len(text), e + width)].strip()
+            if self.base is not None:
+                rec["offset"] = self.base + s
+        return rec
+
+class HitTables:
+    """The rule ids, file names and error kinds a stream of HitBatches indexes into."""
+    def __init__(self, rules: Iterable[str] = (), files: Iterable[str] = (), errors: Iterable[str] = ()):
+        self.rules, self.files, self.errors = list(rules), list(files), list(errors)
+        self._index = [{v: i for i, v in enumerate(t)} for t in (self.rules, self.files, self.errors)]
+        self.docs: Dict[int, str] = {}  # --offsets-only document records: doc id -> file
+
+    def _intern(self, k: int, names: List[str], key: str) -> int:
+        i = self._index[k].get(key)
+        if i is None:
+            i = self._index[k][key] = len(names)
+            names.append(key)
+        return i
+
+    def rule(self, rule_id: str) -> int:
+        i = self._intern(0, self.rules, rule_id)
+        if i >= ERROR_RULE:
+            raise ValueError("too many distinct rule ids for the .hits format")
+        return i
+
+    def file(self, name: str) -> int:
+        return self._intern(1, self.files, name)
+
+    def error(self, kind: str) -> int:
+        return self._intern(2, self.errors, kind)
+
+class HitBatch:
+    """
+    Hits as columns: rule (index into tables.rules; ERROR_RULE for an error
+    record, whose minute then indexes tables.errors), minute (-1: none),
+    file (index into tables.files), offset (match start; -1: not known),
+    ncand, and the minute candidates of all rows in `cand`.
+    """
+    def __init__(self, tables: Optional[HitTables] = None):
+        self.tables = tables if tables is not None else HitTables()
+        self.clear()
+
+    def clear(self) -> None:
+        self.rule, self.minute = array("B"), array("h")
+        self.file, self.offset = array("I"), array("q")
+        self.ncand, self.cand = array("B"), array("h")
+
+    def __len__(self) -> int:
+        return len(self.rule)
+
+    @property
+    def columns(self) -> Tuple[array, ...]:
+        return self.rule, self.minute, self.file, self.offset, self.ncand, self.cand
+
+    def add_hit(self, hit: Hit, file: str) -> None:
+        """Append one Hit of `file`; its offset is where the match starts (global if hit.base is)."""
+        self.rule.append(self.tables.rule(hit.rule_id))
+        self.minute.append(-1 if hit.minute is None else hit.minute)
+        self.file.append(self.tables.file(file))
+        self.offset.append((hit.base or 0) + hit.start)
+        self.ncand.append(len(hit.candidates))
+        self.cand.extend(hit.candidates)
+
+    def extend(self, other: HitBatch) -> None:
+        """Append the rows of a batch with other tables, re-indexed into these."""
+        t, o = self.tables, other.tables
+        rules = [t.rule(r) for r in o.rules]
+        files = [t.file(f) for f in o.files]
+        errors = [t.error(e) for e in o.errors]
+        self.rule.extend(r if r == ERROR_RULE else rules[r] for r in other.rule)
+        self.minute.extend(errors[m] if r == ERROR_RULE else m for r, m in zip(other.rule, other.minute))
+        self.file.extend(files[f] for f in other.file)
+        self.offset.extend(other.offset)
+        self.ncand.extend(other.ncand)
+        self.cand.extend(other.cand)
+
+    def add(self, hit: dict) -> None:
+        """Append one JSON record; a document record only goes into tables.docs."""
+        t = self.tables
+        if "rule_id" not in hit and "error" not in hit:
+            t.docs[hit["doc"]] = hit["file"]
+            return
+        if "rule_id" in hit:
+            rule = t.rule(hit["rule_id"])
+            minute = hit.get("minute")
+        else:
+            rule = ERROR_RULE
+            minute = t.error(hit["error"].split(":", 1)[0])
+        cands = hit.get("minute_candidates") or ()
+        self.rule.append(rule)
+        self.minute.append(-1 if minute is None else minute)
+        self.file.append(t.file(hit["file"] if "file" in hit else t.docs.get(hit.get("doc"), "")))
+        self.offset.append(hit.get("offset", hit.get("start", -1)))
+        self.ncand.append(len(cands))
+        self.cand.extend(cands)
+
+    def iter_dicts(self) -> Iterable[dict]:
+        """The rows as records like the JSON ones (errors carry only their kind)."""
+        t = self.tables
+        c = 0
+        for i in range(len(self.rule)):
+            hit: dict = {"file": t.files[self.file[i]]}
+            n = self.ncand[i]
+            if self.rule[i] == ERROR_RULE:
+                e = self.minute[i]
+                hit["error"] = t.errors[e] if 0 <= e < len(t.errors) else "read_failed"
+            else:
+                hit["rule_id"] = t.rules[self.rule[i]]
+                m = self.minute[i]
+                if m >= 0:
+                    hit["norm_time"] = f"{m // 60:02d}:{m % 60:02d}"
+                    hit["minute"] = m
+                else:
+                    hit["minute"] = None
+                    hit["minute_candidates"] = list(self.cand[c:c + n])
+                    hit["ambiguous_12h"] = True
+            if self.offset[i] >= 0:
+                hit["offset"] = self.offset[i]
+            c += n
+            yield hit
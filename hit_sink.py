@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Where extractor output goes. Sinks take the extractor's JSON lines a file at
+a time and write them in bulk instead of one flushed print per hit:
+
+    JsonlSink    plain, .gz or .zst JSON lines (zstd needs `zstandard`)
+    BinaryHitSink  the compact .hits format below
+
+A .hits file keeps what the stats and the database seeding need, not the
+match/context text:
+
+    b"LCHITS1\\n"
+    blocks: b"BLK1" <u32 n>, then n-long little-endian columns
+            rule u8 | minute i16 | file u32 | offset i64 | ncand u8,
+            then sum(ncand) i16 minute candidates
+    trailer: JSON {"rules": [...], "files": [...], "errors": [...]},
+             <u64 trailer start>, b"LCHITEND"
+
+Rule ids and file names are stored once, in the trailer tables. offset is
+where the match starts, as in the records' "offset" or "start": within
+the corpus pack for full --corpus runs, else within the document. minute
+-1 means "none" (ambiguous records), offset -1 "not known" (JSON lines of
+a plain file run carry no offset), and rule 255 marks an error record;
+its minute indexes the error kinds ("read_failed", "rule_budget"), the
+text before the first ":" of the message. For --offsets-only output the
+document records fill the file table. iter_hits() reads
+any of the formats back as dicts, iter_batches() as HitBatch columns (see
+hit_records.py) without a dict per hit.
+"""
+from __future__ import annotations
+
+import gzip, io, json, struct, sys
+from array import array
+from pathlib import Path
+from typing import BinaryIO, Iterable, List, Optional, TextIO
+
+from hit_records import HitBatch, HitTables
+
+MAGIC = b"LCHITS1\n"
+BLOCK_TAG = b"BLK1"
+END_TAG = b"LCHITEND"
+BLOCK_RECORDS = 1 << 16
+WRITE_BUFFER = 1 << 20
+BINARY_SUFFIX = ".hits"
+
+def _le(a: array) -> bytes:
+    if sys.byteorder != "little":
+        a = array(a.typecode, a)
+        a.byteswap()
+    return a.tobytes()
+
+def _from_le(typecode: str, data: bytes) -> array:
+    a = array(typecode)
+    a.frombytes(data)
+    if sys.byteorder != "little":
+        a.byteswap()
+    return a
+
+def _open_zstd(path: Path, mode: str):
+    try:
+        import zstandard
+    except ImportError:
+        raise SystemExit(f"{path}: reading/writing .zst needs the `zstandard` package")
+    return zstandard.open(path, mode, encoding="utf-8")
+
+def open_text(path: Path, mode: str) -> TextIO:
+    """`path` as text ("r"/"w"), through gzip or zstd when the suffix says so."""
+    path = Path(path)
+    if path.suffix == ".gz":
+        return gzip.open(path, mode + "t", encoding="utf-8", compresslevel=6) \
+            if mode == "w" else gzip.open(path, "rt", encoding="utf-8")
+    if path.suffix == ".zst":
+        return _open_zstd(path, mode + "t")
+    return path.open(mode, encoding="utf-8", buffering=WRITE_BUFFER)
+
+class JsonlSink:
+    """JSON lines to a file (compressed by suffix) or, with no path, to stdout."""
+    def __init__(self, path: Optional[Path] = None):
+        self._out = open_text(path, "w") if path else sys.stdout
+        self._own = path is not None
+
+    def write_lines(self, lines: List[str]) -> None:
+        if lines:
+            self._out.write("\n".join(lines) + "\n")
+
+    def close(self) -> None:
+        if self._own:
+            self._out.close()
+        else:
+            self._out.flush()
+
+class BinaryHitSink:
+    """The .hits format; records are buffered into a HitBatch per block."""
+    def __init__(self, path: Path):
+        self._out: BinaryIO = Path(path).open("wb", buffering=WRITE_BUFFER)
+        self._out.write(MAGIC)
+        self._batch = HitBatch()
+
+    def write_lines(self, lines: List[str]) -> None:
+        for line in lines:
+            self.add(json.loads(line))
+
+    def add(self, hit: dict) -> None:
+        self._batch.add(hit)
+        if len(self._batch) >= BLOCK_RECORDS:
+            self._flush_block()
+
+    def write_batch(self, batch: HitBatch) -> None:
+        """A file's hits straight from the extractor (no JSON on the way)."""
+        self._batch.extend(batch)
+        if len(self._batch) >= BLOCK_RECORDS:
+            self._flush_block()
+
+    def _flush_block(self) -> None:
+        if not len(self._batch):
+            return
+        self._out.write(BLOCK_TAG + struct.pack("<I", len(self._batch)))
+        for col in self._batch.columns:
+            self._out.write(_le(col))
+        self._batch.clear()
+
+    def close(self) -> None:
+        self._flush_block()
+        start = self._out.tell()
+        t = self._batch.tables
+        self._out.write(json.dumps({"rules": t.rules, "files": t.files, "errors": t.errors},
+                                   ensure_ascii=False).encode("utf-8"))
+        self._out.write(struct.pack("<Q", start) + END_TAG)
+        self._out.close()
+
+def open_sink(path: Optional[Path]):
+    """The sink for an output path: .hits is binary, anything else JSON lines."""
+    if path is not None and Path(path).suffix == BINARY_SUFFIX:
+        return BinaryHitSink(path)
+    return JsonlSink(path)
+
+# ---------- reading ----------
+def _iter_binary(path: Path) -> Iterable[HitBatch]:
+    with Path(path).open("rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path}: not a .hits file")
+        f.seek(-16, io.SEEK_END)
+        trailer_start, tag = struct.unpack("<Q8s", f.read(16))
+        if tag != END_TAG:
+            raise ValueError(f"{path}: truncated .hits file")
+        end = f.seek(trailer_start)
+        data = json.loads(f.read()[:-16].decode("utf-8"))
+        tables = HitTables(data["rules"], data["files"], data.get("errors", []))  # older files: no errors
+        f.seek(len(MAGIC))
+        while f.tell() < end:
+            tag, n = struct.unpack("<4sI", f.read(8))
+            if tag != BLOCK_TAG:
+                raise ValueError(f"{path}: bad block at {f.tell() - 8}")
+            batch = HitBatch(tables)
+            batch.rule = _from_le("B", f.read(n))
+            batch.minute = _from_le("h", f.read(2 * n))
+            batch.file = _from_le("I", f.read(4 * n))
+            batch.offset = _from_le("q", f.read(8 * n))
+            batch.ncand = _from_le("B", f.read(n))
+            batch.cand = _from_le("h", f.read(2 * sum(batch.ncand)))
+            yield batch
+
+def iter_batches(path: Path, size: int = BLOCK_RECORDS) -> Iterable[HitBatch]:
+    """
+    Hit records from any sink's output as HitBatches sharing one HitTables:
+    a .hits file block by block, JSON lines `size` records at a time.
+    """
+    if Path(path).suffix == BINARY_SUFFIX:
+        yield from _iter_binary(path)
+        return
+    batch = HitBatch()
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                batch.add(json.loads(line))
+                if len(batch) >= size:
+                    yield batch
+                    batch = HitBatch(batch.tables)
+    if len(batch):
+        yield batch
+
+def iter_hits(path: Path) -> Iterable[dict]:
+    """Hit records from any sink's output, as dicts."""
+    if Path(path).suffix == BINARY_SUFFIX:
+        for batch in _iter_binary(path):
+            yield from batch.iter_dicts()
+        return
+    with open_text(path, "r") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def main(argv: List[str]) -> int:
+    if len(argv) != 3:
+        print("Usage: hit_sink.py <in.jsonl|.gz|.zst|.hits> <out.jsonl|.gz|.zst|.hits>",
+              file=sys.stderr)
+        return 2
+    sink = open_sink(Path(argv[2]))
+    try:
+        for hit in iter_hits(Path(argv[1])):
+            sink.write_lines([json.dumps(hit, ensure_ascii=False)])
+    finally:
+        sink.close()
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Hungarian number words 0–59, precomputed from a rules file's "number_words"
+(see rules.json5): the spellings of each number in words, and one table
+from every accepted spelling to its value.
+
+    spellings(nw)       {n: ["kettő", "két"], ...}  accented, for search terms
+    number_table(nw)    {"huszonkét": 22, "huszonket": 22, "Huszonkét": 22, ...}
+    parse_number(t, w)  w's value, or None
+
+The table holds each spelling accented and accent-folded, lowercase,
+Capitalized and UPPER, so the words running text uses are one dict lookup;
+other mixes (decomposed accents, "hÚsz") fall back to rule_pack.norm().
+"""
+from __future__ import annotations
+
+from typing import Dict, List, Optional
+
+from rule_pack import norm
+
+# number_words entries a rules file may leave out
+DEFAULTS = {
+    "10": ["tíz"], "13_19_prefix": ["tizen"],
+    "20_exact": ["húsz"], "20s_prefix": ["huszon"],
+    "30_exact": ["harminc"], "30s_prefix": ["harminc"],
+    "40_exact": ["negyven"], "40s_prefix": ["negyven"],
+    "50_exact": ["ötven"], "50s_prefix": ["ötven"],
+}
+
+def spellings(number_words: dict) -> Dict[int, List[str]]:
+    """
+    The spellings of 0–59 in words: a number's own entry if the rules have
+    one, else "<tens>_exact" for whole tens and each tens prefix
+    ("13_19_prefix", "<tens>s_prefix") + each spelling of the unit. Numbers
+    with no spelling are left out.
+    """
+    nw = {**DEFAULTS, **number_words}
+    out: Dict[int, List[str]] = {}
+    for n in range(60):
+        tens, unit = divmod(n, 10)
+        if str(n) in nw:
+            words = list(nw[str(n)])
+        elif unit == 0:
+            words = list(nw.get(f"{n}_exact", []))
+        elif tens:
+            prefixes = nw.get("13_19_prefix" if tens == 1 else f"{tens}0s_prefix", [])
+            words = [p + u for p in prefixes for u in out.get(unit, [])]
+        else:
+            words = []
+        if words:
+            out[n] = words
+    return out
+
+def number_table(number_words: dict) -> Dict[str, int]:
+    """Every spelling of 0–59 → its value (see the module docstring)."""
+    table: Dict[str, int] = {}
+    for n, words in spellings(number_words).items():
+        for w in words:
+            for form in (w, norm(w)):
+                for v in (form, form.capitalize(), form.upper()):
+                    table.setdefault(v, n)
+    return table
+
+def parse_number(table: Dict[str, int], word: str) -> Optional[int]:
+    n = table.get(word)
+    return n if n is not None else table.get(norm(word))
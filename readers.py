@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Source document readers: each turns one file format into the extractor's
+normalized text (text nodes joined by single spaces, whitespace collapsed,
+script/style/noscript dropped), whole or as a stream of chunks. READERS maps
+file suffixes to them; iter_files() picks up exactly these suffixes.
+
+    .htm .html   BeautifulSoup (whole) / HTMLParser (streaming)
+    .xhtml       expat, falling back to the HTML reader if it isn't well-formed
+    .rtf         streaming control-word stripper
+    .txt         decode and collapse whitespace
+
+HTML and text are decoded by fast_decode() (BOM, declared charset, strict
+UTF-8, Hungarian latin-2/cp1250) before falling back to UnicodeDammit; an
+EncodingCache passed as `encodings=` remembers the result per file.
+"""
+from __future__ import annotations
+
+import codecs, re
+from html.entities import html5
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+from xml.parsers import expat
+
+from bs4 import BeautifulSoup
+from bs4.dammit import UnicodeDammit
+
+if TYPE_CHECKING:
+    from extract_cache import EncodingCache
+
+def html_to_text(path: Path, encodings: Optional[EncodingCache] = None) -> str:
+    return markup_to_text(decode_html(path.read_bytes(), path, encodings))
+
+def decode_html(raw: bytes, path: Optional[Path] = None,
+                encodings: Optional[EncodingCache] = None) -> str:
+    """`raw` as text, in the encoding remembered for `path` if it still decodes, else detected."""
+    known = encodings.get(path) if encodings is not None and path is not None else None
+    if known:
+        try:
+            return raw.decode(known)
+        except (UnicodeDecodeError, LookupError):
+            pass
+    text, enc = decode_bytes(raw)
+    if encodings is not None and path is not None:
+        encodings.put(path, enc)
+    return text
+
+def markup_to_text(html: str) -> str:
+    soup = BeautifulSoup(html, "html.parser")
+    for t in soup(["script", "style", "noscript"]):
+        t.decompose()
+    text = soup.get_text(separator=" ", strip=False)
+    text = re.sub(r"\s+", " ", text)
+    return text
+
+# ---------- charset detection ----------
+STREAM_READ_BYTES = 1 << 16
+_BOMS = ((codecs.BOM_UTF8, "utf-8-sig"), (codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"),
+         (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"))
+_DECLARED_RE = re.compile(rb"""<\?xml[^>]*?\bencoding\s*=\s*["']?([\w.:-]+)"""
+                          rb"""|<meta[^>]*?\bcharset\s*=\s*["']?\s*([\w.:-]+)""", re.I)
+_ASCII = bytes(range(0x80))
+_NON_ASCII_RE = re.compile(rb"[\x80-\xff]")
+# non-ASCII bytes of Hungarian prose that read the same in iso-8859-2 and cp1250:
+# ÁÉÍÓÖŐÚÜŰ áéíóöőúüű, nbsp, soft hyphen, § ° « » ×
+HU_LATIN2_BYTES = bytes((0xC1, 0xC9, 0xCD, 0xD3, 0xD6, 0xD5, 0xDA, 0xDC, 0xDB,
+                         0xE1, 0xE9, 0xED, 0xF3, 0xF6, 0xF5, 0xFA, 0xFC, 0xFB,
+                         0xA0, 0xAD, 0xA7, 0xB0, 0xAB, 0xBB, 0xD7))
+# cp1250 punctuation („ ” “ ’ ‘ – — … ‹ ›): C1 controls in iso-8859-2
+CP1250_PUNCT = bytes((0x84, 0x94, 0x93, 0x92, 0x91, 0x96, 0x97, 0x85, 0x8B, 0x9B))
+HU_MAX_FOREIGN = 0.1  # share of other non-ASCII bytes the latin-2/cp1250 guess tolerates
+
+def declared_encoding(data: bytes) -> Optional[str]:
+    """Codec named by an XML declaration or <meta> charset near the top (where bs4 looks), if known."""
+    m = _DECLARED_RE.search(data, 0, max(2048, len(data) // 20))
+    if m is None:
+        return None
+    try:
+        name = codecs.lookup((m.group(1) or m.group(2)).decode("ascii")).name
+    except LookupError:
+        return None
+    return "utf-8" if name == "ascii" else name
+
+def _try_decode(data: bytes, enc: str, final: bool) -> Optional[str]:
+    try:
+        if final:
+            return data.decode(enc)
+        return codecs.getincrementaldecoder(enc)().decode(data)  # may end inside a character
+    except UnicodeDecodeError:
+        return None
+
+def _hungarian_8bit(data: bytes) -> Optional[str]:
+    """iso-8859-2 or cp1250 if the non-ASCII bytes look like Hungarian text, else None."""
+    high = data.translate(None, _ASCII)
+    foreign = high.translate(None, HU_LATIN2_BYTES + CP1250_PUNCT)
+    if not high or len(foreign) > len(high) * HU_MAX_FOREIGN:
+        return None
+    return "cp1250" if len(high.translate(None, CP1250_PUNCT)) < len(high) else "iso-8859-2"
+
+def fast_decode(data: bytes, final: bool = True) -> Optional[Tuple[str, str]]:
+    """
+    (text, encoding) by the cheap routes, in order: BOM, a declared charset
+    that decodes cleanly, strict UTF-8, then iso-8859-2/cp1250 when the
+    non-ASCII bytes are Hungarian letters and punctuation. None means full
+    detection is needed. With final=False, `data` is only part of a file, and
+    plain ASCII in it proves nothing about the rest: no strict UTF-8 guess then.
+    """
+    tried = set()
+    for guess in (lambda d: next((enc for b, enc in _BOMS if d.startswith(b)), None),
+                  declared_encoding, lambda d: "utf-8" if final or not d.isascii() else None,
+                  _hungarian_8bit):
+        enc = guess(data)  # each guess only runs if the earlier ones failed
+        if enc and enc not in tried:
+            tried.add(enc)
+            text = _try_decode(data, enc, final)
+            if text is not None:
+                return text, enc
+    return None
+
+def decode_bytes(raw: bytes) -> Tuple[str, str]:
+    """(text, encoding) of a whole document: fast_decode(), else UnicodeDammit's full detection."""
+    fast = fast_decode(raw)
+    if fast is not None:
+        return fast
+    dammit = UnicodeDammit(raw, is_html=True)
+    if dammit.unicode_markup is None:
+        return raw.decode("latin-2", "ignore"), "iso-8859-2"
+    return dammit.unicode_markup, dammit.original_encoding
+
+SNIFF_MIN_BYTES = 1024  # bytes from the first non-ASCII one on that a streamed guess wants to see
+
+def sniff_encoding(head: bytes, final: bool = False) -> Optional[str]:
+    """
+    Encoding for a whole file, guessed from its head; None if undecided.
+    Bytes before the first non-ASCII one read the same in every candidate,
+    so unless a BOM or declared charset settles it, the guess waits until
+    SNIFF_MIN_BYTES from there on are in (or the file ends, `final`).
+    """
+    if not final and declared_encoding(head) is None:
+        m = _NON_ASCII_RE.search(head)
+        if m is None or len(head) - m.start() < SNIFF_MIN_BYTES:
+            return None
+    fast = fast_decode(head, final=final)
+    if fast is not None:
+        return fast[1]
+    cut = head.rfind(b">") + 1  # don't hand a split multi-byte char to the trial decode
+    enc = UnicodeDammit(head[:cut] or head, is_html=True).original_encoding or "latin-2"
+    return "utf-8" if codecs.lookup(enc).name == "ascii" else enc
+
+def iter_decoded(path: Path, read_bytes: int = STREAM_READ_BYTES,
+                 encodings: Optional[EncodingCache] = None) -> Iterable[str]:
+    """
+    A file's text decoded block by block, bad bytes replaced. The ASCII
+    head is passed on as is until sniff_encoding() decides; only a decided
+    encoding goes into `encodings`. A guessed iso-8859-2 turns cp1250 at the
+    first cp1250 punctuation, as the whole-file guess (_hungarian_8bit) does.
+    """
+    known = encodings.get(path) if encodings is not None else None
+    enc, head = known, b""
+    with path.open("rb") as f:
+        while enc is None:
+            block = f.read(read_bytes)
+            head += block
+            enc = sniff_encoding(head, final=not block)
+            if enc is None:
+                m = _NON_ASCII_RE.search(head)
+                cut = len(head) if m is None else m.start()
+                yield head[:cut].decode("ascii")
+                head = head[cut:]
+        if encodings is not None and not known:
+            encodings.put(path, enc)
+        upgrade = not known and enc == "iso-8859-2"
+        decoder = codecs.getincrementaldecoder(enc)(errors="replace")
+        data = head or f.read(read_bytes)  # a cached encoding skips the sniffing reads
+        while True:
+            if upgrade and len(data.translate(None, CP1250_PUNCT)) < len(data):
+                upgrade = False  # single-byte codecs: nothing pending to carry over
+                decoder = codecs.getincrementaldecoder("cp1250")(errors="replace")
+                if encodings is not None:
+                    encodings.put(path, "cp1250")
+            yield decoder.decode(data, final=not data)
+            if not data:
+                return
+            data = f.read(read_bytes)
+
+# ---------- streaming html → text ----------
+STREAM_SKIP_TAGS = ("script", "style", "noscript")
+_WS_RE = re.compile(r"\s+")
+
+def _collapse_ws(pieces: Iterable[str]) -> Iterable[str]:
+    """Collapse whitespace across a stream of text pieces exactly as over their concatenation."""
+    prev_space = False
+    for piece in pieces:
+        piece = _WS_RE.sub(" ", piece)
+        if prev_space and piece.startswith(" "):
+            piece = piece[1:]
+        if piece:
+            prev_space = piece.endswith(" ")
+            yield piece
+
+class _TextCollector(HTMLParser):
+    """
+    Incremental counterpart of html_to_text's soup walk: keeps text nodes
+    outside script/style/noscript, one space between nodes like get_text(" ").
+    """
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.out: List[str] = []
+        self.skip = 0
+        self.sep = False      # a node boundary since the last kept text
+        self.started = False
+
+    def handle_starttag(self, tag, attrs):
+        if tag in STREAM_SKIP_TAGS:
+            self.skip += 1
+        self.sep = True
+
+    def handle_endtag(self, tag):
+        if tag in STREAM_SKIP_TAGS and self.skip:
+            self.skip -= 1
+        self.sep = True
+
+    def handle_comment(self, data):
+        self.sep = True
+
+    def handle_decl(self, decl):
+        self.sep = True
+
+    def handle_pi(self, data):
+        self.sep = True
+
+    def node_boundary(self, *_):
+        self.sep = True
+
+    def unknown_decl(self, data):
+        if data.startswith("CDATA["):
+            self.sep = True
+            self.handle_data(data[len("CDATA["):])
+        self.sep = True
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        if self.sep and self.started:
+            self.out.append(" ")
+        self.out.append(data)
+        self.started, self.sep = True, False
+
+def iter_html_text(path: Path, read_bytes: int = STREAM_READ_BYTES,
+                   encodings: Optional[EncodingCache] = None) -> Iterable[str]:
+    """
+    Streaming html_to_text: yields whitespace-collapsed text in chunks whose
+    concatenation is the normalized text. Memory is bounded by the read size.
+    """
+    return _collapse_ws(_iter_html_pieces(path, read_bytes, encodings))
+
+def _iter_html_pieces(path: Path, read_bytes: int, encodings: Optional[EncodingCache]) -> Iterable[str]:
+    parser = _TextCollector()
+    for text in iter_decoded(path, read_bytes, encodings):
+        parser.feed(text)
+        yield "".join(parser.out)
+        parser.out.clear()
+    parser.close()
+    yield "".join(parser.out)
+
+# ---------- xhtml ----------
+_ENTITY_RE = re.compile(rb"&([A-Za-z][A-Za-z0-9]{1,31});")
+_XML_ENTITIES = {b"amp", b"lt", b"gt", b"quot", b"apos"}
+
+def _numeric_entities(data: bytes) -> bytes:
+    """HTML named entities (&nbsp; ...) as numeric references, which expat accepts without a DTD."""
+    def sub(m: re.Match) -> bytes:
+        if m.group(1) in _XML_ENTITIES:
+            return m.group(0)
+        ch = html5.get(m.group(1).decode("ascii") + ";")
+        return m.group(0) if ch is None else b"".join(b"&#%d;" % ord(c) for c in ch)
+    return _ENTITY_RE.sub(sub, data)
+
+def _iter_xhtml_pieces(path: Path, read_bytes: int) -> Iterable[str]:
+    """Text pieces of an XHTML file via expat, which decodes the declared encoding itself."""
+    collector = _TextCollector()
+    local = lambda name: name.rpartition(":")[2].lower()
+    p = expat.ParserCreate()
+    p.buffer_text = True
+    p.StartElementHandler = lambda name, attrs: collector.handle_starttag(local(name), attrs)
+    p.EndElementHandler = lambda name: collector.handle_endtag(local(name))
+    p.CharacterDataHandler = collector.handle_data
+    p.CommentHandler = collector.node_boundary
+    p.ProcessingInstructionHandler = collector.node_boundary
+    p.StartDoctypeDeclHandler = collector.node_boundary
+    p.StartCdataSectionHandler = p.EndCdataSectionHandler = collector.node_boundary
+    # whitespace around the root element: html.parser keeps it as text, so keep it too
+    p.DefaultHandlerExpand = lambda data: collector.handle_data(data) if data.isspace() else None
+    with path.open("rb") as f:
+        utf16 = f.read(2) in (codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+        f.seek(0)
+        carry = b""
+        while True:
+            block = f.read(read_bytes)
+            data = carry + block
+            carry = b""
+            if block and not utf16:
+                amp = data.rfind(b"&")  # don't split an entity between blocks
+                if amp >= max(0, len(data) - 33) and b";" not in data[amp:]:
+                    data, carry = data[:amp], data[amp:]
+            p.Parse(data if utf16 else _numeric_entities(data), not block)
+            yield "".join(collector.out)
+            collector.out.clear()
+            if not block:
+                return
+
+def iter_xhtml_text(path: Path, read_bytes: int = STREAM_READ_BYTES,
+                    encodings: Optional[EncodingCache] = None) -> Iterable[str]:
+    """
+    Streaming xhtml reader. Files expat rejects go through iter_html_text
+    instead, unless text was already produced (then the error propagates).
+    """
+    produced = False
+    try:
+        for piece in _collapse_ws(_iter_xhtml_pieces(path, read_bytes)):
+            produced = True
+            yield piece
+    except expat.ExpatError:
+        if produced:
+            raise
+        yield from iter_html_text(path, read_bytes, encodings)
+
+def xhtml_to_text(path: Path, encodings: Optional[EncodingCache] = None) -> str:
+    try:
+        return "".join(_collapse_ws(_iter_xhtml_pieces(path, STREAM_READ_BYTES)))
+    except expat.ExpatError:
+        return html_to_text(path, encodings)
+
+# ---------- rtf ----------
+_RTF_TOKEN_RE = re.compile(r"\\([a-zA-Z]{1,32})(-?\d{1,10})? ?|\\'([0-9a-fA-F]{2})|\\(.)|([{}])"
+                           r"|[\r\n]+|([^\\{}\r\n]+)", re.S)
+_RTF_TOKEN_MAX = 48  # longest control word + parameter + delimiter, with room to spare
+# destinations whose content is not document text
+RTF_SKIP_DESTINATIONS = frozenset((
+    "fonttbl", "colortbl", "stylesheet", "listtable", "listoverridetable", "revtbl", "rsidtbl",
+    "info", "pict", "object", "objdata", "fldinst", "datafield", "themedata", "colorschememapping",
+    "latentstyles", "datastore", "xmlnstbl", "generator", "filetbl", "pgdsctbl", "header", "headerl",
+    "headerr", "headerf", "footer", "footerl", "footerr", "footerf", "pntext", "pntxta", "pntxtb",
+    "listtext", "bkmkstart", "bkmkend", "shpinst", "nonshppict", "mmathPr", "author", "operator",
+))
+RTF_SPECIALS = {
+    "par": "\n", "line": "\n", "sect": "\n", "page": "\n", "row": "\n", "cell": " ", "tab": "\t",
+    "emdash": "\u2014", "endash": "\u2013", "lquote": "\u2018", "rquote": "\u2019",
+    "ldblquote": "\u201c", "rdblquote": "\u201d", "bullet": "\u2022", "emspace": " ", "enspace": " ",
+}
+RTF_SYMBOLS = {"~": "\xa0", "_": "\u2011", "{": "{", "}": "}", "\\": "\\", "\n": "\n", "\r": "\n"}
+
+class _RtfStripper:
+    """RTF token stream to plain text; state survives between feed() calls."""
+    def __init__(self):
+        self.out: List[str] = []
+        self.stack: List[tuple] = []
+        self.skip_group = False  # inside an ignored destination
+        self.uc = 1              # fallback chars after \uN, per group
+        self.pending_skip = 0    # fallback chars still to drop
+        self.star = False        # \* seen: next control word starts an ignorable destination
+        self.first = False       # at the first token of a group
+        self.codec = codecs.lookup("cp1252")
+        self.hexbytes = bytearray()
+        self.units: List[int] = []  # UTF-16 code units from \uN
+        self.bin_left = 0
+
+    def _text(self, s: str) -> None:
+        if self.pending_skip:
+            drop = min(self.pending_skip, len(s))
+            self.pending_skip -= drop
+            s = s[drop:]
+        if s and not self.skip_group:
+            self._flush()
+            self.out.append(s)
+
+    def close(self) -> None:
+        self._flush()
+
+    def _flush(self) -> None:
+        """Decode pending \\'hh bytes or \\uN units (never both: each flushes the other)."""
+        if self.hexbytes:
+            if not self.skip_group:
+                self.out.append(self.codec.decode(bytes(self.hexbytes), "replace")[0])
+            self.hexbytes.clear()
+        if self.units:
+            if not self.skip_group:
+                data = b"".join(u.to_bytes(2, "little") for u in self.units)
+                self.out.append(data.decode("utf-16-le", "replace"))
+            self.units.clear()
+
+    def feed(self, buf: str, final: bool) -> int:
+        """Consume tokens of `buf` (bytes as latin-1); returns how much was used."""
+        pos, limit = 0, len(buf) if final else len(buf) - _RTF_TOKEN_MAX
+        while pos < len(buf):
+            if self.bin_left:
+                n = min(self.bin_left, len(buf) - pos)
+                self.bin_left -= n
+                pos += n
+                continue
+            if pos >= limit and not final:
+                break
+            m = _RTF_TOKEN_RE.match(buf, pos)
+            if m is None:  # lone backslash at the very end
+                break
+            pos = m.end()
+            word, arg, hexcode, sym, brace, text = m.groups()
+            if hexcode is not None:
+                if self.pending_skip:
+                    self.pending_skip -= 1
+                elif not self.skip_group:
+                    if self.units:
+                        self._flush()
+                    self.hexbytes.append(int(hexcode, 16))
+                self.first = False
+            elif text is not None:
+                self._text(text)
+                self.first = False
+            elif brace == "{":
+                self._flush()
+                self.stack.append((self.skip_group, self.uc))
+                self.first = True
+            elif brace == "}":
+                self._flush()
+                if self.stack:
+                    self.skip_group, self.uc = self.stack.pop()
+                self.first = self.star = False
+            elif sym is not None:
+                if sym == "*":
+                    self.star = True
+                else:
+                    self._text(RTF_SYMBOLS.get(sym, ""))
+                    self.first = False
+            elif word is not None:
+                self._control(word, arg)
+            # bare CR/LF: not text in RTF
+        return pos
+
+    def _control(self, word: str, arg: Optional[str]) -> None:
+        first, star = self.first, self.star
+        self.first = self.star = False
+        if first and (star or word in RTF_SKIP_DESTINATIONS):
+            self._flush()
+            self.skip_group = True
+            return
+        if word == "bin" and arg:
+            self.bin_left = max(0, int(arg))
+        elif word == "ansicpg" and arg:
+            try:
+                self.codec = codecs.lookup(f"cp{arg}")
+            except LookupError:
+                pass
+        elif word == "uc" and arg:
+            self.uc = max(0, int(arg))
+        elif word == "u" and arg:
+            if self.hexbytes:
+                self._flush()
+            if not self.skip_group:
+                self.units.append(int(arg) & 0xFFFF)
+            self.pending_skip = self.uc
+        elif word in RTF_SPECIALS:
+            self._text(RTF_SPECIALS[word])
+
+def _iter_rtf_pieces(path: Path, read_bytes: int) -> Iterable[str]:
+    stripper = _RtfStripper()
+    buf = ""
+    with path.open("rb") as f:
+        while True:
+            block = f.read(read_bytes)
+            buf += block.decode("latin-1")  # RTF is 7-bit; \'hh carries the rest
+            used = stripper.feed(buf, final=not block)
+            buf = buf[used:]
+            if not block:
+                stripper.close()
+            yield "".join(stripper.out)
+            stripper.out.clear()
+            if not block:
+                return
+
+def iter_rtf_text(path: Path, read_bytes: int = STREAM_READ_BYTES,
+                  encodings: Optional[EncodingCache] = None) -> Iterable[str]:
+    """RTF names its code page itself (\\ansicpg), so `encodings` is unused."""
+    return _collapse_ws(_iter_rtf_pieces(path, read_bytes))
+
+def rtf_to_text(path: Path, encodings: Optional[EncodingCache] = None) -> str:
+    return "".join(iter_rtf_text(path))
+
+# ---------- plain text ----------
+def iter_txt_text(path: Path, read_bytes: int = STREAM_READ_BYTES,
+                  encodings: Optional[EncodingCache] = None) -> Iterable[str]:
+    return _collapse_ws(iter_decoded(path, read_bytes, encodings))
+
+def txt_to_text(path: Path, encodings: Optional[EncodingCache] = None) -> str:
+    """The whole file decoded at once, so the charset is judged on all of it."""
+    return _WS_RE.sub(" ", decode_html(path.read_bytes(), path, encodings))
+
+# ---------- registry ----------
+class Reader(NamedTuple):
+    """Both callables take the path and an optional `encodings=` EncodingCache."""
+    name: str                                # part of the text cache key
+    to_text: Callable[..., str]              # whole document
+    iter_text: Callable[..., Iterable[str]]  # bounded-memory chunks, same text joined
+
+HTML_READER = Reader("html", html_to_text, iter_html_text)
+READERS: Dict[str, Reader] = {
+    ".htm": HTML_READER,
+    ".html": HTML_READER,
+    ".xhtml": Reader("xhtml", xhtml_to_text, iter_xhtml_text),
+    ".rtf": Reader("rtf", rtf_to_text, iter_rtf_text),
+    ".txt": Reader("txt", txt_to_text, iter_txt_text),
+}
+
+def reader_for(path: Path) -> Optional[Reader]:
+    return READERS.get(path.suffix.lower())
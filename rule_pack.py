@@ -0,0 +1,397 @@
+#!/usr/bin/env python3
+"""
+Rule packs: the parsed and pre-processed form of a rules file, cached on disk
+under the hash of the file, so short-lived processes (extractor workers,
+searchers) skip json5 parsing and master-pattern analysis at startup.
+
+    python rule_pack.py [rules.json5 ...]    # build / refresh packs
+"""
+from __future__ import annotations
+
+import hashlib, json5, os, pickle, re, sys, unicodedata
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+try:  # Python 3.11+
+    from re import _constants as sre_c, _parser as sre_parse
+except ImportError:  # pragma: no cover
+    import sre_constants as sre_c, sre_parse
+
+RULES_PATH = Path(__file__).with_name("rules.json5")
+PACK_DIR = Path(__file__).with_name(".rulepacks")
+PACK_VERSION = 5  # bump whenever build_pack's output changes shape or meaning
+RULE_FLAGS = re.IGNORECASE | re.UNICODE
+FOLD_FLAGS = re.UNICODE  # folded rules: the shadow text is already lowercase (see shadow_text.py)
+FOLD_ASCII_FLAGS = re.ASCII  # the same on an all-ASCII shadow: \w, \d, \s, \b by table lookup
+
+@lru_cache(maxsize=8192)
+def norm(s: str) -> str:
+    s = s.lower()
+    s = unicodedata.normalize("NFKD", s)
+    return "".join(c for c in s if not unicodedata.combining(c))
+
+# ---------- combined rule automaton ----------
+class _NoFirstSet(Exception):
+    pass
+
+_CATEGORY_ESCAPES = {
+    sre_c.CATEGORY_DIGIT: r"\d", sre_c.CATEGORY_WORD: r"\w", sre_c.CATEGORY_SPACE: r"\s",
+}
+
+def _first_set(seq) -> Tuple[set, bool]:
+    """(char-class items a match can start with, whether the sequence can match empty)."""
+    items = set()
+    for op, av in seq:
+        if op in (sre_c.AT, sre_c.ASSERT, sre_c.ASSERT_NOT):
+            continue  # zero-width
+        if op is sre_c.LITERAL:
+            items.add(re.escape(chr(av)))
+            return items, False
+        if op is sre_c.IN:
+            for o, a in av:
+                if o is sre_c.LITERAL:
+                    items.add(re.escape(chr(a)))
+                elif o is sre_c.RANGE:
+                    items.add(f"{re.escape(chr(a[0]))}-{re.escape(chr(a[1]))}")
+                elif o is sre_c.CATEGORY and a in _CATEGORY_ESCAPES:
+                    items.add(_CATEGORY_ESCAPES[a])
+                else:
+                    raise _NoFirstSet
+            return items, False
+        if op is sre_c.SUBPATTERN:
+            sub, nullable = _first_set(av[-1])
+        elif op is sre_c.BRANCH:
+            sub, nullable = set(), False
+            for branch in av[1]:
+                b_items, b_nullable = _first_set(branch)
+                sub |= b_items
+                nullable |= b_nullable
+        elif op in (sre_c.MAX_REPEAT, sre_c.MIN_REPEAT):
+            sub, nullable = _first_set(av[2])
+            nullable = nullable or av[0] == 0
+        else:
+            raise _NoFirstSet
+        items |= sub
+        if not nullable:
+            return items, False
+    return items, True
+
+def _starts_at_boundary(seq) -> bool:
+    for op, av in seq:
+        if op is sre_c.AT and av is sre_c.AT_BOUNDARY:
+            return True
+        if op is sre_c.ASSERT_NOT:
+            continue
+        if op is sre_c.SUBPATTERN:
+            return _starts_at_boundary(av[-1])
+        return False
+    return False
+
+def master_source(rule_list: List[dict], flags: int = RULE_FLAGS) -> Tuple[str, str]:
+    """
+    Fold every rule into one pattern that scans the text once; returns
+    (gate, master), where master starts with gate.
+    Each rule sits in its own lookahead group `_r<k>`, so at a given position
+    all rules are tried (in file order) and each one reports the same match its
+    own finditer would; a trailing conditional rejects positions where none hit.
+    The gate (word boundary / first character) skips positions no rule can start at.
+    """
+    parts, firsts, boundary = [], [], True
+    for k, r in enumerate(rule_list):
+        parsed = sre_parse.parse(r["pattern"], flags)
+        boundary = boundary and _starts_at_boundary(parsed)
+        try:
+            items, nullable = _first_set(parsed)
+            first = None if nullable else items
+        except _NoFirstSet:
+            first = None
+        firsts.append(first)
+        gate = f"(?=[{''.join(sorted(first))}])" if first else ""
+        parts.append(f"(?:{gate}(?=(?P<_r{k}>{r['pattern']}))|)")
+    cond = "(?!)"
+    for k in reversed(range(len(rule_list))):
+        cond = f"(?(_r{k})|{cond})"
+    prefix = r"\b" if boundary else ""
+    if all(firsts):
+        prefix += f"(?=[{''.join(sorted(set().union(*firsts)))}])"
+    return prefix, prefix + "".join(parts) + cond
+
+def anchor_table(rule_list: List[dict]) -> Optional[List[Tuple[str, int]]]:
+    """
+    (anchor regex, reach) pairs for the prefilter, or None if some rule has
+    no anchors. A shared anchor gets the largest reach of the rules using it.
+    Anchors are lookaheads, so finditer reports every start position even
+    where two occurrences overlap ("7:4:29" has "7:4" and "4:2").
+    """
+    reach = {}
+    for r in rule_list:
+        if not r.get("anchors"):
+            return None
+        for a in r["anchors"]:
+            reach[a] = max(reach.get(a, 0), int(r.get("reach", 0)))
+    return [(f"(?=(?:{a}))", n) for a, n in sorted(reach.items())]
+
+def compile_master(rule_list: List[dict], source: Optional[str] = None,
+                   flags: int = RULE_FLAGS) -> re.Pattern:
+    """Compile the master pattern and note each rule's group index as r["_gi"]."""
+    master = re.compile(source or master_source(rule_list, flags)[1], flags)
+    for k, r in enumerate(rule_list):
+        r["_gi"] = master.groupindex[f"_r{k}"]
+    return master
+
+# ---------- macros and alternation tries ----------
+_MACRO_RE = re.compile(r"\{([A-Z][A-Z0-9_]*)\}")
+_OPEN_RE = re.compile(r"\((?:\?(?::|=|!|<=|<!|P<\w+>|[aiLmsux]+(?:-[imsx]+)?:))?")
+_LITERAL_ESCAPES = frozenset(r"\.^$*+?{}[]|()-/#&~ '" + '"')
+
+def expand_macros(pattern: str, macros: dict, _seen: Tuple[str, ...] = ()) -> str:
+    """Replace every {NAME} by its (recursively expanded) macro, as a non-capturing group."""
+    def sub(m: re.Match) -> str:
+        name = m.group(1)
+        if name not in macros:
+            raise ValueError(f"unknown macro {{{name}}} in {pattern!r}")
+        if name in _seen:
+            raise ValueError(f"macro {{{name}}} refers to itself")
+        body = expand_macros(macros[name], macros, _seen + (name,))
+        if re.compile(body).groups:
+            raise ValueError(f"macro {{{name}}} has a capturing group; put the group in the rule")
+        return f"(?:{body})"
+    return _MACRO_RE.sub(sub, pattern)
+
+class _Unsupported(Exception):
+    pass
+
+# A parsed pattern is a list of alternatives; an alternative a list of tokens:
+# a source string (char, escape, class, quantifier) or a group (opener, alternatives).
+def _class_end(src: str, i: int) -> int:
+    j = i + 1
+    j += src.startswith("^", j)
+    j += src.startswith("]", j)
+    while j < len(src) and src[j] != "]":
+        j += 2 if src[j] == "\\" else 1
+    if j >= len(src):
+        raise _Unsupported
+    return j + 1
+
+def _parse(src: str, i: int = 0, depth: int = 0) -> Tuple[list, int]:
+    alts: list = [[]]
+    while i < len(src):
+        c = src[i]
+        if c == "\\":
+            tok, i = src[i:i + 2], i + 2
+        elif c == "[":
+            j = _class_end(src, i)
+            tok, i = src[i:j], j
+        elif c == "(":
+            m = _OPEN_RE.match(src, i)
+            if src.startswith("(?", i) and m.end() == i + 1:
+                raise _Unsupported  # conditionals, backrefs, inline flags, comments
+            inner, i = _parse(src, m.end(), depth + 1)
+            tok = (m.group(), inner)
+        elif c == ")":
+            if not depth:
+                raise _Unsupported
+            return alts, i + 1
+        elif c == "|":
+            alts.append([])
+            i += 1
+            continue
+        else:
+            tok, i = c, i + 1
+        alts[-1].append(tok)
+    if depth:
+        raise _Unsupported
+    return alts, i
+
+def _render(alts: list) -> str:
+    return "|".join("".join(t if isinstance(t, str) else t[0] + _render(t[1]) + ")" for t in alt)
+                    for alt in alts)
+
+def _captures(tokens: list) -> bool:
+    return any(not isinstance(t, str) and (t[0] == "(" or t[0].startswith("(?P<")
+                                           or any(_captures(a) for a in t[1]))
+               for t in tokens)
+
+def _literal(tok) -> Optional[str]:
+    if not isinstance(tok, str):
+        return None
+    if len(tok) == 1:
+        return None if tok in ".^$*+?{}[]|()" else tok
+    return tok[1] if tok[0] == "\\" and tok[1] in _LITERAL_ESCAPES else None
+
+def _flatten(alts: list) -> list:
+    """Splice alternatives that are a lone (?:a|b) group into the enclosing alternation."""
+    out = []
+    for alt in alts:
+        if len(alt) == 1 and not isinstance(alt[0], str) and alt[0][0] == "(?:":
+            out.extend(_flatten(alt[0][1]))
+        else:
+            out.append(alt)
+    return out
+
+def _trie(items: list) -> Optional[list]:
+    """
+    Alternatives for `items` ([(literal prefix [(char, src)], tail tokens, index)])
+    with shared prefixes factored out, or None if that would change which
+    alternative the regex engine prefers. Alternatives starting with different
+    characters can't both match at one position, so only the order between a
+    branch and the words ending (or leaving the literal run) at its node matters.
+    """
+    terminals, branches = [], {}
+    for prefix, tail, idx in items:
+        if prefix:
+            branches.setdefault(prefix[0][0], []).append((prefix, tail, idx))
+        elif all(_render([tail]) != _render([t]) for t, _ in terminals):
+            terminals.append((tail, idx))
+    if len({c.casefold() for c in branches}) != len(branches):
+        return None  # case variants under IGNORECASE are not mutually exclusive
+    entries = [(idx, tail) for tail, idx in terminals]
+    for members in branches.values():
+        idxs = [idx for _, _, idx in members]
+        if any(min(idxs) < t < max(idxs) for _, t in terminals):
+            return None
+        src = members[0][0][0][1]
+        if len(members) == 1:
+            prefix, tail, _ = members[0]
+            entries.append((idxs[0], [s for _, s in prefix] + tail))
+            continue
+        sub = _trie([(prefix[1:], tail, idx) for prefix, tail, idx in members])
+        if sub is None:
+            return None
+        entries.append((min(idxs), [src] + (sub[0] if len(sub) == 1 else [("(?:", sub)])))
+    return [alt for _, alt in sorted(entries, key=lambda e: e[0])]
+
+def _factor(alts: list) -> list:
+    alts = _flatten(alts)
+    alts = [[t if isinstance(t, str) or t[0] in ("(?<=", "(?<!") else (t[0], _factor(t[1]))
+             for t in alt] for alt in alts]
+    if len(alts) < 2 or any(_captures(alt) for alt in alts):
+        return alts  # reordering would renumber capturing groups
+    items = []
+    for idx, alt in enumerate(alts):
+        n = 0
+        while n < len(alt) and _literal(alt[n]) is not None:
+            n += 1
+        if n and n < len(alt) and isinstance(alt[n], str) and alt[n][0] in "*+?{":
+            n -= 1  # the quantifier binds the last literal
+        items.append(([(_literal(t), t) for t in alt[:n]], alt[n:], idx))
+    return _trie(items) or alts
+
+def factor_alternations(pattern: str) -> str:
+    """
+    `pattern` with its literal alternations rewritten as prefix tries, e.g.
+    `tizenegy|tizenkettő|tizen\w+` → `tizen(?:egy|kettő|\w+)`. Matches and
+    groups are unchanged; patterns using unsupported syntax come back as-is.
+    """
+    try:
+        alts, _ = _parse(pattern)
+    except _Unsupported:
+        return pattern
+    out = _render(_factor(alts))
+    try:
+        if re.compile(out).groups != re.compile(pattern).groups:
+            return pattern
+    except re.error:
+        return pattern
+    return out
+
+def compile_rules(data: dict) -> None:
+    """Expand macros and factor alternations in data["rules"] in place; the source stays under "source"."""
+    macros = data.get("macros", {})
+    for r in data.get("rules", []):
+        r["source"] = r["pattern"]
+        r["pattern"] = factor_alternations(expand_macros(r["pattern"], macros))
+
+# ---------- accent folding ----------
+_GROUP_NAME_RE = re.compile(r"\(\?P(?:<\w+>|=\w+\))")
+
+def fold_pattern(pattern: str) -> str:
+    """
+    `pattern` for the accent-folded shadow text: each literal character
+    replaced by its norm() fold ("óra" -> "ora"); escapes and group names
+    are kept. Compile with FOLD_FLAGS.
+    """
+    out, i = [], 0
+    while i < len(pattern):
+        m = _GROUP_NAME_RE.match(pattern, i)
+        if m:
+            out.append(m.group())
+            i = m.end()
+        elif pattern[i] == "\\" and pattern[i + 1:i + 2].isascii():
+            out.append(pattern[i:i + 2])
+            i += 2
+        else:
+            i += pattern[i] == "\\"  # an escaped accented letter is a literal too
+            f = norm(pattern[i])
+            out.append(f if len(f) == 1 else pattern[i])
+            i += 1
+    return "".join(out)
+
+def folded_rules(rule_list: List[dict]) -> dict:
+    """Folded patterns of the rules plus their master, gate and anchors (as in build_pack)."""
+    folded = [dict(r, pattern=fold_pattern(r["pattern"]),
+                   anchors=[fold_pattern(a) for a in r.get("anchors", [])]) for r in rule_list]
+    gate, master = master_source(folded, FOLD_FLAGS)
+    return {"patterns": [r["pattern"] for r in folded], "gate": gate, "master": master,
+            "anchors": anchor_table(folded)}
+
+# ---------- packs ----------
+def build_pack(path: Path, sha256: str) -> dict:
+    """
+    Plain-data pack for one rules file: the parsed document under "rules"
+    (macros expanded, alternations factored; see compile_rules), plus, for extractor rule files, the master pattern and gate sources, the
+    prefilter anchors, the same for the accent-folded rules under "folded",
+    and a word→hour table keyed by both the lowercase and the accent-folded forms.
+    """
+    data = json5.loads(path.read_bytes().decode("utf-8"))
+    compile_rules(data)
+    pack = {"version": PACK_VERSION, "sha256": sha256, "rules": data,
+            "gate": None, "master": None, "anchors": None, "folded": None, "word2hour": {}}
+    if "rules" in data:
+        pack["gate"], pack["master"] = master_source(data["rules"])
+        pack["anchors"] = anchor_table(data["rules"])
+        pack["folded"] = folded_rules(data["rules"])
+    for word, hour in data.get("word2hour", {}).items():
+        pack["word2hour"][word.lower()] = hour
+        pack["word2hour"][norm(word)] = hour
+    return pack
+
+def pack_path(path: Path, sha256: str, pack_dir: Path = PACK_DIR) -> Path:
+    return pack_dir / f"{path.stem}.{sha256[:16]}.v{PACK_VERSION}.pickle"
+
+def load_pack(path: Path = RULES_PATH, pack_dir: Path = PACK_DIR) -> dict:
+    """The pack for `path`, built and cached on first use (or after the file changes)."""
+    raw = path.read_bytes()
+    sha = hashlib.sha256(raw).hexdigest()
+    target = pack_path(path, sha, pack_dir)
+    try:
+        with target.open("rb") as f:
+            pack = pickle.load(f)
+        if pack.get("version") == PACK_VERSION and pack.get("sha256") == sha:
+            return pack
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+    pack = build_pack(path, sha)
+    try:
+        pack_dir.mkdir(parents=True, exist_ok=True)
+        tmp = target.with_name(target.name + f".tmp{os.getpid()}")
+        with tmp.open("wb") as f:
+            pickle.dump(pack, f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, target)
+        for old in pack_dir.glob(f"{path.stem}.*.pickle"):
+            if old != target:
+                old.unlink(missing_ok=True)
+    except OSError:
+        pass  # read-only checkout: still usable, just not cached
+    return pack
+
+def main(argv: List[str]) -> int:
+    paths = [Path(a) for a in argv[1:]] or [RULES_PATH, RULES_PATH.with_name("rules_calendar.json5")]
+    for p in paths:
+        load_pack(p)
+        print(pack_path(p, hashlib.sha256(p.read_bytes()).hexdigest()))
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -2,7 +2,7 @@ import argparse
 import json
 import logging
 import random
-import re
+import sys
 import time
 from collections import defaultdict
 from pathlib import Path
@@ -16,15 +16,16 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select, WebDriverWait
 from webdriver_manager.chrome import ChromeDriverManager
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from rule_pack import load_pack  # noqa: E402
+
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 
 def load_rules(path):
+    """Loads a rules file through its cached rule pack."""
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        content = re.sub(r'//.*', '', content)
-        return json.loads(content)
+        return load_pack(Path(path))["rules"]
     except Exception as e:
         logging.error(f"Failed to load rules from {path}: {e}")
         return None
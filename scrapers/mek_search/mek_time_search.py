@@ -2,7 +2,7 @@ import argparse
 import json
 import logging
 import random
-import re
+import sys
 from pathlib import Path
 from collections import defaultdict
 
@@ -15,16 +15,17 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from webdriver_manager.chrome import ChromeDriverManager
 
+sys.path.insert(0, str(Path(__file__).resolve().parents[2]))
+from hu_numerals import spellings  # noqa: E402
+from rule_pack import load_pack  # noqa: E402
+
 # Setup logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 
 def load_rules(path):
-    """Loads rules.json5, stripping comments."""
+    """Loads a rules file through its cached rule pack."""
     try:
-        with open(path, 'r', encoding='utf-8') as f:
-            content = f.read()
-        content = re.sub(r'//.*', '', content)
-        return json.loads(content)
+        return load_pack(Path(path))["rules"]
     except Exception as e:
         logging.error(f"Failed to load rules from {path}: {e}")
         return None
@@ -32,54 +33,10 @@ def load_rules(path):
 class TimeTermGenerator:
     def __init__(self, rules):
         self.rules = rules
-        self.number_words = rules.get('number_words', {})
+        self.spellings = spellings(rules.get('number_words', {}))
         
     def get_number_word(self, n):
-        n_str = str(n)
-        words = []
-        if n_str in self.number_words:
-            return self.number_words[n_str]
-        if 13 <= n <= 19:
-            prefix = self.number_words.get('13_19_prefix', ['tizen'])[0]
-            digit = n % 10
-            digit_words = self.get_number_word(digit)
-            for dw in digit_words:
-                words.append(prefix + dw)
-        elif 21 <= n <= 29:
-            prefix = self.number_words.get('20s_prefix', ['huszon'])[0]
-            digit = n % 10
-            digit_words = self.get_number_word(digit)
-            for dw in digit_words:
-                words.append(prefix + dw)
-        elif n == 20:
-             return self.number_words.get('20_exact', ['húsz'])
-        elif n == 30:
-             return self.number_words.get('30_exact', ['harminc'])
-        elif 31 <= n <= 39:
-            prefix = self.number_words.get('30s_prefix', ['harminc'])[0]
-            digit = n % 10
-            digit_words = self.get_number_word(digit)
-            for dw in digit_words:
-                words.append(prefix + dw)
-        elif n == 40:
-             return self.number_words.get('40_exact', ['negyven'])
-        elif 41 <= n <= 49:
-            prefix = self.number_words.get('40s_prefix', ['negyven'])[0]
-            digit = n % 10
-            digit_words = self.get_number_word(digit)
-            for dw in digit_words:
-                words.append(prefix + dw)
-        elif n == 50:
-             return self.number_words.get('50_exact', ['ötven'])
-        elif 51 <= n <= 59:
-            prefix = self.number_words.get('50s_prefix', ['ötven'])[0]
-            digit = n % 10
-            digit_words = self.get_number_word(digit)
-            for dw in digit_words:
-                words.append(prefix + dw)
-        if not words and n_str in self.number_words:
-             return self.number_words[n_str]
-        return words if words else [str(n)]
+        return self.spellings.get(n, [str(n)])
 
     def generate_terms(self, h, m):
         terms = set()
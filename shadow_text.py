@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+Accent-folded shadow copies of document text, for the --fold-accents scan.
+
+The shadow is the text with every character replaced by its rule_pack.norm()
+fold (lowercase, accents stripped): "Háromnegyed ÖT" -> "haromnegyed ot".
+Folded rules (rule_pack.fold_pattern) then match it case-sensitively and
+find "ora", "óra" and "óra" (NFD) alike. Most characters fold to exactly
+one character, so offsets carry over unchanged; the rest (combining marks,
+"…", ...) are irregular units, and a ShadowText maps offsets across them.
+
+Folding runs in C: a single-byte codec whose alphabet is closed under the
+fold encodes the text, bytes.translate folds it, and the codec decodes it
+back. Characters outside the alphabet go through an error handler.
+"""
+from __future__ import annotations
+
+import codecs
+from bisect import bisect_right
+from typing import List, Tuple
+
+from rule_pack import norm
+
+# ---------- fold codec ----------
+def _alphabet() -> List[str]:
+    """cp1250's characters whose fold is again one of them ("￾" = unused byte)."""
+    chars = list(bytes(range(256)).decode("cp1250", errors="replace").replace("�", "￾"))
+    while True:
+        have = set(chars)
+        bad = [b for b, c in enumerate(chars) if c != "￾" and (len(norm(c)) != 1 or norm(c) not in have)]
+        if not bad:
+            return chars
+        for b in bad:
+            chars[b] = "￾"
+
+_ALPHABET = _alphabet()
+_DECODE = "".join(_ALPHABET)
+_ENCODE = codecs.charmap_build(_DECODE)
+_BYTE = {c: b for b, c in enumerate(_ALPHABET) if c != "￾"}
+_FOLD = bytes(_BYTE[norm(c)] if c != "￾" else b for b, c in enumerate(_ALPHABET))
+_ERRORS = "shadow_text.fold"
+
+class _Fold:
+    """Per-call state of the error handler: irregular units and splices, in text order."""
+    def __init__(self) -> None:
+        self.delta = 0  # shadow offset - text offset so far
+        self.units: List[Tuple[int, int, int, int]] = []  # (shadow start, shadow end, text start, text end)
+        self.splices: List[Tuple[int, str]] = []          # (shadow start, folded chars not in the alphabet)
+
+    def run(self, text: str, start: int, end: int) -> bytes:
+        pieces = []
+        for i in range(start, end):
+            f = norm(text[i])
+            pieces.append(f)
+            if len(f) != 1:
+                sh = i + self.delta
+                u = self.units[-1] if self.units else None
+                if u is not None and u[1] == sh and u[3] == i:  # adjacent: one unit
+                    self.units[-1] = (u[0], sh + len(f), u[2], i + 1)
+                else:
+                    self.units.append((sh, sh + len(f), i, i + 1))
+                self.delta += len(f) - 1
+        folded = "".join(pieces)
+        try:
+            return codecs.charmap_encode(folded, "strict", _ENCODE)[0]
+        except UnicodeEncodeError:  # other scripts: put the chars in after decoding
+            self.splices.append((end + self.delta - len(folded), folded))
+            return b"\0" * len(folded)
+
+_state: List[_Fold] = []  # the fold in progress; workers are processes, so one at a time
+
+def _handler(e: UnicodeEncodeError) -> Tuple[bytes, int]:
+    return _state[-1].run(e.object, e.start, e.end), e.end
+
+codecs.register_error(_ERRORS, _handler)
+
+# ---------- shadow text ----------
+class ShadowText:
+    """
+    `text` folded, as .text, with offset maps between the two. Without
+    irregular units both maps are the identity.
+    """
+    def __init__(self, text: str):
+        fold = _Fold()
+        _state.append(fold)
+        try:
+            data = codecs.charmap_encode(text, _ERRORS, _ENCODE)[0]
+        finally:
+            _state.pop()
+        shadow = codecs.charmap_decode(data.translate(_FOLD), "strict", _DECODE)[0]
+        if fold.splices:
+            pieces, at = [], 0
+            for start, chars in fold.splices:
+                pieces += [shadow[at:start], chars]
+                at = start + len(chars)
+            pieces.append(shadow[at:])
+            shadow = "".join(pieces)
+        self.text = shadow
+        self._units = fold.units
+        self._sh = [u[0] for u in fold.units]
+        self._og = [u[2] for u in fold.units]
+
+    @property
+    def exact(self) -> bool:
+        """Whether offsets are the same in both texts."""
+        return not self._units
+
+    def to_text(self, x: int, end: bool = False) -> int:
+        """Text offset of shadow offset x; inside a unit, its start (or its end if `end`)."""
+        k = bisect_right(self._sh, x) - 1
+        if k < 0:
+            return x
+        sh0, sh1, og0, og1 = self._units[k]
+        if x >= sh1:
+            return og1 + x - sh1
+        return og1 if end and x > sh0 else og0
+
+    def to_shadow(self, y: int) -> int:
+        """Shadow offset of text offset y; inside a unit, its end."""
+        k = bisect_right(self._og, y) - 1
+        if k < 0:
+            return y
+        sh0, sh1, og0, og1 = self._units[k]
+        if y >= og1:
+            return sh1 + y - og1
+        return sh0 if y == og0 else sh1
+
+    def remap(self, per_rule: List[List[Tuple[int, int, tuple]]]) -> List[List[Tuple[int, int, tuple]]]:
+        """scan_rules output over the shadow with its spans moved to the text (groups stay folded)."""
+        if not self._units:
+            return per_rule
+        return [[(self.to_text(s), self.to_text(e, end=True), g) for s, e, g in hits] for hits in per_rule]
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Split an extractor run across machines and merge the outputs.
+
+    node k of N:  python extractor.py ROOT --shard k/N -o out/shard-k.jsonl
+    afterwards:   python shards.py -o hits.jsonl out/shard-*.jsonl
+
+Every file belongs to exactly one shard. The plan is computed from paths
+relative to ROOT and from file sizes (stat only, no file is opened):
+small files go by path hash, big ones largest-first onto the least loaded
+shard. Each node therefore computes the same plan by itself and reads only
+its own files, in path order. A sharded run also writes <out>.shard.json,
+a summary with files, bytes, hits and seconds.
+
+The merge combines shard outputs (any hit_sink format) into one file
+sorted by source file. A file that shows up in several outputs, e.g. from
+a re-run shard, is kept once. --offsets-only documents are renumbered.
+Per-shard throughput goes to stderr.
+"""
+from __future__ import annotations
+
+import argparse, hashlib, heapq, json, platform, sys, time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from hit_records import ERROR_RULE, HitBatch
+from hit_sink import iter_hits, open_sink
+
+HASH_BELOW_BYTES = 1 << 20  # files smaller than this are placed by path hash alone
+SUMMARY_SUFFIX = ".shard.json"
+
+# ---------- planning ----------
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """"k/N" (k counted from 1) as (k, N)."""
+    try:
+        k, n = (int(x) for x in spec.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected k/N, got {spec!r}")
+    if not 1 <= k <= n:
+        raise argparse.ArgumentTypeError(f"shard {k} outside 1..{n}")
+    return k, n
+
+def path_hash(rel: str) -> int:
+    return int.from_bytes(hashlib.sha1(rel.encode("utf-8")).digest()[:8], "big")
+
+def assign(rel_paths: List[str], sizes: List[int], n: int) -> List[int]:
+    """
+    Shard index (0..n-1) per file. Small files are spread by path hash, so
+    they stay put when the tree changes. Big files then go largest first
+    (hash order for equal sizes) to the shard with the fewest bytes so far.
+    """
+    shard = [0] * len(rel_paths)
+    load = [0] * n
+    big = []
+    for i, (rel, size) in enumerate(zip(rel_paths, sizes)):
+        if size < HASH_BELOW_BYTES:
+            shard[i] = path_hash(rel) % n
+            load[shard[i]] += size
+        else:
+            big.append(i)
+    heap = [(b, s) for s, b in enumerate(load)]
+    heapq.heapify(heap)
+    for i in sorted(big, key=lambda i: (-sizes[i], path_hash(rel_paths[i]))):
+        b, s = heapq.heappop(heap)
+        shard[i] = s
+        heapq.heappush(heap, (b + sizes[i], s))
+    return shard
+
+def shard_paths(paths: Iterable[Path], root: Path, k: int, n: int) -> Tuple[List[Path], int]:
+    """Shard k of n (from 1) of `paths` under `root`, in path order, and its total size."""
+    paths = sorted(paths, key=str)
+    rel = [p.relative_to(root).as_posix() if root.is_dir() else p.name for p in paths]
+    sizes = []
+    for p in paths:
+        try:
+            sizes.append(p.stat().st_size)
+        except OSError:
+            sizes.append(0)  # the owning node reports read_failed
+    mine = [i for i, s in enumerate(assign(rel, sizes, n)) if s == k - 1]
+    return [paths[i] for i in mine], sum(sizes[i] for i in mine)
+
+# ---------- run summary ----------
+def summary_path(out: Path) -> Path:
+    return out.with_name(out.name + SUMMARY_SUFFIX)
+
+class ShardSink:
+    """Passes one shard's output on to `sink`, counting hits; save() writes the summary."""
+    def __init__(self, sink, k: int, n: int, files: int, size: int):
+        self._sink = sink
+        self.info = {"shard": f"{k}/{n}", "host": platform.node(), "files": files, "bytes": size,
+                     "hits": 0, "seconds": 0.0}
+        self._t0 = time.perf_counter()
+
+    def write_lines(self, lines: List[str]) -> None:
+        self.info["hits"] += sum('"rule_id"' in line for line in lines)
+        self._sink.write_lines(lines)
+
+    def write_batch(self, batch: HitBatch) -> None:
+        self.info["hits"] += sum(r != ERROR_RULE for r in batch.rule)
+        self._sink.write_batch(batch)
+
+    def close(self) -> None:
+        self._sink.close()
+
+    def save(self, out: Optional[Path]) -> None:
+        """Next to the output file, or to stderr when the hits went to stdout."""
+        self.info["seconds"] = round(time.perf_counter() - self._t0, 3)
+        data = json.dumps(self.info, ensure_ascii=False)
+        if out is None:
+            print(f"[shard] {data}", file=sys.stderr)
+        else:
+            summary_path(out).write_text(data + "\n", encoding="utf-8")
+
+# ---------- merging ----------
+def iter_groups(path: Path) -> Iterable[Tuple[str, List[dict]]]:
+    """(source file, its records) per document of one shard output, checking path order."""
+    docs: Dict[int, str] = {}
+    key: Optional[str] = None
+    group: List[dict] = []
+    for rec in iter_hits(path):
+        if "rule_id" not in rec and "error" not in rec:  # --offsets-only document record
+            docs[rec["doc"]] = rec["file"]
+        file = rec["file"] if "file" in rec else docs[rec["doc"]]
+        if file != key:
+            if group:
+                yield key, group
+            if key is not None and file < key:
+                raise SystemExit(f"{path}: {file} after {key}; merge needs extractor.py --shard output")
+            key, group = file, []
+        group.append(rec)
+    if group:
+        yield key, group
+
+def merge(inputs: List[Path], sink) -> Dict[str, int]:
+    """Write the merged records of `inputs` to `sink`; returns document and duplicate counts."""
+    streams = [((file, n, group) for file, group in iter_groups(p)) for n, p in enumerate(inputs)]
+    counts = {"documents": 0, "duplicates": 0}
+    last: Optional[str] = None
+    for file, _, group in heapq.merge(*streams, key=lambda t: (t[0], t[1])):
+        if file == last:
+            counts["duplicates"] += 1
+            continue
+        last = file
+        doc = counts["documents"]
+        counts["documents"] += 1
+        for rec in group:
+            if "doc" in rec:
+                rec["doc"] = doc
+        sink.write_lines([json.dumps(rec, ensure_ascii=False) for rec in group])
+    return counts
+
+def report(inputs: List[Path], counts: Dict[str, int], out=sys.stderr) -> None:
+    rows = []
+    for p in inputs:
+        sp = summary_path(p)
+        rows.append(json.loads(sp.read_text(encoding="utf-8")) if sp.exists()
+                    else {"shard": f"? {p.name}"})
+    print(f"{'shard':<8}{'host':<16}{'files':>8}{'MiB':>10}{'hits':>10}{'seconds':>10}{'MB/s':>8}", file=out)
+    for r in rows:
+        if "seconds" not in r:
+            print(f"{r['shard']:<24}(no {SUMMARY_SUFFIX} summary)", file=out)
+            continue
+        mb = r["bytes"] / 2**20
+        rate = mb / r["seconds"] if r["seconds"] else 0.0
+        print(f"{r['shard']:<8}{r['host'][:15]:<16}{r['files']:>8}{mb:>10.1f}{r['hits']:>10}"
+              f"{r['seconds']:>10.1f}{rate:>8.2f}", file=out)
+    timed = list({r["shard"]: r for r in reversed(rows) if "seconds" in r}.values())  # once per shard
+    if timed:
+        secs = [r["seconds"] for r in timed]
+        mb = sum(r["bytes"] for r in timed) / 2**20
+        wall, mean = max(secs), sum(secs) / len(secs)
+        print(f"{'total':<24}{sum(r['files'] for r in timed):>8}{mb:>10.1f}"
+              f"{sum(r['hits'] for r in timed):>10}{wall:>10.1f}{mb / wall if wall else 0.0:>8.2f}"
+              f"  (slowest/mean {wall / mean if mean else 1.0:.2f})", file=out)
+        n = int(timed[0]["shard"].split("/")[1])
+        missing = sorted(set(range(1, n + 1)) - {int(r["shard"].split("/")[0]) for r in timed})
+        if missing:
+            print(f"[merge] missing shards: {', '.join(f'{k}/{n}' for k in missing)}", file=out)
+    print(f"[merge] {counts['documents']} documents, {counts['duplicates']} duplicate copies dropped",
+          file=out)
+
+def main(argv: List[str]) -> int:
+    ap = argparse.ArgumentParser(prog=Path(argv[0]).name, description=__doc__.split("\n\n")[0])
+    ap.add_argument("inputs", nargs="+", help="shard outputs (.jsonl, .jsonl.gz, .jsonl.zst, .hits)")
+    ap.add_argument("-o", "--out", metavar="PATH", help="merged output (format by suffix; default stdout)")
+    args = ap.parse_args(argv[1:])
+    inputs = [Path(p) for p in args.inputs]
+    sink = open_sink(Path(args.out) if args.out else None)
+    try:
+        counts = merge(inputs, sink)
+    finally:
+        sink.close()
+    report(inputs, counts)
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main(sys.argv))
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Document text for --jobs workers, handed over in shared memory instead of
+through a pipe.
+
+A SharedText is one document as UTF-8 in a named multiprocessing
+shared-memory block. The worker that converts a huge file writes it once;
+the parent and the segment workers attach by name and decode only the
+byte range they scan, so what crosses the pipes is a name and offsets.
+The parent owns the block and unlinks it when the document is done.
+Call share_tracker() before the worker pool starts.
+"""
+from __future__ import annotations
+
+import os
+from multiprocessing import resource_tracker, shared_memory
+from typing import List, Optional, Tuple
+
+class SharedText:
+    def __init__(self, shm: shared_memory.SharedMemory, size: int):
+        self._shm = shm
+        self.size = size  # bytes of UTF-8; the block may be rounded up
+
+    @classmethod
+    def create(cls, text: str) -> SharedText:
+        data = text.encode("utf-8")
+        shm = shared_memory.SharedMemory(create=True, size=max(1, len(data)))
+        shm.buf[:len(data)] = data
+        return cls(shm, len(data))
+
+    @classmethod
+    def attach(cls, name: str, size: int) -> SharedText:
+        return cls(shared_memory.SharedMemory(name=name), size)
+
+    @property
+    def handle(self) -> Tuple[str, int]:
+        """What another process needs to attach: (name, size)."""
+        return self._shm.name, self.size
+
+    def text(self, start: int = 0, end: Optional[int] = None) -> str:
+        """Bytes [start, end) decoded; the range must fall on character boundaries."""
+        return str(self._shm.buf[start:self.size if end is None else end], "utf-8")
+
+    def close(self) -> None:
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Close and free the block (owner only)."""
+        self._shm.close()
+        self._shm.unlink()
+
+def share_tracker() -> None:
+    """
+    Start multiprocessing's resource tracker before a pool forks its
+    workers. They then register blocks with the parent's tracker instead of
+    each starting their own, which would report blocks the parent already
+    unlinked as leaked at exit.
+    """
+    if os.name == "posix":
+        resource_tracker.ensure_running()
+
+def byte_offsets(text: str, cuts: List[int]) -> List[int]:
+    """UTF-8 byte offset of each character offset in the ascending `cuts`."""
+    out = []
+    byte = prev = 0
+    for c in cuts:
+        byte += len(text[prev:c].encode("utf-8"))
+        prev = c
+        out.append(byte)
+    return out
@@ -1,30 +1,32 @@
+from collections import Counter
 from pathlib import Path
 import json
 
+from hit_records import ERROR_RULE
+from hit_sink import iter_batches
+
 
 def get_hits_stats(jsonl_path='hits.jsonl'):
     """
-    Reads hits.jsonl, collects stats including the ordered set of norm times and rule_id distribution.
+    Reads hits.jsonl (or a .jsonl.gz/.jsonl.zst/.hits file, see hit_sink.py), collects stats
+    including the ordered set of norm times and rule_id distribution.
     Returns a dict with total hits, ordered norm times, and rule_id distribution.
+    Hits are counted from HitBatch columns (hit_records.py), not one dict each.
     """
-    norm_times = set()
+    minutes = set()
     total_hits = 0
-    rule_id_counts = {}
+    rule_counts = Counter()
+    tables = None
 
-    with open(jsonl_path, 'r', encoding='utf-8') as f:
-        for line in f:
-            if not line.strip():
-                continue
-            data = json.loads(line)
-            if 'norm_time' in data:
-                norm_times.add(data['norm_time'])
-            if 'rule_id' in data:
-                rule_id = data['rule_id']
-                rule_id_counts[rule_id] = rule_id_counts.get(rule_id, 0) + 1
-            total_hits += 1
+    for batch in iter_batches(Path(jsonl_path)):
+        tables = batch.tables
+        rule_counts.update(batch.rule)
+        minutes.update(m for r, m in zip(batch.rule, batch.minute) if r != ERROR_RULE and m >= 0)
+        total_hits += len(batch)
 
-    ordered_norm_times = sorted(norm_times)
-    rule_id_distribution = dict(sorted(rule_id_counts.items()))
+    rule_counts.pop(ERROR_RULE, None)
+    ordered_norm_times = [f"{m // 60:02d}:{m % 60:02d}" for m in sorted(minutes)]
+    rule_id_distribution = dict(sorted((tables.rules[r], n) for r, n in rule_counts.items()))
     return {
         'total_hits': total_hits,
         'ordered_norm_times': ordered_norm_times,
@@ -0,0 +1,49 @@
+"""Shared fixtures: the repo root on sys.path and small generated documents."""
+from __future__ import annotations
+
+import random, sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+WORDS = ("az ajtó előtt ült, fél hét órakor ment ki a kertbe. háromnegyed öt volt, délután "
+         "negyed kettőkor érkezett. 14.05-kor tíz perccel múlt nyolc, éjjel kettő óra húsz perc "
+         "7:4:29 8.5.30 reggel 9 órakor este 11:45-kor").split()
+CSS = "".join(f".c{i} {{ margin: {i % 7}px; color: #{i:06x}; }}\n" for i in range(3000))  # ~120 KB of ASCII
+
+def run_extractor(out: Path, *args: str) -> Path:
+    """extractor.py *args -o out, in-process."""
+    import extractor
+
+    assert extractor.main(["extractor.py", *args, "-o", str(out)]) == 0
+    return out
+
+def prose(n: int, seed: int = 1) -> str:
+    rnd = random.Random(seed)
+    return " ".join(rnd.choice(WORDS) for _ in range(n))
+
+def ascii_head_page(body: str) -> str:
+    """An HTML page without a declared charset whose first blocks are plain ASCII (inline CSS)."""
+    return f"<html><head><style>{CSS}</style></head><body><p>{body}</p></body></html>"
+
+@pytest.fixture
+def latin2_page(tmp_path: Path) -> Path:
+    """Undeclared iso-8859-2 HTML with a long ASCII head."""
+    path = tmp_path / "latin2.html"
+    path.write_bytes(ascii_head_page(prose(20000)).encode("iso-8859-2"))
+    return path
+
+@pytest.fixture
+def tree(tmp_path: Path, latin2_page: Path) -> Path:
+    """Undeclared-charset pages big enough to split, and a few small ones."""
+    root = tmp_path / "tree"
+    root.mkdir()
+    latin2_page.rename(root / "a_latin2.html")
+    (root / "b_cp1250.html").write_bytes(ascii_head_page(prose(20000, 2) + " „Idézet” –").encode("cp1250"))
+    (root / "c_latin2.txt").write_bytes(("x " * 60000 + prose(20000, 3)).encode("iso-8859-2"))
+    for i in range(4):
+        (root / f"d_small{i}.html").write_text(f"<p>{prose(300, 10 + i)}</p>", encoding="utf-8")
+    return root
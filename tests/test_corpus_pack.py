@@ -0,0 +1,38 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import corpus_pack, readers
+from conftest import ascii_head_page, prose, run_extractor
+
+def docs_dir(tmp_path: Path, latin2_page: Path) -> Path:
+    root = tmp_path / "docs"
+    root.mkdir()
+    latin2_page.rename(root / latin2_page.name)
+    return root
+
+def test_pack_text_matches_per_file_text(tmp_path: Path, latin2_page: Path):
+    root = docs_dir(tmp_path, latin2_page)
+    (root / "cp1250.html").write_bytes(ascii_head_page(prose(3000, 2) + " „Idézet”").encode("cp1250"))
+    (root / "plain.txt").write_bytes(("x " * 40000 + prose(3000, 3)).encode("iso-8859-2"))
+    (root / "page.xhtml").write_text(f"<html><body><p>{prose(200, 4)}</p></body></html>", encoding="utf-8")
+    # markup the streaming parser reads differently from BeautifulSoup
+    (root / "odd.html").write_text("<template><p>5 óra</p></template><p>&foo; fél öt</p>", encoding="utf-8")
+    prefix = tmp_path / "pack" / "all"
+    assert corpus_pack.main(["corpus_pack.py", str(prefix), str(root)]) == 0
+    pack = corpus_pack.CorpusPack(prefix)
+    try:
+        assert len(pack.docs) == 5 and not pack.errors
+        for doc in pack.docs:
+            path = Path(doc.file)
+            assert pack.text(doc) == readers.reader_for(path).to_text(path), path.name
+    finally:
+        pack.close()
+
+def test_corpus_run_matches_file_run(tmp_path: Path, latin2_page: Path):
+    root = docs_dir(tmp_path, latin2_page)
+    prefix = tmp_path / "pack" / "all"
+    corpus_pack.main(["corpus_pack.py", str(prefix), str(root)])
+    per_file = run_extractor(tmp_path / "files.jsonl", str(root), "--offsets-only")
+    corpus = run_extractor(tmp_path / "corpus.jsonl", "--corpus", str(prefix), "--offsets-only")
+    assert corpus.read_text(encoding="utf-8") == per_file.read_text(encoding="utf-8")
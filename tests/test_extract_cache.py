@@ -0,0 +1,19 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import extractor, readers
+from extract_cache import TextCache
+
+def test_text_cache_keys_by_reader(tmp_path: Path):
+    raw = "<p>fél öt</p><script>x = '5 óra'</script>".encode("utf-8")
+    html, txt = tmp_path / "doc.html", tmp_path / "doc.txt"
+    html.write_bytes(raw)
+    txt.write_bytes(raw)
+    opts = extractor.RunOptions(text_cache=str(tmp_path / "cache"))
+    for _ in range(2):  # cold, then warm
+        assert "".join(extractor.iter_text(html, opts, streaming=False)) == readers.html_to_text(html)
+        assert "".join(extractor.iter_text(txt, opts, streaming=False)) == readers.txt_to_text(txt)
+    cache = TextCache(tmp_path / "cache", extractor.TEXT_VERSION)
+    sha = extractor.file_sha256(html)
+    assert cache.path_for(sha, "html").exists() and cache.path_for(sha, "txt").exists()
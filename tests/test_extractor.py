@@ -0,0 +1,55 @@
+from __future__ import annotations
+
+import json, random
+from concurrent.futures import ProcessPoolExecutor
+from typing import List
+
+import pytest
+
+import extractor
+from conftest import prose
+
+# tokens the rules care about, plus near misses, jumbled into short texts
+FUZZ_WORDS = ("Ekkor 7:4:29 8.5.30 fél hét órakor negyed háromnegyed öt után előtt perccel délután este "
+              "14.05-kor 12:30 1:2:3:4 9.9.9 tíz óra húsz perc múlva reggel 11 3 45 óra kettő két 0:00 "
+              "23.59 . , \n ÖT Óra tizenegy harmincöt percel a 24:00 -kor huszonkét perckor").split(" ")
+
+def fuzz_texts(n: int, seed: int = 1) -> List[str]:
+    rnd = random.Random(seed)
+    return [" ".join(rnd.choice(FUZZ_WORDS) for _ in range(rnd.randint(5, 400))) for _ in range(n)]
+
+@pytest.fixture(scope="module")
+def rules() -> dict:
+    return extractor.load_rules()
+
+def per_rule_finditer(text: str, rules: dict) -> list:
+    return [[(m.start(), m.end(), m.groups()) for m in r["_re"].finditer(text)] for r in rules["rules"]]
+
+def test_master_matches_per_rule_finditer(rules: dict):
+    for text in fuzz_texts(300):
+        assert extractor.scan_rules(text, rules) == per_rule_finditer(text, rules), text
+
+def test_tokens_match_regex(rules: dict):
+    tokens = extractor.load_rules(engine="tokens")
+    for text in fuzz_texts(300, seed=2) + [prose(5000)]:
+        assert extractor.scan_rules(text, tokens) == extractor.scan_rules(text, rules), text
+        assert list(extractor.extract(text, tokens)) == list(extractor.extract(text, rules))
+
+@pytest.mark.parametrize("offsets_only,keep_overlaps", [(False, False), (True, False), (False, True)])
+def test_chunks_match_whole_text(rules: dict, offsets_only: bool, keep_overlaps: bool):
+    rnd = random.Random(3)
+    text = " ".join(fuzz_texts(60, seed=4)) + prose(20000)
+    for _ in range(3):
+        cuts = sorted(rnd.sample(range(1, len(text)), 40))
+        chunks = [text[a:b] for a, b in zip([0] + cuts, cuts + [len(text)])]
+        kw = dict(base=0, offsets_only=offsets_only, keep_overlaps=keep_overlaps)
+        whole = [json.dumps(h.to_dict()) for h in extractor.extract(text, rules, **kw)]
+        streamed = [json.dumps(h.to_dict()) for h in extractor.extract_chunks(chunks, rules, **kw)]
+        assert sorted(streamed) == sorted(whole)  # streamed output is rule-major per window
+
+def test_segments_match_serial(rules: dict):
+    rnd = random.Random(5)
+    with ProcessPoolExecutor(2, initializer=extractor._init_worker) as pool:
+        for text in fuzz_texts(20, seed=6) + [prose(20000)]:
+            ref = extractor.scan_rules(text, rules)
+            assert extractor.scan_segments(text, rules, pool, size=rnd.randint(20, 300)) == ref
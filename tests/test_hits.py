@@ -0,0 +1,33 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import hit_context, hit_sink
+from conftest import run_extractor
+
+def records(path: Path) -> list:
+    return list(hit_sink.iter_hits(path))
+
+def test_hits_round_trip(tmp_path: Path, tree: Path):
+    hits = run_extractor(tmp_path / "run.hits", str(tree))
+    lean = run_extractor(tmp_path / "lean.jsonl", str(tree), "--offsets-only")
+    assert hit_sink.main(["hit_sink.py", str(lean), str(tmp_path / "lean.hits")]) == 0
+    assert (tmp_path / "lean.hits").read_bytes() == hits.read_bytes()
+    docs = {r["doc"]: r["file"] for r in records(lean) if "rule_id" not in r}
+    lean_hits = [r for r in records(lean) if "rule_id" in r]
+    assert len(lean_hits) == len(records(hits)) > 1000
+    for row, rec in zip(records(hits), lean_hits):
+        assert row["file"] == docs[rec["doc"]] and row["offset"] == rec["start"]
+        assert (row["rule_id"], row["minute"], row.get("minute_candidates")) == \
+            (rec["rule_id"], rec["minute"], rec.get("minute_candidates"))
+
+@pytest.mark.parametrize("args", [(), ("--stream-above", "0.05"), ("-j", "2", "--split-above", "0.1")])
+def test_offsets_only_round_trip(tmp_path: Path, tree: Path, args: tuple):
+    full = run_extractor(tmp_path / "full.jsonl", str(tree), *args)
+    lean = run_extractor(tmp_path / "lean.jsonl", str(tree), "--offsets-only", *args)
+    out = tmp_path / "resolved.jsonl"
+    assert hit_context.main(["hit_context.py", str(lean), "-o", str(out)]) == 0
+    assert [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()] == records(full)
@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from conftest import run_extractor
+
+@pytest.mark.parametrize("stream", ["64", "0.05"])  # whole-document vs streamed conversion
+def test_jobs_match_serial(tmp_path: Path, tree: Path, stream: str):
+    serial = run_extractor(tmp_path / "serial.jsonl", str(tree)).read_text(encoding="utf-8")
+    assert "háromnegyed" in serial and "�" not in serial
+    parallel = run_extractor(tmp_path / "j2.jsonl", str(tree), "-j", "2", "--split-above", "0.1",
+                             "--stream-above", stream)
+    assert parallel.read_text(encoding="utf-8") == serial
+
+def test_jobs_match_serial_hits(tmp_path: Path, tree: Path):
+    serial = run_extractor(tmp_path / "serial.hits", str(tree))
+    parallel = run_extractor(tmp_path / "j2.hits", str(tree), "-j", "2", "--split-above", "0.1")
+    assert parallel.read_bytes() == serial.read_bytes()
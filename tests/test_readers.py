@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+import readers
+from extract_cache import EncodingCache
+from conftest import CSS, ascii_head_page, prose
+
+def streamed(path: Path, **kw) -> str:
+    return "".join(readers.reader_for(path).iter_text(path, **kw))
+
+def whole(path: Path, **kw) -> str:
+    return readers.reader_for(path).to_text(path, **kw)
+
+def test_ascii_head_latin2_streams_like_whole(latin2_page: Path):
+    text = whole(latin2_page)
+    assert "háromnegyed" in text and "�" not in text
+    assert streamed(latin2_page) == text
+
+@pytest.mark.parametrize("read_bytes", [1 << 10, 1 << 12, 1 << 16])
+def test_late_cp1250_punctuation(tmp_path: Path, read_bytes: int):
+    body = prose(8000)
+    body = body[:len(body) // 2] + " „Idézet” – " + body[len(body) // 2:]
+    path = tmp_path / "cp1250.html"
+    path.write_bytes(ascii_head_page(body).encode("cp1250"))
+    text = whole(path)
+    assert "„Idézet”" in text
+    assert "".join(readers.iter_html_text(path, read_bytes)) == text
+
+def test_cached_encoding_streams_like_whole(tmp_path: Path, latin2_page: Path):
+    cache = EncodingCache(tmp_path / "enc")
+    assert streamed(latin2_page, encodings=cache) == whole(latin2_page)
+    assert cache.get(latin2_page) == "iso-8859-2"
+    assert streamed(latin2_page, encodings=EncodingCache(tmp_path / "enc")) == whole(latin2_page)
+
+def test_partial_ascii_block_is_undecided():
+    head = ascii_head_page("").encode()[:1 << 16]
+    assert readers.fast_decode(head, final=False) is None
+    assert readers.fast_decode(head) == (head.decode(), "utf-8")
+
+def test_encoding_cache_skips_ascii_guess(tmp_path: Path, latin2_page: Path):
+    cache = EncodingCache(tmp_path / "enc")
+    pieces = readers.iter_decoded(latin2_page, 1 << 12, encodings=cache)
+    next(pieces)  # still inside the ASCII head
+    assert cache.get(latin2_page) is None
+    "".join(pieces)
+    assert cache.get(latin2_page) == "iso-8859-2"
+
+def test_txt_decodes_whole_file(tmp_path: Path):
+    raw = (CSS + prose(20000)).encode("iso-8859-2")
+    path = tmp_path / "latin2.txt"
+    path.write_bytes(raw)
+    text = whole(path)
+    assert "háromnegyed" in text and "�" not in text
+    assert text == " ".join(readers.decode_bytes(raw)[0].split())
+    assert streamed(path) == text
@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+import copy
+
+import json5
+import pytest
+
+import extractor, token_engine
+
+def test_grammar_copy_matches_rules_json5():
+    data = json5.loads(extractor.RULES_PATH.read_text(encoding="utf-8"))
+    assert data["macros"] == token_engine.MACROS
+    assert {r["id"]: r["pattern"] for r in data["rules"]} == token_engine.RULE_SOURCES
+    assert [r["id"] for r in data["rules"]] == list(token_engine.RULE_SOURCES)
+    assert token_engine.grammar_diff(extractor.load_rules()) == []
+
+def test_changed_rules_are_refused():
+    rules = copy.deepcopy({k: v for k, v in extractor.load_rules().items() if not k.startswith("_")})
+    rules["rules"][0]["source"] = rules["rules"][0]["source"].replace("[0-5]", "[0-6]")
+    rules["macros"]["OCLOCK"] += "|órától"
+    with pytest.raises(ValueError, match=r"token_engine\.py.*macro OCLOCK, rule clock_hh_mm_colon"):
+        token_engine.TokenScanner(rules)
@@ -0,0 +1,449 @@
+#!/usr/bin/env python3
+"""
+Token-stream time grammar: the alternative to the master regex behind
+`extractor.py --engine tokens`.
+
+One pass of LEXER over the lowercased text, within the prefilter windows
+the regex engine scans too, yields the tokens a time expression can start
+at: digits, number and hour words, fél / negyed / háromnegyed, daypart
+words, and "perc(c)el", from which the minute word in front of it is
+found. Filler words produce no tokens. In position order, each token goes
+to the recognizers its kind allows: a number by the char that follows it,
+a word by its first letter. A recognizer walks the characters after it as
+the rule's regex would: the same alternatives in the same order, the same
+\\b checks, whole digit runs. The result is scan_rules() output: per rule,
+the (start, end, groups) triples its own finditer yields. Dayparts come
+out of the same pass, as bare_daypart hits, so dispatch, overlap
+resolution and streaming work as with the regex engine.
+
+The recognizers are code written for the rules.json5 patterns copied into
+RULE_SOURCES and MACROS; they can't be derived from a rule pack. TokenScanner
+refuses rules that differ from that copy (grammar_diff() names what
+differs), so a rules.json5 edit means editing the recognizers and the copy
+here together. Text whose lowercase has a different length (e.g. "İ") is
+left to the regex engine.
+"""
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# (start, end, flat group spans: start, end per group, -1 where a group took no part)
+Hit = Tuple[int, int, Tuple[int, ...]]
+
+MACROS = {
+    "HOUR24": r"[01]?\d|2[0-3]",
+    "MINUTE": r"[0-5]?\d",
+    "HOUR_WORD": "egy|kettő|két|három|négy|öt|hat|hét|nyolc|kilenc|tíz|tizenegy|tizenkettő",
+    "NUMBER_WORD": r"{HOUR_WORD}|tizen\w+|huszon\w+|húsz|harminc\w*|negyven\w*|ötven\w*",
+    "WORD": r"[a-záéíóöőúüű\-]+",
+    "OCLOCK": "óra|órakor|-?kor",
+}
+RULE_SOURCES = {
+    "clock_hh_mm_colon": r"(?<!\d)\b({HOUR24}):([0-5]\d)\b(?!\d)",
+    "clock_hh_mm_dot": r"(?<!\d)\b({HOUR24})\.([0-5]\d)\b(?!\d)",
+    "x_ora_y_perc_digits": r"\b({HOUR24})\s*óra\s*({MINUTE})\s*perc(?:kor|ben)?\b",
+    "x_ora_y_perc_words": r"\b({NUMBER_WORD})\s*óra\s*(?:({MINUTE})|({WORD}))\s*perc(?:kor|ben)?\b",
+    "oclock_strict_24h": r"\b({HOUR24})\s*(?:{OCLOCK})\b",
+    "relative_fel": r"\bfél\s*({HOUR24}|{HOUR_WORD})\b",
+    "relative_negyed": r"\bnegyed\s*({HOUR24}|{HOUR_WORD})\b",
+    "relative_haromnegyed": r"\bháromnegyed\s*({HOUR24}|{HOUR_WORD})\b",
+    "after_minutes": r"\b(?:(?:({MINUTE})|({WORD}))\s*percc?el\s*(?:[a ]*)?({HOUR24})\s*óra\s*után"
+                     r"|({HOUR24})\s*óra\s*után\s*(?:({MINUTE})|({WORD}))\s*percc?el)\b",
+    "before_minutes": r"\b(?:(?:({MINUTE})|({WORD}))\s*percc?el\s*(?:[a ]*)?({HOUR24})\s*óra\s*előtt"
+                      r"|({HOUR24})\s*óra\s*előtt\s*(?:({MINUTE})|({WORD}))\s*percc?el)\b",
+    "oclock_words_with_daypart": r"\b({HOUR_WORD})\s*(?:{OCLOCK})\b",
+    "bare_daypart": r"\b(hajnalban|hajnal|reggel|délelőtt|dél|délután|este|éjjel|éjfél|de\.|du\.)\b",
+}
+
+# the macros' literal alternatives, in pattern order
+HOUR_WORDS = tuple(MACROS["HOUR_WORD"].split("|"))
+HOUR_WORD_RE = re.compile(MACROS["HOUR_WORD"])  # no word is a prefix of another: at most one matches
+OCLOCK = ("óra", "órakor", "-kor", "kor")
+DAYPARTS = ("hajnalban", "hajnal", "reggel", "délelőtt", "dél", "délután", "este", "éjjel", "éjfél",
+            "de.", "du.")
+DAYPARTS_BY_FIRST = {c: tuple(lit for lit in DAYPARTS if lit[0] == c) for c in {lit[0] for lit in DAYPARTS}}
+RELATIVE = ("fél", "negyed", "háromnegyed")
+WORD_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzáéíóöőúüű-")
+FOLD = {ord("ı"): "i", ord("ſ"): "s"}  # IGNORECASE matches them to i/s; lower() keeps them
+
+_starts = sorted(set(HOUR_WORDS + RELATIVE + DAYPARTS + ("tizen", "huszon", "húsz", "harminc",
+                                                         "negyven", "ötven")), key=len, reverse=True)
+LEXER = re.compile(r"(?<!\w)(?:\d|" + "|".join(map(re.escape, _starts)) + r")|(?P<perc>percc?el)")
+LONGEST_TOKEN = max(map(len, _starts + ["perccel"]))
+SPACES = re.compile(r"\s*")
+DIGITS = re.compile(r"\d*")
+WORDS = re.compile(r"\w*")
+WORD_RUN = re.compile(r"[a-záéíóöőúüű\-]*")
+
+class _Doc:
+    """One text's recognizers. Positions index both `text` and its lowercase `low`."""
+    def __init__(self, text: str, low: str):
+        self.text, self.low, self.n = text, low, len(text)
+        self.at = low.startswith  # at(lit, i)
+
+    # ---------- character classes ----------
+    def w(self, i: int) -> bool:
+        """text[i] is a \\w char (False outside the text)."""
+        if 0 <= i < self.n:
+            c = self.text[i]
+            return c.isalnum() or c == "_"
+        return False
+
+    def bnd(self, i: int) -> bool:
+        return self.w(i - 1) != self.w(i)
+
+    def ws(self, i: int) -> int:
+        return SPACES.match(self.text, i).end()
+
+    def digit(self, i: int) -> bool:
+        return i < self.n and self.text[i].isdecimal()
+
+    # ---------- macros ----------
+    def hour24(self, i: int) -> int:
+        """End of HOUR24 on the digit run starting at i, or -1. Every use is followed by a non-digit."""
+        e = DIGITS.match(self.text, i).end()
+        if e - i == 1:
+            return e
+        if e - i == 2:
+            a = self.text[i]
+            if a in "01" or (a == "2" and self.text[i + 1] in "0123"):
+                return e
+        return -1
+
+    def minute(self, i: int) -> int:
+        """End of MINUTE on the digit run starting at i, or -1."""
+        e = DIGITS.match(self.text, i).end()
+        return e if e - i == 1 or (e - i == 2 and self.text[i] in "012345") else -1
+
+    def ends(self, lo: int, hi: int, lit: str) -> Iterable[int]:
+        """
+        Where a greedy run ending at `hi` may stop, longest first, for a
+        continuation starting with `lit`: hi itself, then every `lit` inside
+        [lo, hi). Stopping anywhere else leaves a run char where `lit` must start.
+        """
+        if hi >= lo:
+            yield hi
+        e = self.low.rfind(lit, lo, hi - 1 + len(lit))
+        while e >= lo:
+            if e < hi:
+                yield e
+            e = self.low.rfind(lit, lo, e - 1 + len(lit))
+
+    def number_word_ends(self, i: int) -> Iterable[int]:
+        """NUMBER_WORD ends at i, in the order the alternation tries them (for "óra" after)."""
+        m = HOUR_WORD_RE.match(self.low, i)
+        if m is not None:
+            yield m.end()
+        for pref, least in (("tizen", 1), ("huszon", 1), ("húsz", None), ("harminc", 0),
+                            ("negyven", 0), ("ötven", 0)):
+            if self.at(pref, i):
+                if least is None:
+                    yield i + len(pref)
+                else:
+                    yield from self.ends(i + len(pref) + least, WORDS.match(self.text, i).end(), "óra")
+
+    def oclock(self, j: int) -> int:
+        """End of (?:{OCLOCK})\\b at j, or -1."""
+        for lit in OCLOCK:
+            if self.at(lit, j) and self.bnd(j + len(lit)):
+                return j + len(lit)
+        return -1
+
+    def perc_tail(self, k: int) -> int:
+        """End of perc(?:kor|ben)?\\b at k, or -1."""
+        if not self.at("perc", k):
+            return -1
+        k += 4
+        for suf in ("kor", "ben"):
+            if self.at(suf, k) and self.bnd(k + 3):
+                return k + 3
+        return k if self.bnd(k) else -1
+
+    def perc_el(self, k: int) -> int:
+        """End of percc?el at k, or -1."""
+        if self.at("perccel", k):
+            return k + 7
+        return k + 6 if self.at("percel", k) else -1
+
+    def hour_word(self, j: int) -> int:
+        """End of ({HOUR_WORD})\\b at j, or -1."""
+        m = HOUR_WORD_RE.match(self.low, j)
+        return m.end() if m is not None and self.bnd(m.end()) else -1
+
+    # ---------- rules ----------
+    def clock(self, i: int, sep: str) -> Optional[Hit]:
+        e = self.hour24(i)
+        if e < 0 or e >= self.n or self.text[e] != sep:
+            return None
+        m = DIGITS.match(self.text, e + 1).end()
+        if m - e != 3 or self.text[e + 1] not in "012345" or self.w(m):
+            return None
+        return i, m, (i, e, e + 1, m)
+
+    def hour_minute_digits(self, i: int) -> Optional[Hit]:
+        e = self.hour24(i)
+        if e < 0:
+            return None
+        j = self.ws(e)
+        if not self.at("óra", j):
+            return None
+        j = self.ws(j + 3)
+        if not self.digit(j):
+            return None
+        me = self.minute(j)
+        if me < 0:
+            return None
+        k = self.perc_tail(self.ws(me))
+        return (i, k, (i, e, j, me)) if k >= 0 else None
+
+    def hour_minute_words(self, i: int) -> Optional[Hit]:
+        for e in self.number_word_ends(i):
+            j = self.ws(e)
+            if not self.at("óra", j):
+                continue
+            j = self.ws(j + 3)
+            if self.digit(j):
+                me = self.minute(j)
+                k = self.perc_tail(self.ws(me)) if me >= 0 else -1
+                if k >= 0:
+                    return i, k, (i, e, j, me, -1, -1)
+            elif j < self.n and self.low[j] in WORD_CHARS:
+                for we in self.ends(j + 1, WORD_RUN.match(self.low, j).end(), "perc"):
+                    k = self.perc_tail(self.ws(we))
+                    if k >= 0:
+                        return i, k, (i, e, -1, -1, j, we)
+        return None
+
+    def oclock_digits(self, i: int) -> Optional[Hit]:
+        e = self.hour24(i)
+        k = self.oclock(self.ws(e)) if e >= 0 else -1
+        return (i, k, (i, e)) if k >= 0 else None
+
+    def relative(self, i: int, lit: str) -> Optional[Hit]:
+        if not self.at(lit, i):
+            return None
+        j = self.ws(i + len(lit))
+        if self.digit(j):
+            e = self.hour24(j)
+            if e < 0 or self.w(e):
+                return None
+        else:
+            e = self.hour_word(j)
+            if e < 0:
+                return None
+        return i, e, (j, e)
+
+    def minutes_first(self, i: int, x: int, after: str) -> Tuple[int, int, int]:
+        """End of `\\s*percc?el\\s*(?:[a ]*)?({HOUR24})\\s*óra\\s*<after>\\b` from x, and HOUR24's span."""
+        j = self.perc_el(self.ws(x))
+        if j < 0:
+            return -1, -1, -1
+        m = self.ws(j)
+        while m < self.n and self.low[m] in "a ":
+            m += 1
+        if not self.digit(m):
+            return -1, -1, -1
+        he = self.hour24(m)
+        if he < 0:
+            return -1, -1, -1
+        k = self.ws(he)
+        if not self.at("óra", k):
+            return -1, -1, -1
+        k = self.ws(k + 3)
+        if not self.at(after, k) or not self.bnd(k + len(after)):
+            return -1, -1, -1
+        return k + len(after), m, he
+
+    def relative_minutes(self, i: int, after: str, run: int = -1) -> Optional[Hit]:
+        """
+        after_minutes / before_minutes at i: `run` is the WORD run end when
+        i starts a minute word (found from the "perc(c)el" after it).
+        """
+        if run >= 0:
+            for we in self.ends(i + 1, run, "perc"):
+                k, m, he = self.minutes_first(i, we, after)
+                if k >= 0:
+                    return i, k, (-1, -1, i, we, m, he, -1, -1, -1, -1, -1, -1)
+            return None
+        me = self.minute(i)
+        if me >= 0:
+            k, m, he = self.minutes_first(i, me, after)
+            if k >= 0:
+                return i, k, (i, me, -1, -1, m, he, -1, -1, -1, -1, -1, -1)
+        he = self.hour24(i)
+        if he < 0:
+            return None
+        j = self.ws(he)
+        if not self.at("óra", j):
+            return None
+        j = self.ws(j + 3)
+        if not self.at(after, j):
+            return None
+        j = self.ws(j + len(after))
+        if self.digit(j):
+            me = self.minute(j)
+            k = self.perc_el(self.ws(me)) if me >= 0 else -1
+            if k >= 0 and self.bnd(k):
+                return i, k, (-1, -1, -1, -1, -1, -1, i, he, j, me, -1, -1)
+        elif j < self.n and self.low[j] in WORD_CHARS:
+            for we in self.ends(j + 1, WORD_RUN.match(self.low, j).end(), "perc"):
+                k = self.perc_el(self.ws(we))
+                if k >= 0 and self.bnd(k):
+                    return i, k, (-1, -1, -1, -1, -1, -1, i, he, -1, -1, j, we)
+        return None
+
+    def oclock_words(self, i: int) -> Optional[Hit]:
+        m = HOUR_WORD_RE.match(self.low, i)
+        k = self.oclock(self.ws(m.end())) if m is not None else -1
+        return (i, k, (i, m.end())) if k >= 0 else None
+
+    def daypart(self, i: int) -> Optional[Hit]:
+        for lit in DAYPARTS_BY_FIRST.get(self.low[i], ()):
+            if self.at(lit, i) and self.bnd(i + len(lit)):
+                return i, i + len(lit), (i, i + len(lit))
+        return None
+
+    # ---------- tokens ----------
+    def minute_word_starts(self, q: int, floor: int) -> Tuple[List[int], int]:
+        """
+        Where a WORD ending before the "perc(c)el" at q may start (\\b
+        positions in its run, from `floor` on), and the run's end.
+        """
+        low, e = self.low, q
+        while e > 0 and low[e - 1].isspace():
+            e -= 1
+        if e == 0 or low[e - 1] not in WORD_CHARS:
+            return [], -1
+        s = e
+        while s > floor and low[s - 1] in WORD_CHARS:
+            s -= 1
+        return [p for p in range(s, e) if self.bnd(p)], WORD_RUN.match(low, s).end()
+
+def grammar_diff(rules: dict) -> List[str]:
+    """What in loaded `rules` differs from the RULE_SOURCES/MACROS the recognizers implement."""
+    macros = rules.get("macros", {})
+    diff = [f"macro {name}" for name in sorted(set(macros) | set(MACROS)) if macros.get(name) != MACROS.get(name)]
+    sources = {r["id"]: r["source"] for r in rules["rules"]}
+    diff += [f"rule {rid}" for rid in list(RULE_SOURCES) + [rid for rid in sources if rid not in RULE_SOURCES]
+             if sources.get(rid) != RULE_SOURCES.get(rid)]
+    if not diff and list(sources) != list(RULE_SOURCES):
+        diff.append("rule order")
+    return diff
+
+class TokenScanner:
+    """scan_rules() for the rules in RULE_SOURCES, token by token; see the module docstring."""
+    def __init__(self, rules: dict):
+        diff = grammar_diff(rules)
+        if diff:
+            raise ValueError(f"the token engine (token_engine.py: RULE_SOURCES, MACROS and the recognizers) "
+                             f"doesn't implement these rules; they differ in {', '.join(diff)} "
+                             f"(use --engine regex, or update token_engine.py)")
+        self.n_rules = len(RULE_SOURCES)
+        slot = {rid: k for k, rid in enumerate(RULE_SOURCES)}
+        def on(rid: str, fn: Callable[[_Doc, int], Optional[Hit]]) -> Tuple[int, Callable]:
+            return slot[rid], fn
+        # digit tokens: by the first char after the number and any spaces
+        number = [
+            (("clock_hh_mm_colon", lambda d, i: d.clock(i, ":")), ":"),
+            (("clock_hh_mm_dot", lambda d, i: d.clock(i, ".")), "."),
+            (("x_ora_y_perc_digits", _Doc.hour_minute_digits), "ó"),
+            (("oclock_strict_24h", _Doc.oclock_digits), "ó-k"),
+            (("after_minutes", lambda d, i: d.relative_minutes(i, "után")), "pó"),   # perc(c)el / óra
+            (("before_minutes", lambda d, i: d.relative_minutes(i, "előtt")), "pó"),
+        ]
+        # word tokens: by their first letter
+        letter = [
+            (("x_ora_y_perc_words", _Doc.hour_minute_words), HOUR_WORDS + ("tizen", "huszon", "húsz",
+                                                                          "harminc", "negyven", "ötven")),
+            (("relative_fel", lambda d, i: d.relative(i, "fél")), ("fél",)),
+            (("relative_negyed", lambda d, i: d.relative(i, "negyed")), ("negyed",)),
+            (("relative_haromnegyed", lambda d, i: d.relative(i, "háromnegyed")), ("háromnegyed",)),
+            (("oclock_words_with_daypart", _Doc.oclock_words), HOUR_WORDS),
+            (("bare_daypart", _Doc.daypart), DAYPARTS),
+        ]
+        self.after_number: Dict[str, List[Tuple[int, Callable]]] = {}
+        for (rid, fn), follow in number:
+            for c in follow:
+                self.after_number.setdefault(c, []).append(on(rid, fn))
+        self.by_first: Dict[str, List[Tuple[int, Callable]]] = {}
+        for (rid, fn), words in letter:
+            for c in sorted({wd[0] for wd in words}):
+                self.by_first.setdefault(c, []).append(on(rid, fn))
+        self.minute_words = [on("after_minutes", lambda d, i, run: d.relative_minutes(i, "után", run)),
+                             on("before_minutes", lambda d, i, run: d.relative_minutes(i, "előtt", run))]
+
+    def fold(self, text: str, low: str) -> Optional[str]:
+        """The lowercase the recognizers read, from low = text.lower(); None if offsets would drift."""
+        if len(low) != len(text):
+            return None
+        return low.translate(FOLD) if "ı" in low or "ſ" in low else low
+
+    def scan_spans(self, text: str, low: str, windows: Optional[List[Tuple[int, int]]] = None,
+                   pos: int = 0, last_end: Optional[List[int]] = None,
+                   stop: Optional[int] = None) -> List[List[Hit]]:
+        """
+        Per rule, its matches starting in [pos, stop), with flat group spans
+        (see Hit). `low` comes from fold(); `windows`, if given, are the
+        ranges matches can start in (extractor.candidate_windows), and
+        only they are lexed.
+        """
+        doc = _Doc(text, low)
+        out: List[List[Hit]] = [[] for _ in range(self.n_rules)]
+        if last_end is None:
+            last_end = [0] * self.n_rules
+        n = len(text)
+        stop = n if stop is None else stop
+        # token positions, with the WORD run end where a minute word may start
+        tokens: Dict[int, int] = {}
+        for a, b in [(pos, n)] if windows is None else windows:
+            floor = a
+            for t in LEXER.finditer(low, a, min(n, b + LONGEST_TOKEN)):
+                i = t.start()
+                if i >= b:
+                    break
+                if t.lastgroup is None:
+                    tokens.setdefault(i, -1)
+                    continue
+                starts, run = doc.minute_word_starts(i, floor)
+                for p in starts:
+                    tokens[p] = run
+                floor = i
+        for i in sorted(tokens):
+            if i >= stop:
+                break
+            if i < pos:
+                continue
+            if text[i].isdecimal():
+                j = SPACES.match(text, DIGITS.match(text, i).end()).end()
+                recs = self.after_number.get(low[j:j + 1], ())
+            else:
+                recs = self.by_first.get(low[i], ())
+            for k, fn in recs:
+                if i >= last_end[k]:
+                    hit = fn(doc, i)
+                    if hit is not None:
+                        out[k].append(hit)
+                        last_end[k] = hit[1]
+            run = tokens[i]
+            if run >= 0:
+                for k, fn in self.minute_words:
+                    if i >= last_end[k]:
+                        hit = fn(doc, i, run)
+                        if hit is not None:
+                            out[k].append(hit)
+                            last_end[k] = hit[1]
+        return out
+
+    def scan(self, text: str, low: str, windows: Optional[List[Tuple[int, int]]] = None, pos: int = 0,
+             last_end: Optional[List[int]] = None) -> Optional[List[List[Tuple[int, int, tuple]]]]:
+        """
+        scan_rules(text, rules, pos, last_end) given low = text.lower() and
+        the prefilter windows, or None for text the engine leaves to the regex.
+        """
+        low = self.fold(text, low)
+        if low is None:
+            return None
+        return [[(s, e, tuple(text[a:b] if a >= 0 else None for a, b in zip(g[0::2], g[1::2])))
+                 for s, e, g in hits]
+                for hits in self.scan_spans(text, low, windows, pos, last_end)]